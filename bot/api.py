@@ -79,6 +79,9 @@ async def health():
 
 @app.get("/metrics")
 async def metrics():
+    import metrics as bot_metrics
+    # KPI en base calculés au scrape, en une passe, et mis en cache METRICS_CACHE_SECONDS
+    await bot_metrics.collector.refresh_if_stale()
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
@@ -187,6 +190,9 @@ async def ban_user(req: ModerationRequest):
         moderator_name=mod_name,
     )
     await member.ban(reason=req.reason)
+    # Ban définitif : annule la fin d'un éventuel tempban en cours
+    from utils.scheduler import scheduler
+    await scheduler.cancel('unban', user_id=member.id, guild_id=guild.id)
     return {"success": True}
 
 @app.post("/moderation/unban", dependencies=[Depends(_require_token)])
@@ -194,7 +200,7 @@ async def ban_user(req: ModerationRequest):
 async def unban_user(user_id: int):
     guild = _get_guild()
     user  = await _get_bot().fetch_user(user_id)
-    await guild.unban(user)
+    await guild.unban(user)   # TempBanCog.on_member_unban annule l'échéance en attente
     return {"success": True}
 
 @app.post("/moderation/timeout", dependencies=[Depends(_require_token)])
@@ -282,6 +288,25 @@ async def toggle_command(req: CommandToggleRequest):
     return {"success": ok}
 
 
+# ── Achievements ──────────────────────────────────────────────────────────────
+
+@app.post("/achievements/reload", dependencies=[Depends(_require_token)])
+async def reload_achievements():
+    """À appeler après une modification du catalogue achievements (panel, SQL)."""
+    from utils.database import achievement_manager
+    await achievement_manager.reload()
+    return {"success": True}
+
+
+# ── Requêtes SQL ──────────────────────────────────────────────────────────────
+
+@app.get("/db/queries", dependencies=[Depends(_require_token)])
+async def top_queries(limit: int = 20, order: str = 'total'):
+    """Requêtes les plus coûteuses depuis le démarrage (order : total, mean, max, calls)."""
+    from utils.query_stats import query_stats
+    return query_stats.report(limit=min(max(limit, 1), 200), order=order)
+
+
 # ── Runner ────────────────────────────────────────────────────────────────────
 
 def run_api():
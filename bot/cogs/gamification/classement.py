@@ -116,11 +116,11 @@ class ClassementCog(commands.Cog):
 
         if cat == "achievements":
             rows = await db_manager.fetch("""
-                SELECT u.username, COUNT(ua.achievement_id) AS total
-                FROM user_voice_data u
-                JOIN user_achievements ua ON u.user_id = ua.user_id
-                GROUP BY u.user_id, u.username
-                ORDER BY total DESC
+                SELECT u.username, t.achievement_count AS total
+                FROM user_totals t
+                JOIN user_voice_data u ON u.user_id = t.user_id
+                WHERE t.achievement_count > 0
+                ORDER BY t.achievement_count DESC
                 LIMIT 10
             """)
             return [
@@ -134,17 +134,10 @@ class ClassementCog(commands.Cog):
                 SELECT
                     u.username,
                     COALESCE(u.total_time / 60, 0)
-                    + COALESCE(msg.total_messages, 0)
-                    + COALESCE(ach.ach_count * 200, 0) AS score
+                    + COALESCE(t.messages, 0)
+                    + COALESCE(t.achievement_count * 200, 0) AS score
                 FROM user_voice_data u
-                LEFT JOIN (
-                    SELECT user_id, SUM(message_count) AS total_messages
-                    FROM user_message_stats GROUP BY user_id
-                ) msg ON u.user_id = msg.user_id
-                LEFT JOIN (
-                    SELECT user_id, COUNT(*) AS ach_count
-                    FROM user_achievements GROUP BY user_id
-                ) ach ON u.user_id = ach.user_id
+                LEFT JOIN user_totals t ON t.user_id = u.user_id
                 ORDER BY score DESC
                 LIMIT 10
             """)
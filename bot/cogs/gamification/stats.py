@@ -5,10 +5,11 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from utils.database import (
-    voice_manager, message_stats_manager, xp_manager,
-    db_manager, streak_manager, bump_manager, invite_manager,
+    voice_manager, xp_manager, db_manager, streak_manager,
+    bump_manager, invite_manager, user_totals_manager,
 )
 from utils.command_manager import command_enabled
+from utils.decorators import administration_only
 from utils.embed_style import hermes_embed, progress_bar, Colors
 
 logger = logging.getLogger(__name__)
@@ -24,18 +25,17 @@ class StatsCog(commands.Cog):
         await interaction.response.defer()
         target = user or interaction.user
 
-        voice_data, total_msgs, xp_data, streak_data, bumps, invites = await asyncio.gather(
+        voice_data, totals, xp_data, streak_data, bumps, invites = await asyncio.gather(
             voice_manager.get_user(target.id),
-            message_stats_manager.get_total(target.id),
+            user_totals_manager.get(target.id),
             xp_manager.get_user_xp(target.id),
             streak_manager.get_streak(target.id),
             bump_manager.get_count(target.id),
             invite_manager.get_count(target.id),
         )
-        warn_count, ach_count = await asyncio.gather(
-            db_manager.fetchval("SELECT COUNT(*) FROM warn WHERE user_id = $1", target.id),
-            db_manager.fetchval("SELECT COUNT(*) FROM user_achievements WHERE user_id = $1", target.id),
-        )
+        warn_count = await db_manager.fetchval("SELECT COUNT(*) FROM warn WHERE user_id = $1", target.id)
+        total_msgs = int(totals['messages']) if totals else 0
+        ach_count  = int(totals['achievement_count']) if totals else 0
 
         voice_rank = await db_manager.fetchval("""
             SELECT COUNT(*) + 1 FROM user_voice_data
@@ -44,14 +44,9 @@ class StatsCog(commands.Cog):
             )
         """, target.id)
 
-        msg_rank = await db_manager.fetchval("""
-            SELECT COUNT(*) + 1 FROM (
-                SELECT user_id, SUM(message_count) AS total
-                FROM user_message_stats GROUP BY user_id
-            ) sub WHERE total > COALESCE(
-                (SELECT SUM(message_count) FROM user_message_stats WHERE user_id = $1), 0
-            )
-        """, target.id)
+        msg_rank = await db_manager.fetchval(
+            "SELECT COUNT(*) + 1 FROM user_totals WHERE messages > $1", total_msgs
+        )
 
         embed = hermes_embed(
             title=f"📊  Stats — {target.display_name}",
@@ -121,6 +116,20 @@ class StatsCog(commands.Cog):
 
         await interaction.followup.send(embed=embed)
 
+    @app_commands.command(name="reconcile-totals", description="[Admin] Recalculer les totaux des membres")
+    @administration_only()
+    async def reconcile_totals(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        rows = await user_totals_manager.rebuild()
+        await interaction.followup.send(
+            embed=hermes_embed(
+                description=f"✅ Totaux recalculés pour **{rows}** membres.",
+                color=Colors.GREEN,
+            ),
+            ephemeral=True,
+        )
+        logger.info("user_totals reconstruit par %s (%s lignes)", interaction.user, rows)
+
 
 async def setup(bot):
     await bot.add_cog(StatsCog(bot))
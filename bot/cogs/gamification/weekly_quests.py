@@ -4,8 +4,10 @@ import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 from datetime import date, time, timezone
+from config import UNLOCK_DMS_ENABLED
 from utils.database import quest_manager, db_manager, notification_manager
 from utils.command_manager import command_enabled
+from utils.delivery_queue import delivery_queue
 from utils.decorators import administration_only
 from utils.embed_style import hermes_embed, progress_bar, Colors
 
@@ -102,6 +104,15 @@ class WeeklyQuestsCog(commands.Cog):
                 f"Défi complété : {quest['title']}",
                 f"+{quest['xp_reward']} XP disponibles — /quest-claim {quest['id']}",
             )
+            if UNLOCK_DMS_ENABLED:
+                await delivery_queue.send_dm(
+                    user_id,
+                    "🎯  Défi complété !",
+                    f"{quest.get('icon') or '🎯'} **{quest['title']}** · +{quest['xp_reward']} XP — `/quest-claim {quest['id']}`",
+                    coalesce_key='quests',
+                    title_many="🎯  {n} défis complétés !",
+                    color=Colors.GREEN,
+                )
         except Exception as e:
             logger.warning("notify quest error for %s: %s", user_id, e)
 
@@ -6,7 +6,9 @@ from discord import app_commands
 from discord.ext import commands, tasks
 from utils.database import xp_manager, db_manager, streak_manager, notification_manager, achievement_manager
 from utils.command_manager import command_enabled
+from utils.delivery_queue import delivery_queue
 from utils.embed_style import hermes_embed, leaderboard_embed, progress_bar, Colors
+from utils.instrumentation import timed
 
 logger = logging.getLogger(__name__)
 
@@ -33,12 +35,9 @@ class XPCog(commands.Cog):
             if new_level >= threshold and role_name:
                 role = discord.utils.get(member.guild.roles, name=role_name)
                 if role and role not in member.roles:
-                    try:
-                        await member.add_roles(role)
-                        logger.info(f"Granted level role '{role_name}' to {member.id}")
-                    except discord.Forbidden:
-                        pass
+                    await delivery_queue.add_role(member.id, role_name, reason=f"Niveau {new_level}")
 
+    @timed()
     async def award_xp(self, user_id: int, amount: int, source: str = '',
                         channel: discord.TextChannel | None = None):
         try:
@@ -66,10 +65,7 @@ class XPCog(commands.Cog):
                         thumbnail_url=member.display_avatar.url,
                     )
                     embed.add_field(name="XP total", value=f"**{result['new_xp']:,}** XP", inline=True)
-                    try:
-                        await channel.send(embed=embed)
-                    except discord.Forbidden:
-                        pass
+                    await delivery_queue.send_channel_message(channel.id, embed)
 
                 await notification_manager.create(
                     user_id, 'level_up',
@@ -1,16 +1,34 @@
-import asyncio
 import discord
+from datetime import datetime, timezone, timedelta
 from discord import app_commands
 from discord.ext import commands
 from utils.command_manager import command_enabled
 from utils.decorators import administration_only
 from utils.logging import log_command, log_admin_action
 from utils.embed_style import hermes_embed, moderation_embed, send_sanction_dm, Colors
+from utils.scheduler import scheduler
+from utils.instrumentation import timed
 
 
 class TempBanCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        scheduler.register('unban', self._unban)
+
+    async def _unban(self, action: dict):
+        guild = self.bot.get_guild(action['guild_id'])
+        if guild is None:
+            raise RuntimeError("guild indisponible")
+        try:
+            await guild.unban(discord.Object(id=action['user_id']), reason="Fin du bannissement temporaire")
+        except discord.NotFound:
+            pass  # déjà débanni
+
+    @commands.Cog.listener()
+    @timed()
+    async def on_member_unban(self, guild: discord.Guild, user: discord.User):
+        # Débannissement manuel (ou par l'API) : l'échéance en attente n'a plus lieu d'être
+        await scheduler.cancel('unban', user_id=user.id, guild_id=guild.id)
 
     @app_commands.command(name="tempban", description="Bannir temporairement un membre")
     @administration_only()
@@ -46,11 +64,12 @@ class TempBanCog(commands.Cog):
         await interaction.followup.send(embed=embed)
         await log_admin_action(self.bot, 'tempban', interaction.user, user, reason, f"{duration} min")
 
-        await asyncio.sleep(duration * 60)
-        try:
-            await interaction.guild.unban(user)
-        except Exception:
-            pass
+        # Un nouveau tempban remplace l'échéance précédente
+        await scheduler.cancel('unban', user_id=user.id, guild_id=interaction.guild.id)
+        await scheduler.schedule(
+            'unban', datetime.now(timezone.utc) + timedelta(minutes=duration),
+            user_id=user.id, guild_id=interaction.guild.id, payload={'reason': reason},
+        )
 
 
 async def setup(bot):
@@ -1,16 +1,19 @@
 import logging
 import os
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 
-from config import VOICE_LOG_CHANNEL_ID, VOICE_HOURS_FOR_ROLE, ROLE_BATMAN
+from config import VOICE_LOG_CHANNEL_ID, VOICE_HOURS_FOR_ROLE, ROLE_BATMAN, VOICE_CHECKPOINT_MINUTES
 from utils.command_manager import command_enabled
-from utils.database import voice_manager, db_manager, streak_manager, quest_manager, notification_manager, achievement_manager
+from utils.database import voice_manager, quest_manager, achievement_manager
 from utils.logging import log_voice_event
+from utils.event_pipeline import event_pipeline, EventKind
+from utils.delivery_queue import delivery_queue
 from utils.embed_style import hermes_embed, leaderboard_embed, Colors
+from utils.instrumentation import timed
 
 logger = logging.getLogger(__name__)
 
@@ -19,10 +22,14 @@ class VoiceCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self._sessions: dict[int, datetime] = {}
+        # Instant jusqu'où le temps de la session a déjà été crédité en base
+        self._credited: dict[int, datetime] = {}
         self._startup_check.start()
+        self._checkpoint_loop.start()
 
     def cog_unload(self):
         self._startup_check.cancel()
+        self._checkpoint_loop.cancel()
 
     @tasks.loop(count=1)
     async def _startup_check(self):
@@ -55,71 +62,118 @@ class VoiceCog(commands.Cog):
         if recovered:
             logger.info(f"Recovered {recovered} active voice sessions on startup")
 
-    async def _update_time(self, member: discord.Member, seconds: int, channel_id: int = None):
+    @tasks.loop(minutes=VOICE_CHECKPOINT_MINUTES)
+    async def _checkpoint_loop(self):
+        """Crédite le temps des sessions en cours et enregistre leur point de reprise."""
+        guild = self.bot.get_guild(int(os.getenv('GUILD_ID', '0')))
+        if not guild:
+            return
+        now = datetime.now(timezone.utc)
+        rows, previous = [], {}
+        for uid, started in list(self._sessions.items()):
+            member = guild.get_member(uid)
+            if not member:
+                continue
+            last = self._credited.get(uid, started)
+            secs = int((now - last).total_seconds())
+            channel = member.voice.channel.id if member.voice and member.voice.channel else None
+            rows.append((uid, member.name, channel, started, now, secs))
+            previous[uid] = self._credited.get(uid)
+            # Avancé avant l'écriture : une fin de session pendant l'attente part de ce point
+            self._credited[uid] = last + timedelta(seconds=secs)
         try:
-            from datetime import datetime, timezone
-            now = datetime.now(timezone.utc)
-            hour = now.hour
-            minutes = seconds // 60
-
-            await voice_manager.update_voice_time(member.id, member.name, seconds)
-
-            if hour >= 22 or hour < 6:
-                await db_manager.execute(
-                    "UPDATE user_voice_data SET voice_night_minutes = voice_night_minutes + $2 WHERE user_id = $1",
-                    member.id, minutes,
-                )
-            elif 6 <= hour < 9:
-                await db_manager.execute(
-                    "UPDATE user_voice_data SET voice_morning_minutes = voice_morning_minutes + $2 WHERE user_id = $1",
-                    member.id, minutes,
-                )
-
-            if channel_id:
-                await db_manager.execute("""
-                    INSERT INTO user_voice_channels (user_id, channel_id, total_time, visit_count)
-                    VALUES ($1, $2, $3, 1)
-                    ON CONFLICT (user_id, channel_id)
-                    DO UPDATE SET total_time = user_voice_channels.total_time + $3,
-                                  visit_count = user_voice_channels.visit_count + 1
-                """, member.id, channel_id, seconds)
-
-                count = await db_manager.fetchval(
-                    "SELECT COUNT(DISTINCT channel_id) FROM user_voice_channels WHERE user_id = $1",
-                    member.id,
-                )
-                await db_manager.execute(
-                    "UPDATE user_voice_data SET unique_voice_channels_count = $2 WHERE user_id = $1",
-                    member.id, count or 0,
-                )
-
-            await db_manager.execute("""
-                UPDATE user_voice_data
-                SET longest_session_minutes = GREATEST(longest_session_minutes, $2),
-                    total_voice_sessions = total_voice_sessions + 1,
-                    last_voice_date = CURRENT_DATE
-                WHERE user_id = $1
-            """, member.id, minutes)
+            await voice_manager.checkpoint_sessions(rows)
+        except Exception as e:
+            logger.error(f"Voice checkpoint error: {e}", exc_info=True)
+            for uid, name, _, started, _, secs in rows:
+                if self._sessions.get(uid) == started:
+                    # Session en cours : crédité au prochain point de reprise ou en fin de session
+                    last = previous[uid]
+                    if last is None:
+                        self._credited.pop(uid, None)
+                    else:
+                        self._credited[uid] = last
+                elif secs > 0:
+                    # Session terminée pendant l'attente, créditée depuis le point avancé :
+                    # l'intervalle de ce point de reprise raté est crédité à part
+                    await event_pipeline.submit(EventKind.VOICE, uid, voice_manager.update_voice_time,
+                                                uid, name, secs, droppable=False)
+
+    @_checkpoint_loop.before_loop
+    async def _before_checkpoint_loop(self):
+        await self.bot.wait_until_ready()
+        await self._recover_sessions()
+
+    async def _recover_sessions(self):
+        """Reprend les sessions encore actives depuis leur dernier point de reprise.
+
+        Au-delà de deux intervalles sans point de reprise (panne longue), la
+        session repart de maintenant plutôt que de créditer l'interruption.
+        Les points de reprise des membres sortis du vocal entre-temps sont
+        supprimés : leur temps jusqu'au dernier point est déjà crédité.
+        Les membres en vocal sans point de reprise démarrent une session
+        maintenant (on_ready du cog ne se déclenche pas au démarrage : les cogs
+        sont chargés après l'événement ready du bot).
+        """
+        guild = self.bot.get_guild(int(os.getenv('GUILD_ID', '0')))
+        if not guild:
+            return
+        try:
+            checkpoints = await voice_manager.get_checkpoints()
+        except Exception as e:
+            logger.error(f"Voice checkpoint recovery error: {e}")
+            return
+        now = datetime.now(timezone.utc)
+        max_gap = timedelta(minutes=2 * VOICE_CHECKPOINT_MINUTES)
+        resumed, stale = 0, []
+        for cp in checkpoints:
+            member = guild.get_member(cp['user_id'])
+            if not (member and member.voice and member.voice.channel):
+                stale.append(cp['user_id'])
+                continue
+            if now - cp['checkpoint_at'] <= max_gap:
+                self._sessions[member.id] = cp['started_at']
+                self._credited[member.id] = cp['checkpoint_at']
+                resumed += 1
+            else:
+                self._sessions[member.id] = now
+                self._credited.pop(member.id, None)
+        started = 0
+        for member in guild.members:
+            if member.voice and member.voice.channel and not member.bot and member.id not in self._sessions:
+                self._sessions[member.id] = now
+                started += 1
+        if stale:
+            await voice_manager.delete_checkpoints(stale)
+        if resumed:
+            logger.info(f"Resumed {resumed} voice sessions from checkpoints")
+        if started:
+            logger.info(f"Started {started} voice sessions for members already in voice")
+
+    @timed()
+    async def _update_time(self, member: discord.Member, seconds: int, channel_id: int = None,
+                           session_seconds: int = None):
+        """Termine une session : `seconds` restant à créditer, `session_seconds` durée totale."""
+        try:
+            if session_seconds is None:
+                session_seconds = seconds
+            hour = datetime.now(timezone.utc).hour
+            minutes = session_seconds // 60
+            night = minutes if (hour >= 22 or hour < 6) else 0
+            morning = minutes if 6 <= hour < 9 else 0
+
+            # Temps, salon, session, streak et totaux en un seul aller-retour
+            user_data = await voice_manager.end_session(
+                member.id, member.name, seconds, channel_id, night, morning,
+                session_seconds=session_seconds,
+            )
+            voice_max_streak = int(user_data.get('max_streak') or 0) if user_data else 0
 
             if minutes > 0:
                 xp_cog = self.bot.get_cog('XPCog')
                 if xp_cog:
                     await xp_cog.award_xp(member.id, minutes, 'voice')
 
-            await streak_manager.update_voice_streak(member.id)
-
-            # Sync consecutive_voice_days avec le vrai streak vocal
-            streak_row = await streak_manager.get_streak(member.id)
-            voice_max_streak = max(
-                int(streak_row.get('current_streak') or 0),
-                int(streak_row.get('max_streak') or 0),
-            ) if streak_row else 0
-            await db_manager.execute(
-                "UPDATE user_voice_data SET consecutive_voice_days = $2 WHERE user_id = $1",
-                member.id, voice_max_streak,
-            )
-
-            if minutes > 0:
                 completed_quests = await quest_manager.update_progress(member.id, 'voice_minutes', minutes)
                 if completed_quests:
                     quest_cog = self.bot.get_cog('WeeklyQuestsCog')
@@ -127,14 +181,11 @@ class VoiceCog(commands.Cog):
                         for q in completed_quests:
                             await quest_cog.notify(member.id, q)
 
-            # Fetch une seule fois pour ROLE_BATMAN et achievements
-            user_data = await voice_manager.get_user(member.id)
-
             if ROLE_BATMAN and user_data:
                 if user_data['total_time'] >= VOICE_HOURS_FOR_ROLE * 3600:
                     role = discord.utils.get(member.guild.roles, name=ROLE_BATMAN)
                     if role and role not in member.roles:
-                        await member.add_roles(role)
+                        await delivery_queue.add_role(member.id, ROLE_BATMAN, reason="Temps vocal")
 
             # Vérification achievements vocaux en temps réel (DM + rôle)
             try:
@@ -177,6 +228,7 @@ class VoiceCog(commands.Cog):
                 logger.warning(f"Pack des Vocaux check failed for {m.id}: {e}")
 
     @commands.Cog.listener()
+    @timed()
     async def on_voice_state_update(self, member: discord.Member,
                                      before: discord.VoiceState, after: discord.VoiceState):
         if member.bot:
@@ -188,29 +240,40 @@ class VoiceCog(commands.Cog):
         moved  = (before.channel is not None and after.channel is not None
                   and before.channel != after.channel)
 
+        # Les sessions sont horodatées ici ; le travail en base passe par le pipeline
+        # (temps vocal jamais rejeté, logs et Pack des Vocaux rejetables).
+        submit = event_pipeline.submit
         if joined:
             self._sessions[member.id] = now
-            await log_voice_event(self.bot, 'voice_join', member.id,
-                                  f"Rejoint **{after.channel.name}**", VOICE_LOG_CHANNEL_ID)
-            await self._check_pack_vocaux(after.channel)
+            await submit(EventKind.VOICE, member.id, log_voice_event, self.bot, 'voice_join', member.id,
+                         f"Rejoint **{after.channel.name}**", VOICE_LOG_CHANNEL_ID)
+            await submit(EventKind.VOICE, member.id, self._check_pack_vocaux, after.channel)
 
         elif left:
             if member.id in self._sessions:
-                secs = int((now - self._sessions.pop(member.id)).total_seconds())
+                started = self._sessions.pop(member.id)
+                credited = self._credited.pop(member.id, started)
+                secs = int((now - started).total_seconds())
                 if secs > 0:
-                    await self._update_time(member, secs, before.channel.id)
-            await log_voice_event(self.bot, 'voice_leave', member.id,
-                                  f"Quitté **{before.channel.name}**", VOICE_LOG_CHANNEL_ID)
+                    await submit(EventKind.VOICE, member.id, self._update_time, member,
+                                 max(0, int((now - credited).total_seconds())), before.channel.id, secs,
+                                 droppable=False)
+            await submit(EventKind.VOICE, member.id, log_voice_event, self.bot, 'voice_leave', member.id,
+                         f"Quitté **{before.channel.name}**", VOICE_LOG_CHANNEL_ID)
 
         elif moved:
             if member.id in self._sessions:
-                secs = int((now - self._sessions[member.id]).total_seconds())
+                started = self._sessions[member.id]
+                credited = self._credited.pop(member.id, started)
+                secs = int((now - started).total_seconds())
                 if secs > 0:
-                    await self._update_time(member, secs, before.channel.id)
+                    await submit(EventKind.VOICE, member.id, self._update_time, member,
+                                 max(0, int((now - credited).total_seconds())), before.channel.id, secs,
+                                 droppable=False)
                 self._sessions[member.id] = now
-            await log_voice_event(self.bot, 'voice_move', member.id,
-                                  f"**{before.channel.name}** → **{after.channel.name}**", VOICE_LOG_CHANNEL_ID)
-            await self._check_pack_vocaux(after.channel)
+            await submit(EventKind.VOICE, member.id, log_voice_event, self.bot, 'voice_move', member.id,
+                         f"**{before.channel.name}** → **{after.channel.name}**", VOICE_LOG_CHANNEL_ID)
+            await submit(EventKind.VOICE, member.id, self._check_pack_vocaux, after.channel)
 
     @app_commands.command(name="voicetime", description="Afficher le temps vocal d'un utilisateur")
     @command_enabled(guild_specific=True)
@@ -5,7 +5,9 @@ import os
 import discord
 from discord.ext import commands, tasks
 
-from utils.database import db_manager, notification_manager
+from config import UNLOCK_DMS_ENABLED
+from utils.database import db_manager, notification_manager, achievement_manager
+from utils.delivery_queue import delivery_queue, ensure_role
 from utils.embed_style import Colors
 
 logger = logging.getLogger(__name__)
@@ -36,9 +38,23 @@ class AchievementsNotifier(commands.Cog):
         self.bot = bot
         self._backfill_done = False
         self.backfill_roles.start()
+        self.refresh_catalogue.start()
 
     def cog_unload(self):
         self.backfill_roles.cancel()
+        self.refresh_catalogue.cancel()
+
+    @tasks.loop(minutes=10)
+    async def refresh_catalogue(self):
+        """Recharge l'index des achievements (seuils + déblocages) pour prendre en compte les modifs admin."""
+        try:
+            await achievement_manager.reload()
+        except Exception as e:
+            logger.warning(f"Rechargement catalogue achievements échoué: {e}")
+
+    @refresh_catalogue.before_loop
+    async def before_refresh_catalogue(self):
+        await self.bot.wait_until_ready()
 
     @tasks.loop(count=1)
     async def backfill_roles(self):
@@ -90,56 +106,37 @@ class AchievementsNotifier(commands.Cog):
 
     async def _ensure_role(self, guild: discord.Guild, role_name: str, color: discord.Color) -> discord.Role | None:
         """Retourne le rôle existant ou le crée."""
-        role = discord.utils.get(guild.roles, name=role_name)
-        if role:
-            return role
-        try:
-            role = await guild.create_role(
-                name=role_name,
-                color=color,
-                reason="Rôle achievement créé automatiquement par Hermes",
-            )
-            logger.info(f"Rôle achievement créé : '{role_name}'")
-            return role
-        except discord.Forbidden:
-            logger.warning(f"Permissions insuffisantes pour créer le rôle '{role_name}'")
-            return None
-        except Exception as e:
-            logger.error(f"Erreur création rôle '{role_name}': {e}")
-            return None
+        return await ensure_role(guild, role_name, color)
 
     async def notify(self, user_id: int, achievement_id: int):
+        """Met en file le rôle (et le DM regroupé si UNLOCK_DMS_ENABLED) puis crée la notification."""
         try:
-            ach = await db_manager.fetchrow(
+            ach = achievement_manager.get_cached(achievement_id) or await db_manager.fetchrow(
                 "SELECT * FROM achievements WHERE id = $1", achievement_id
             )
             if not ach:
                 return
 
-            _, tier_label = _tier(ach['points'])
+            color, tier_label = _tier(ach['points'])
             icon  = ach['icon'] or '🏆'
             name  = ach['name']
             desc  = ach['description'] or ''
 
-            # ── Rôle achievement ──────────────────────────────────────────
-            guild = self.bot.get_guild(GUILD_ID)
-            if guild:
-                role_name = f"{icon} {name}"
-                role_color = _TIER_ROLE_COLORS.get(tier_label, discord.Color(Colors.GREY))
-                role = await self._ensure_role(guild, role_name, role_color)
-                if role:
-                    member = guild.get_member(user_id)
-                    if member is None:
-                        try:
-                            member = await guild.fetch_member(user_id)
-                        except (discord.NotFound, discord.HTTPException):
-                            member = None
-                    if member and role not in member.roles:
-                        try:
-                            await member.add_roles(role, reason=f"Achievement débloqué : {name}")
-                            logger.info(f"Rôle '{role_name}' attribué à {user_id}")
-                        except discord.Forbidden:
-                            logger.warning(f"Impossible d'attribuer le rôle '{role_name}' à {user_id}")
+            role_color = _TIER_ROLE_COLORS.get(tier_label, discord.Color(Colors.GREY))
+            await delivery_queue.add_role(
+                user_id, f"{icon} {name}",
+                reason=f"Achievement débloqué : {name}",
+                create_color=role_color.value,
+            )
+            if UNLOCK_DMS_ENABLED:
+                await delivery_queue.send_dm(
+                    user_id,
+                    "🏆  Achievement débloqué !",
+                    f"{icon} **{name}** · {tier_label} · +{ach['points']} pts\n{desc}".rstrip(),
+                    coalesce_key='achievements',
+                    title_many="🏆  {n} achievements débloqués !",
+                    color=color,
+                )
 
             await notification_manager.create(
                 user_id, 'achievement',
@@ -4,6 +4,7 @@ import logging
 import discord
 from discord.ext import commands
 from utils.embed_style import hermes_embed, Colors
+from utils.instrumentation import timed
 
 logger = logging.getLogger(__name__)
 BUMP_CHANNEL_ID     = int(os.getenv('BUMP_CHANNEL_ID', '1068608173310754886'))
@@ -53,6 +54,7 @@ class BumpTrackerCog(commands.Cog):
         self.bot = bot
 
     @commands.Cog.listener()
+    @timed()
     async def on_message(self, message: discord.Message):
         if message.channel.id != BUMP_CHANNEL_ID:
             return
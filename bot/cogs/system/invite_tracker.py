@@ -2,6 +2,8 @@ import logging
 import discord
 from discord.ext import commands, tasks
 
+from utils.instrumentation import timed
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,6 +41,7 @@ class InviteTrackerCog(commands.Cog):
             logger.warning(f"Cannot fetch invites for guild {guild.id}: {e}")
 
     @commands.Cog.listener()
+    @timed()
     async def on_invite_create(self, invite: discord.Invite):
         if not invite.guild:
             return
@@ -54,6 +57,7 @@ class InviteTrackerCog(commands.Cog):
             )
 
     @commands.Cog.listener()
+    @timed()
     async def on_invite_delete(self, invite: discord.Invite):
         if not invite.guild:
             return
@@ -62,6 +66,7 @@ class InviteTrackerCog(commands.Cog):
         await invite_manager.deactivate_invite(invite.code)
 
     @commands.Cog.listener()
+    @timed()
     async def on_member_join(self, member: discord.Member):
         if member.bot:
             return
@@ -1,4 +1,8 @@
-"""Rafraîchissement périodique des métriques Prometheus."""
+"""État du bot pour Prometheus.
+
+Les KPI en base sont calculés au scrape par `metrics.collector` ; ce cog ne
+fait que suivre l'état de connexion et fournir la guilde au collecteur.
+"""
 import logging
 import os
 from discord.ext import commands, tasks
@@ -10,24 +14,24 @@ logger = logging.getLogger(__name__)
 class MetricsUpdaterCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.refresh_metrics.start()
+        bot_metrics.collector.set_guild_provider(self._guild)
+        self.refresh_ready.start()
 
     def cog_unload(self):
-        self.refresh_metrics.cancel()
+        self.refresh_ready.cancel()
+        bot_metrics.collector.set_guild_provider(None)
 
     def _guild(self):
         return self.bot.get_guild(int(os.getenv('GUILD_ID', '0')))
 
     @tasks.loop(seconds=60)
-    async def refresh_metrics(self):
+    async def refresh_ready(self):
         bot_metrics.bot_ready.set(1 if self.bot.is_ready() else 0)
-        await bot_metrics.refresh(guild=self._guild())
 
-    @refresh_metrics.before_loop
+    @refresh_ready.before_loop
     async def before_refresh(self):
         await self.bot.wait_until_ready()
         bot_metrics.bot_ready.set(1)
-        await bot_metrics.refresh(guild=self._guild())
         logger.info("Prometheus metrics initialized")
 
 
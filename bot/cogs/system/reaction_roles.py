@@ -7,6 +7,7 @@ import discord
 from discord.ext import commands, tasks
 
 from utils.embed_style import Colors, FOOTER_TEXT, hermes_embed
+from utils.instrumentation import timed
 
 logger = logging.getLogger(__name__)
 
@@ -145,6 +146,7 @@ class ReactionRoles(commands.Cog):
                     logger.warning(f"Impossible d'ajouter la réaction {emoji}: {e}")
 
     @commands.Cog.listener()
+    @timed()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
         if payload.message_id != self.message_id:
             return
@@ -172,6 +174,7 @@ class ReactionRoles(commands.Cog):
             pass
 
     @commands.Cog.listener()
+    @timed()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
         if payload.message_id != self.message_id:
             return
@@ -5,6 +5,7 @@ Contrôle staff : /ticket close | /ticket add | /ticket remove | /ticket list
 """
 
 import io
+import gzip
 import html
 import asyncio
 import logging
@@ -37,8 +38,59 @@ def _slug(text: str, max_len: int = 20) -> str:
     return text[:max_len] or "ticket"
 
 
+_TRANSCRIPT_HEAD = (
+    '<!DOCTYPE html><html lang="fr"><head><meta charset="UTF-8">'
+    '<title>Ticket #{num}</title>'
+    '<style>*{{box-sizing:border-box;margin:0;padding:0}}'
+    'body{{background:#36393f;color:#dcddde;font-family:Arial,sans-serif;line-height:1.4}}'
+    '.hd{{background:#2f3136;padding:20px;border-bottom:2px solid #202225}}'
+    '.hd h1{{color:#fff}}.hd p{{color:#8e9297;font-size:.85em;margin-top:4px}}'
+    '.mg{{display:flex;align-items:flex-start;padding:8px 16px}}.mg:hover{{background:#32353b}}'
+    '.av{{width:40px;height:40px;border-radius:50%;background:#5865f2;margin-right:14px;'
+    'flex-shrink:0;display:flex;align-items:center;justify-content:center;color:#fff;font-weight:700}}'
+    '.mc{{flex:1;min-width:0}}.mh{{display:flex;align-items:baseline;gap:8px;flex-wrap:wrap}}'
+    '.un{{font-weight:700;color:#fff}}.bt{{background:#5865f2;color:#fff;font-size:.6em;padding:1px 5px;border-radius:3px}}'
+    '.ts{{color:#72767d;font-size:.72em}}.mt{{margin-top:3px;white-space:pre-wrap;word-break:break-word}}'
+    '.emb{{border-left:4px solid #5865f2;background:#2f3136;border-radius:0 4px 4px 0;'
+    'padding:10px 14px;margin-top:6px;max-width:520px}}'
+    '.att{{margin-top:4px;font-size:.85em}}.att a{{color:#00b0f4}}'
+    '.ft{{background:#2f3136;padding:14px;text-align:center;color:#72767d;font-size:.78em;'
+    'border-top:1px solid #202225}}</style></head>'
+    '<body><div class="hd">'
+    '<h1>🎫 Transcript — Ticket #{num} ({channel})</h1>'
+    '<p>Généré le {generated} • {guild}</p></div>'
+)
+_TRANSCRIPT_FOOT = '<div class="ft">Hermes — Système de tickets</div></body></html>'
+
+
+def _message_html(msg: discord.Message) -> str:
+    parts = [
+        f'<div class="mg"><div class="av">{html.escape(msg.author.display_name[:2].upper())}</div>'
+        f'<div class="mc"><div class="mh"><span class="un">{html.escape(str(msg.author))}</span>'
+    ]
+    if msg.author.bot:
+        parts.append('<span class="bt">BOT</span>')
+    parts.append(f'<span class="ts">{msg.created_at.strftime("%d/%m/%Y %H:%M:%S")}</span></div>')
+    if msg.content:
+        parts.append(f'<div class="mt">{html.escape(msg.content)}</div>')
+    for emb in msg.embeds:
+        parts.append('<div class="emb">')
+        if emb.title:
+            parts.append(f'<b>{html.escape(emb.title)}</b><br>')
+        if emb.description:
+            parts.append(f'<span>{html.escape(emb.description)}</span>')
+        for fld in emb.fields:
+            parts.append(f'<div><b>{html.escape(fld.name)}</b>: {html.escape(fld.value)}</div>')
+        parts.append('</div>')
+    for a in msg.attachments:
+        parts.append(f'<div class="att">📎 <a href="{html.escape(a.url)}">{html.escape(a.filename)}</a></div>')
+    parts.append('</div></div>')
+    return "".join(parts)
+
+
 # ── Vue de contrôle (persistante – survit au restart) ─────────────────────────
 
+
 class TicketControlView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -254,8 +306,19 @@ class Tickets(commands.Cog):
         if not view.confirmed:
             return
 
-        transcript_bytes = await self._html_transcript(interaction.channel, ticket["ticket_number"])
+        transcript_gz, raw_size, msg_count = await self._html_transcript(
+            interaction.channel, ticket["ticket_number"]
+        )
         filename = f"ticket-{ticket['ticket_number']:04d}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.html"
+        # Limite d'upload de la guilde (boosts) : HTML brut, sinon .html.gz, sinon aucun fichier
+        upload_limit = interaction.guild.filesize_limit
+        if raw_size <= upload_limit:
+            # Décompressé à la volée pendant l'upload, sans reconstituer le HTML en mémoire
+            upload = discord.File(gzip.GzipFile(fileobj=io.BytesIO(transcript_gz)), filename=filename)
+        elif len(transcript_gz) <= upload_limit:
+            upload = discord.File(io.BytesIO(transcript_gz), filename=filename + ".gz")
+        else:
+            upload = None
 
         user = interaction.guild.get_member(ticket["user_id"])
 
@@ -269,16 +332,33 @@ class Tickets(commands.Cog):
             t_embed.add_field(name="Salon", value=interaction.channel.name)
             t_embed.add_field(name="Ouvert par", value=user.mention if user else f"`{ticket['user_id']}`")
             t_embed.add_field(name="Fermé par", value=interaction.user.mention)
+            if upload is None:
+                t_embed.add_field(
+                    name="Transcript",
+                    value=f"Trop volumineux pour Discord : disponible dans le panel admin "
+                          f"(`/tickets/{ticket['id']}/transcript`)",
+                    inline=False,
+                )
             t_embed.set_footer(text=f"Ticket #{ticket['ticket_number']:04d}")
-            await trans_ch.send(
-                embed=t_embed,
-                file=discord.File(io.BytesIO(transcript_bytes), filename=filename),
+            # Un échec d'envoi ne doit pas empêcher la fermeture ni la sauvegarde du transcript
+            try:
+                if upload is None:
+                    await trans_ch.send(embed=t_embed)
+                else:
+                    await trans_ch.send(embed=t_embed, file=upload)
+            except discord.HTTPException as e:
+                logger.warning(f"Envoi du transcript du ticket #{ticket['ticket_number']} échoué: {e}")
+
+        await db_manager.execute("""
+            WITH t AS (
+                INSERT INTO ticket_transcripts (ticket_id, encoding, data, raw_size, message_count)
+                VALUES ($1, 'gzip', $2, $3, $4)
+                ON CONFLICT (ticket_id) DO UPDATE
+                  SET encoding = EXCLUDED.encoding, data = EXCLUDED.data, raw_size = EXCLUDED.raw_size,
+                      message_count = EXCLUDED.message_count, created_at = NOW()
             )
-
-        await db_manager.execute(
-            "UPDATE tickets SET status = 'closed', closed_at = NOW(), transcript_html = $2 WHERE id = $1",
-            ticket["id"], transcript_bytes.decode("utf-8"),
-        )
+            UPDATE tickets SET status = 'closed', closed_at = NOW() WHERE id = $1
+        """, ticket["id"], transcript_gz, raw_size, msg_count)
 
         # Renommer le salon : ticket-pseudo✅
         try:
@@ -341,58 +421,34 @@ class Tickets(commands.Cog):
 
     # ── HTML transcript ───────────────────────────────────────────────────────
 
-    async def _html_transcript(self, channel: discord.TextChannel, ticket_num: int) -> bytes:
-        messages_html = ""
-        async for msg in channel.history(limit=500, oldest_first=True):
-            content = html.escape(msg.content) if msg.content else ""
-            embed_html = ""
-            for emb in msg.embeds:
-                embed_html += '<div class="emb">'
-                if emb.title:
-                    embed_html += f'<b>{html.escape(emb.title)}</b><br>'
-                if emb.description:
-                    embed_html += f'<span>{html.escape(emb.description)}</span>'
-                for fld in emb.fields:
-                    embed_html += f'<div><b>{html.escape(fld.name)}</b>: {html.escape(fld.value)}</div>'
-                embed_html += "</div>"
-            attach_html = "".join(
-                f'<div class="att">📎 <a href="{a.url}">{html.escape(a.filename)}</a></div>'
-                for a in msg.attachments
-            )
-            bot_tag = '<span class="bt">BOT</span>' if msg.author.bot else ""
-            ts = msg.created_at.strftime("%d/%m/%Y %H:%M:%S")
-            initials = msg.author.display_name[:2].upper()
-            content_div = '<div class="mt">' + content + '</div>' if content else ''
-            messages_html += (
-                f'<div class="mg"><div class="av">{initials}</div><div class="mc">'
-                f'<div class="mh"><span class="un">{html.escape(str(msg.author))}</span>'
-                f'{bot_tag}<span class="ts">{ts}</span></div>'
-                f'{content_div}{embed_html}{attach_html}</div></div>'
-            )
-        doc = (
-            f'<!DOCTYPE html><html lang="fr"><head><meta charset="UTF-8">'
-            f'<title>Ticket #{ticket_num:04d}</title>'
-            f'<style>*{{box-sizing:border-box;margin:0;padding:0}}'
-            f'body{{background:#36393f;color:#dcddde;font-family:Arial,sans-serif;line-height:1.4}}'
-            f'.hd{{background:#2f3136;padding:20px;border-bottom:2px solid #202225}}'
-            f'.hd h1{{color:#fff}}.hd p{{color:#8e9297;font-size:.85em;margin-top:4px}}'
-            f'.mg{{display:flex;align-items:flex-start;padding:8px 16px}}.mg:hover{{background:#32353b}}'
-            f'.av{{width:40px;height:40px;border-radius:50%;background:#5865f2;margin-right:14px;'
-            f'flex-shrink:0;display:flex;align-items:center;justify-content:center;color:#fff;font-weight:700}}'
-            f'.mc{{flex:1;min-width:0}}.mh{{display:flex;align-items:baseline;gap:8px;flex-wrap:wrap}}'
-            f'.un{{font-weight:700;color:#fff}}.bt{{background:#5865f2;color:#fff;font-size:.6em;padding:1px 5px;border-radius:3px}}'
-            f'.ts{{color:#72767d;font-size:.72em}}.mt{{margin-top:3px;white-space:pre-wrap;word-break:break-word}}'
-            f'.emb{{border-left:4px solid #5865f2;background:#2f3136;border-radius:0 4px 4px 0;'
-            f'padding:10px 14px;margin-top:6px;max-width:520px}}'
-            f'.att{{margin-top:4px;font-size:.85em}}.att a{{color:#00b0f4}}'
-            f'.ft{{background:#2f3136;padding:14px;text-align:center;color:#72767d;font-size:.78em;'
-            f'border-top:1px solid #202225}}</style></head>'
-            f'<body><div class="hd">'
-            f'<h1>🎫 Transcript — Ticket #{ticket_num:04d} ({html.escape(channel.name)})</h1>'
-            f'<p>Généré le {datetime.now().strftime("%d/%m/%Y à %H:%M:%S")} • {html.escape(channel.guild.name)}</p></div>'
-            f'{messages_html}<div class="ft">Hermes — Système de tickets</div></body></html>'
-        )
-        return doc.encode("utf-8")
+    async def _html_transcript(self, channel: discord.TextChannel, ticket_num: int) -> tuple[bytes, int, int]:
+        """Génère le transcript HTML complet en flux, compressé en gzip au fil de l'eau.
+
+        L'historique est parcouru sans limite (pagination de discord.py) et chaque
+        message est écrit directement dans le flux gzip. Retourne
+        (html_gzip, taille_html, nombre_de_messages).
+        """
+        buf = io.BytesIO()
+        raw_size = 0
+        count = 0
+        with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=6) as gz:
+            def write(text: str):
+                nonlocal raw_size
+                data = text.encode("utf-8")
+                raw_size += len(data)
+                gz.write(data)
+
+            write(_TRANSCRIPT_HEAD.format(
+                num=f"{ticket_num:04d}",
+                channel=html.escape(channel.name),
+                generated=datetime.now().strftime("%d/%m/%Y à %H:%M:%S"),
+                guild=html.escape(channel.guild.name),
+            ))
+            async for msg in channel.history(limit=None, oldest_first=True):
+                write(_message_html(msg))
+                count += 1
+            write(_TRANSCRIPT_FOOT)
+        return buf.getvalue(), raw_size, count
 
     # ── Slash commands de gestion ─────────────────────────────────────────────
 
@@ -4,6 +4,8 @@ import os
 import discord
 from discord.ext import commands
 
+from utils.instrumentation import timed
+
 logger = logging.getLogger(__name__)
 
 WELCOME_CHANNEL_ID = int(os.getenv("WELCOME_CHANNEL_ID", 0))
@@ -14,6 +16,7 @@ class WelcomeCog(commands.Cog):
         self.bot = bot
 
     @commands.Cog.listener()
+    @timed()
     async def on_member_join_tracked(self, member: discord.Member, used_invite: discord.Invite | None):
         channel = member.guild.get_channel(WELCOME_CHANNEL_ID)
         if channel is None:
@@ -50,6 +53,7 @@ class WelcomeCog(commands.Cog):
             logger.error(f"Failed to send welcome message: {e}")
 
     @commands.Cog.listener()
+    @timed()
     async def on_member_remove(self, member: discord.Member):
         if member.bot:
             return
@@ -1,18 +1,20 @@
 import os
 import asyncio
+import hashlib
 import logging
 from datetime import datetime, timedelta
 from io import BytesIO
-from collections import Counter
 
 import discord
+import numpy as np
 from discord import app_commands
 from discord.ext import commands, tasks
-import requests
 from bs4 import BeautifulSoup
 from PIL import Image
 
 from utils.command_manager import command_enabled
+from utils.database import db_manager
+from utils.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -28,19 +30,39 @@ MONTHS_EN_FR = {
 }
 
 
-def _get_dominant_color(image_url: str) -> discord.Color:
+ARTICLES_URL = "https://animotaku.fr/actualite-manga-anime/"
+_PARSER_VERSION = 1     # à incrémenter si _parse_articles change : invalide le cache parsé
+
+
+def _dominant_rgb(data: bytes) -> tuple:
+    """Couleur dominante : histogramme 32×32×32 vectorisé, moyenne des pixels du bac le plus peuplé."""
+    img = Image.open(BytesIO(data))
+    img.draft('RGB', (128, 128))            # décodage JPEG réduit, sans décoder l'image entière
+    px = np.asarray(img.convert('RGB').resize((64, 64)), dtype=np.uint8).reshape(-1, 3)
+    q = px >> 3
+    bins = (q[:, 0].astype(np.int32) << 10) | (q[:, 1].astype(np.int32) << 5) | q[:, 2]
+    top = np.bincount(bins, minlength=1 << 15).argmax()
+    r, g, b = px[bins == top].mean(axis=0).round().astype(int)
+    return int(r), int(g), int(b)
+
+
+async def _get_dominant_color(image_url: str) -> discord.Color:
+    key = f"color:{image_url}"
+    cached = http_client.cache.get_json(key)
+    if cached is not None:
+        return discord.Color(cached)
     try:
-        resp = requests.get(image_url, timeout=10)
-        img = Image.open(BytesIO(resp.content)).resize((100, 100)).convert('RGB')
-        dominant = Counter(img.getdata()).most_common(1)[0][0]
-        return discord.Color.from_rgb(*dominant)
+        resp = await http_client.get(image_url)
+        rgb = await asyncio.to_thread(_dominant_rgb, resp.body)
+        color = discord.Color.from_rgb(*rgb)
+        await asyncio.to_thread(http_client.cache.set_json, key, color.value)
+        return color
     except Exception:
         return discord.Color.blurple()
 
 
-def _fetch_articles() -> list:
-    r = requests.get("https://animotaku.fr/actualite-manga-anime/", timeout=15)
-    soup = BeautifulSoup(r.text, "html.parser")
+def _parse_articles(html: str) -> list:
+    soup = BeautifulSoup(html, "html.parser")
     articles = []
     for container in soup.find_all("div", class_="elementor-posts-container"):
         for article in container.find_all("article", class_="elementor-post"):
@@ -64,6 +86,43 @@ def _fetch_articles() -> list:
     return articles
 
 
+async def _fetch_articles() -> list:
+    """Liste des articles ; sur 304 (page inchangée) la liste parsée est relue depuis le cache."""
+    resp = await http_client.get(ARTICLES_URL, conditional=True)
+    key = f"articles:{ARTICLES_URL}:v{_PARSER_VERSION}"
+    if not resp.changed:
+        cached = http_client.cache.get_json(key)
+        if cached is not None:
+            return [tuple(a) for a in cached]
+    articles = await asyncio.to_thread(_parse_articles, resp.text())
+    await asyncio.to_thread(http_client.cache.set_json, key, articles)
+    return articles
+
+
+def _article_key(link: str) -> str:
+    return hashlib.md5(link.encode()).hexdigest()
+
+
+async def _claim_unsent(articles: list) -> list:
+    """Réserve les articles jamais envoyés (sent_articles) et retourne uniquement ceux-là."""
+    if not articles:
+        return []
+    keys = [_article_key(a[1]) for a in articles]
+    rows = await db_manager.fetch("""
+        INSERT INTO sent_articles (article_hash, url, title)
+        SELECT * FROM unnest($1::text[], $2::text[], $3::text[])
+        ON CONFLICT (article_hash) DO NOTHING
+        RETURNING article_hash
+    """, keys, [a[1] for a in articles], [a[0] for a in articles])
+    claimed = {r['article_hash'] for r in rows}
+    return [a for a, k in zip(articles, keys) if k in claimed]
+
+
+async def _release(article: tuple):
+    """Envoi échoué : l'article pourra repartir au prochain passage."""
+    await db_manager.execute("DELETE FROM sent_articles WHERE article_hash = $1", _article_key(article[1]))
+
+
 def _filter_yesterday(articles: list) -> list:
     yesterday = datetime.now() - timedelta(days=1)
     day = yesterday.strftime("%d").lstrip("0")
@@ -92,7 +151,7 @@ class AnimeCog(commands.Cog):
             else:
                 category = ""
 
-            color = await asyncio.to_thread(_get_dominant_color, thumbnail) if thumbnail else discord.Color.blurple()
+            color = await _get_dominant_color(thumbnail) if thumbnail else discord.Color.blurple()
 
             embed = discord.Embed(
                 title=f"{category} News !" if category else "News !",
@@ -111,7 +170,11 @@ class AnimeCog(commands.Cog):
                 embed.set_thumbnail(url=ANIME_THUMBNAIL_URL)
             embed.set_footer(text=f"📰 Date de publication : {date}\nFonctionnalité développée par Yù")
 
-            await channel.send(embed=embed)
+            try:
+                await channel.send(embed=embed)
+            except discord.HTTPException as e:
+                logger.warning(f"AnimeCog: envoi impossible pour {link}: {e}")
+                await _release((title, link, date, thumbnail))
 
     @tasks.loop(hours=24)
     async def anime_check(self):
@@ -122,9 +185,8 @@ class AnimeCog(commands.Cog):
             logger.warning("AnimeCog: canal ANIME_NEWS_CHANNEL_ID introuvable")
             return
         try:
-            articles = await asyncio.to_thread(_fetch_articles)
-            articles = _filter_yesterday(articles)
-            logger.info(f"AnimeCog: {len(articles)} article(s) trouvé(s) pour hier")
+            articles = await _claim_unsent(_filter_yesterday(await _fetch_articles()))
+            logger.info(f"AnimeCog: {len(articles)} nouvel(s) article(s) pour hier")
             if articles:
                 await self._send_articles(channel, articles)
         except Exception as e:
@@ -145,10 +207,9 @@ class AnimeCog(commands.Cog):
         if not channel:
             await interaction.followup.send("⚠️ Canal introuvable.", ephemeral=True)
             return
-        articles = await asyncio.to_thread(_fetch_articles)
-        articles = _filter_yesterday(articles)
+        articles = await _claim_unsent(_filter_yesterday(await _fetch_articles()))
         if not articles:
-            await interaction.followup.send("📭 Aucun article publié hier.", ephemeral=True)
+            await interaction.followup.send("📭 Aucun nouvel article publié hier.", ephemeral=True)
             return
         await self._send_articles(channel, articles)
         await interaction.followup.send(f"✅ {len(articles)} article(s) envoyé(s).", ephemeral=True)
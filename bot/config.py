@@ -29,6 +29,30 @@ DISCORD_WEBHOOK_URL    = os.getenv('DISCORD_WEBHOOK_URL', '')
 BOT_API_TOKEN = os.getenv('BOT_API_TOKEN', '')
 BOT_API_PORT  = int(os.getenv('BOT_API_PORT', '8001'))
 
+# Tampon write-behind des compteurs de messages (voir utils/write_buffer.py)
+MESSAGE_FLUSH_SECONDS     = float(os.getenv('MESSAGE_FLUSH_SECONDS', '5'))
+MESSAGE_FLUSH_MAX_PENDING = int(os.getenv('MESSAGE_FLUSH_MAX_PENDING', '500'))
+
+# Pipeline d'événements (voir utils/event_pipeline.py)
+EVENT_WORKERS     = int(os.getenv('EVENT_WORKERS', '4'))
+EVENT_QUEUE_SIZE  = int(os.getenv('EVENT_QUEUE_SIZE', '2000'))
+EVENT_DROP_POLICY = os.getenv('EVENT_DROP_POLICY', 'drop_oldest')   # drop_oldest | drop_new
+
+# Seuil du journal des requêtes lentes (voir utils/query_stats.py)
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '250'))
+
+# Cache disque du client HTTP partagé (voir utils/http_client.py)
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', 'cache')
+
+# Durée de cache des KPI Prometheus calculés au scrape (voir metrics.py)
+METRICS_CACHE_SECONDS = float(os.getenv('METRICS_CACHE_SECONDS', '60'))
+
+# DM aux membres à chaque achievement débloqué / défi complété (désactivé par défaut)
+UNLOCK_DMS_ENABLED = os.getenv('UNLOCK_DMS_ENABLED', 'false').lower() == 'true'
+
+# Points de reprise des sessions vocales (voir cogs/moderation/voice.py)
+VOICE_CHECKPOINT_MINUTES = float(os.getenv('VOICE_CHECKPOINT_MINUTES', '5'))
+
 
 ACHIEVEMENTS_CHANNEL_ID    = int(os.getenv('ACHIEVEMENTS_CHANNEL_ID', '0') or '0') or None
 REACTION_ROLE_CHANNEL_ID   = int(os.getenv('REACTION_ROLE_CHANNEL_ID', '836712775194771486') or '836712775194771486')
@@ -17,13 +17,24 @@ load_dotenv()
 
 from config import validate_config, BOT_API_PORT
 from utils.constants import cogs_names
-from utils.database import init_database, voice_manager, message_stats_manager, db_manager, achievement_manager, command_stats_manager
+from utils.database import (
+    init_database, voice_manager, achievement_manager,
+    command_stats_manager, user_totals_manager,
+)
 from utils.command_manager import init_command_status_table
+from utils.write_buffer import message_buffer
+from utils.event_pipeline import event_pipeline, EventKind
+from utils.delivery_queue import delivery_queue
+from utils.scheduler import scheduler
+from utils.http_client import http_client
+from utils import achievement_image
+from utils.instrumentation import timed, instrument_http, finish_command, InstrumentedTree
 from utils.embed_style import hermes_embed, Colors
 
 console = Console()
 intents  = discord.Intents.all()
-bot      = commands.Bot(command_prefix='!', intents=intents)
+bot      = commands.Bot(command_prefix='!', intents=intents, tree_cls=InstrumentedTree)
+instrument_http(bot)
 _first_ready = True
 
 
@@ -80,27 +91,37 @@ async def on_ready():
     except Exception as e:
         console.print(f"[yellow]⚠️ API bot non disponible: {e}[/yellow]")
 
+    # Workers démarrés même si la base échoue : sinon les handlers bloquent sur une file pleine
+    event_pipeline.start()
+    delivery_queue.start(bot)
+
     # Database
     try:
         await init_database()
         await init_command_status_table()
+        message_buffer.start()
         console.print("[green]✅ Base de données prête[/green]")
     except Exception as e:
         console.print(f"[red]❌ DB: {e}[/red]")
         return
 
-    # Sync members — reset is_member first so leavers are marked FALSE
+    # Sync members — one COPY + merge; leavers are marked FALSE in the same pass
     try:
         await guild.chunk(cache=True)
-        await voice_manager.db.execute("UPDATE user_voice_data SET is_member = FALSE")
-        synced = 0
-        for member in guild.members:
-            if not member.bot:
-                avatar = str(member.avatar.url) if member.avatar else None
-                nick   = member.nick if member.nick != member.name else None
-                await voice_manager.sync_member(member.id, member.name, nick, avatar)
-                synced += 1
-        console.print(f"[green]✅ {synced} membres synchronisés[/green]")
+        members = [
+            (
+                member.id,
+                member.name,
+                member.nick if member.nick != member.name else None,
+                str(member.avatar.url) if member.avatar else None,
+            )
+            for member in guild.members if not member.bot
+        ]
+        result = await voice_manager.sync_members_bulk(members)
+        console.print(
+            f"[green]✅ {len(members)} membres synchronisés "
+            f"({result['inserted']} nouveaux, {result['updated']} modifiés, {result['departed']} partis)[/green]"
+        )
     except Exception as e:
         console.print(f"[yellow]⚠️ Sync membres: {e}[/yellow]")
 
@@ -125,6 +146,8 @@ async def on_ready():
         logger.warning(f"Impossible d'envoyer le message de démarrage: {e}")
 
     await load_cogs()
+    # Après les cogs : ils enregistrent les handlers des actions planifiées
+    scheduler.start()
 
     # Sync slash commands
     try:
@@ -135,20 +158,54 @@ async def on_ready():
         console.print(f"[red]❌ Sync commandes: {e}[/red]")
 
 
+async def _on_messages_flushed(per_user: dict[int, int]):
+    """Traitements dérivés des compteurs de messages, une fois par utilisateur et par flush."""
+    from utils.database import quest_manager
+    quest_cog = bot.get_cog('WeeklyQuestsCog')
+    notifier  = bot.get_cog('AchievementsNotifier')
+    for user_id, count in per_user.items():
+        try:
+            completed = await quest_manager.update_progress(user_id, 'messages', count)
+            if completed and quest_cog:
+                for q in completed:
+                    await quest_cog.notify(user_id, q)
+
+            if notifier:
+                totals = await user_totals_manager.get(user_id)
+                msg_total    = int(totals['messages'])          if totals else 0
+                msg_channels = int(totals['distinct_channels']) if totals else 0
+                for ct, val in [
+                    ('messages',               msg_total),
+                    ('messages_multi_channel', msg_channels),
+                ]:
+                    unlocked = await achievement_manager.check_and_unlock(user_id, ct, val)
+                    for a in unlocked:
+                        await notifier.notify(user_id, a['id'])
+        except Exception as e:
+            logger.warning(f"Message flush follow-up failed for {user_id}: {e}")
+
+
+message_buffer.on_flush(_on_messages_flushed)
+
+
 @bot.event
+@timed()
 async def on_message(message: discord.Message):
     if message.author.bot:
         return
 
-    # Track message stats
-    try:
-        await message_stats_manager.increment(message.author.id, message.channel.id)
-    except Exception as e:
-        logger.warning(f"Erreur tracking message stats: {e}")
+    # Compteurs de messages : agrégés en mémoire, écrits par lots (write-behind)
+    message_buffer.add(message.author.id, message.channel.id)
 
     await bot.process_commands(message)
 
-    # Award XP et tracking streak/quêtes pour chaque message
+    if message.guild:
+        await event_pipeline.submit(EventKind.MESSAGE, message.author.id, _process_message, message)
+
+
+@timed()
+async def _process_message(message: discord.Message):
+    """Award XP et tracking streak pour chaque message (exécuté par le pipeline)."""
     try:
         if not message.author.bot and message.guild:
             xp_cog = bot.get_cog('XPCog')
@@ -157,12 +214,6 @@ async def on_message(message: discord.Message):
                 await xp_cog.award_xp(message.author.id, XP_MESSAGE, 'message', channel=message.channel)
             from utils.database import streak_manager, quest_manager
             streak_result = await streak_manager.update_message_streak(message.author.id)
-            completed = await quest_manager.update_progress(message.author.id, 'messages', 1)
-            if completed:
-                quest_cog = bot.get_cog('WeeklyQuestsCog')
-                if quest_cog:
-                    for q in completed:
-                        await quest_cog.notify(message.author.id, q)
 
             if message.attachments:
                 _image_types = ('image/', 'video/')
@@ -179,26 +230,16 @@ async def on_message(message: discord.Message):
                         if quest_cog:
                             for q in completed:
                                 await quest_cog.notify(message.author.id, q)
-            # Achievements messages en temps réel
+            # Le streak ne bouge qu'au premier message du jour : inutile de vérifier avant
             try:
                 notifier = bot.get_cog('AchievementsNotifier')
-                if notifier:
-                    stats = await db_manager.fetchrow("""
-                        SELECT COALESCE(SUM(message_count), 0) AS total,
-                               COUNT(DISTINCT channel_id)       AS channels
-                        FROM user_message_stats WHERE user_id = $1
-                    """, message.author.id)
-                    msg_total    = int(stats['total']    or 0) if stats else 0
-                    msg_channels = int(stats['channels'] or 0) if stats else 0
-                    msg_streak   = int(streak_result.get('streak') or 0) if streak_result else 0
-                    for ct, val in [
-                        ('messages',               msg_total),
-                        ('messages_multi_channel', msg_channels),
-                        ('message_streak_days',    msg_streak),
-                    ]:
-                        unlocked = await achievement_manager.check_and_unlock(message.author.id, ct, val)
-                        for a in unlocked:
-                            await notifier.notify(message.author.id, a['id'])
+                if notifier and streak_result and streak_result.get('messages_today') == 1:
+                    msg_streak = int(streak_result.get('streak') or 0)
+                    unlocked = await achievement_manager.check_and_unlock(
+                        message.author.id, 'message_streak_days', msg_streak
+                    )
+                    for a in unlocked:
+                        await notifier.notify(message.author.id, a['id'])
             except Exception as e:
                 logger.warning(f"Message achievement check failed: {e}")
 
@@ -207,25 +248,18 @@ async def on_message(message: discord.Message):
 
 
 @bot.event
+@timed()
 async def on_app_command_completion(interaction: discord.Interaction, command: discord.app_commands.Command):
+    finish_command(interaction)
     if interaction.user.bot:
         return
     try:
-        await command_stats_manager.increment(interaction.user.id, command.name)
+        counts = await command_stats_manager.increment(interaction.user.id, command.name)
         notifier = bot.get_cog('AchievementsNotifier')
         if notifier:
-            total_cmds = await db_manager.fetchval(
-                "SELECT COALESCE(SUM(usage_count), 0) FROM user_command_stats WHERE user_id = $1",
-                interaction.user.id,
-            ) or 0
-            to_check = [('commands_used', int(total_cmds))]
+            to_check = [('commands_used', int(counts['commands_used']))]
             if command.name in ('blague', 'confess'):
-                cmd_count = await db_manager.fetchval(
-                    "SELECT COALESCE(usage_count, 0) FROM user_command_stats"
-                    " WHERE user_id = $1 AND command_name = $2",
-                    interaction.user.id, command.name,
-                ) or 0
-                to_check.append((f'{command.name}_count', int(cmd_count)))
+                to_check.append((f'{command.name}_count', int(counts['usage_count'])))
             for ct, val in to_check:
                 unlocked = await achievement_manager.check_and_unlock(interaction.user.id, ct, val)
                 for a in unlocked:
@@ -235,34 +269,49 @@ async def on_app_command_completion(interaction: discord.Interaction, command: d
 
 
 @bot.event
+@timed()
 async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
     if bot.user and payload.user_id == bot.user.id:
         return
+    await event_pipeline.submit(EventKind.REACTION, payload.user_id, _process_reaction, payload.user_id)
+
+
+@timed()
+async def _process_reaction(user_id: int):
     try:
         from utils.database import quest_manager
-        completed = await quest_manager.update_progress(payload.user_id, 'reactions_given', 1)
+        completed = await quest_manager.update_progress(user_id, 'reactions_given', 1)
         if completed:
             quest_cog = bot.get_cog('WeeklyQuestsCog')
             if quest_cog:
                 for q in completed:
-                    await quest_cog.notify(payload.user_id, q)
+                    await quest_cog.notify(user_id, q)
     except Exception as e:
         logger.warning(f"Reaction quest tracking: {e}")
 
 
 @bot.event
+@timed()
 async def on_member_join(member: discord.Member):
     if member.bot:
         return
     avatar = str(member.avatar.url) if member.avatar else None
-    await voice_manager.sync_member(member.id, member.name, None, avatar)
+    await event_pipeline.submit(
+        EventKind.MEMBER_JOIN, member.id,
+        voice_manager.sync_member, member.id, member.name, None, avatar,
+        droppable=False,
+    )
 
 
 @bot.event
+@timed()
 async def on_member_remove(member: discord.Member):
     if member.bot:
         return
-    await voice_manager.mark_left(member.id)
+    # Même file que on_member_join : un départ ne peut pas doubler l'arrivée
+    await event_pipeline.submit(
+        EventKind.MEMBER_REMOVE, member.id, voice_manager.mark_left, member.id, droppable=False,
+    )
 
 
 # ── Entry point ───────────────────────────────────────────────────────────────
@@ -278,10 +327,18 @@ async def main():
     uvicorn_server = uvicorn.Server(uvicorn_config)
     console.print(f"[green]✅ API interne démarrée sur :{BOT_API_PORT}[/green]")
 
-    await asyncio.gather(
-        bot.start(token),
-        uvicorn_server.serve(),
-    )
+    try:
+        await asyncio.gather(
+            bot.start(token),
+            uvicorn_server.serve(),
+        )
+    finally:
+        await event_pipeline.close()
+        await message_buffer.close()
+        await delivery_queue.close()
+        await scheduler.close()
+        await http_client.close()
+        achievement_image.shutdown()
 
 
 if __name__ == '__main__':
@@ -1,280 +1,306 @@
-"""Prometheus metrics — rafraîchies toutes les 60s par MetricsUpdaterCog."""
+"""Prometheus metrics.
+
+Les KPI issus de la base ne sont plus poussés dans des Gauges par une boucle :
+`HermesCollector` les calcule à la demande (deux requêtes : scalaires puis
+séries labellisées), garde le résultat METRICS_CACHE_SECONDS, et les émet au
+moment du scrape. Les métriques d'instrumentation (pipeline, file d'envoi…)
+restent des Counter/Gauge/Histogram classiques.
+"""
+import asyncio
+import json
 import logging
 import time as _time
-from prometheus_client import Gauge
+from typing import Callable, Dict, List, Optional
 
-logger = logging.getLogger(__name__)
-
-# ── Scalaires — santé & activité globale ──────────────────────────────────────
-bot_ready              = Gauge('hermes_bot_ready',              '1 si le bot est connecté et prêt')
-members_total          = Gauge('hermes_members_total',          'Membres actuellement suivis')
-members_in_voice       = Gauge('hermes_members_in_voice',       'Membres en vocal en ce moment')
-messages_total         = Gauge('hermes_messages_total',         'Messages envoyés — total cumulé')
-xp_total               = Gauge('hermes_xp_total',              'XP distribué — total cumulé')
-xp_weekly_total        = Gauge('hermes_xp_weekly_total',       'XP distribué cette semaine')
-avg_xp                 = Gauge('hermes_avg_xp',                'XP moyen par membre actif')
-top_level              = Gauge('hermes_top_level',             'Niveau le plus élevé du serveur')
-voice_hours_total      = Gauge('hermes_voice_hours_total',     'Heures en vocal — total cumulé')
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
 
-# ── Scalaires — modération ────────────────────────────────────────────────────
-warns_total            = Gauge('hermes_warns_total',           'Avertissements — total cumulé')
-warns_30d              = Gauge('hermes_warns_30d',             'Avertissements ces 30 derniers jours')
-users_with_warns       = Gauge('hermes_users_with_warns',      'Membres ayant au moins 1 avertissement')
+from config import METRICS_CACHE_SECONDS
 
-# ── Scalaires — quêtes ────────────────────────────────────────────────────────
-active_quests_total    = Gauge('hermes_active_quests_total',   'Quêtes actives cette semaine')
-quest_completions_week = Gauge('hermes_quest_completions_week', 'Complétions de quêtes cette semaine')
+logger = logging.getLogger(__name__)
 
-# ── Scalaires — engagement ────────────────────────────────────────────────────
-bumps_total            = Gauge('hermes_bumps_total',           'Bumps DISBOARD — total cumulé')
-achievements_total     = Gauge('hermes_achievements_total',    'Succès débloqués — total cumulé')
-achievements_7d        = Gauge('hermes_achievements_7d',       'Succès débloqués ces 7 derniers jours')
-active_voice_streaks   = Gauge('hermes_active_voice_streaks',  'Membres avec un streak vocal en cours')
-active_msg_streaks     = Gauge('hermes_active_msg_streaks',    'Membres avec un streak messages en cours')
-max_voice_streak       = Gauge('hermes_max_voice_streak',      'Plus long streak vocal du serveur')
-max_msg_streak         = Gauge('hermes_max_msg_streak',        'Plus long streak messages du serveur')
+# ── Santé ─────────────────────────────────────────────────────────────────────
+bot_ready = Gauge('hermes_bot_ready', '1 si le bot est connecté et prêt')
+
+# ── Compteurs — cache achievements ───────────────────────────────────────────
+achievement_checks_avoided = Counter(
+    'hermes_achievement_checks_avoided',
+    'Vérifications d\'achievements résolues en mémoire, sans requête SQL',
+)
+
+# ── Pipeline d'événements ─────────────────────────────────────────────────────
+event_queue_depth        = Gauge('hermes_event_queue_depth',         'Événements en attente dans le pipeline')
+events_dropped           = Counter('hermes_events_dropped',          'Événements rejetés (file pleine)', ['kind'])
+event_queue_wait_seconds = Histogram('hermes_event_queue_wait_seconds', 'Attente en file avant traitement', ['kind'])
+event_processing_seconds = Histogram('hermes_event_processing_seconds', 'Durée de traitement d\'un événement', ['kind'])
+
+# ── File d'envoi Discord (DM, messages, rôles) ────────────────────────────────
+delivery_backlog                = Gauge('hermes_delivery_backlog',                'Envois Discord en attente')
+delivery_oldest_pending_seconds = Gauge('hermes_delivery_oldest_pending_seconds', 'Âge du plus ancien envoi en attente')
+delivery_latency_seconds        = Histogram('hermes_delivery_latency_seconds',    'Délai entre mise en file et envoi', ['kind'],
+                                            buckets=(1, 5, 10, 30, 60, 120, 300, 900, 3600))
+delivery_retries                = Counter('hermes_delivery_retries',              'Envois réessayés après une erreur', ['kind'])
+delivery_failures               = Counter('hermes_delivery_failures',             'Envois abandonnés', ['kind'])
+
+
+# ── Latence des handlers et commandes (voir utils/instrumentation.py) ─────────
+_LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+handler_latency_seconds = Histogram('hermes_handler_latency_seconds', 'Durée des handlers d\'événements',
+                                    ['handler', 'status'], buckets=_LATENCY_BUCKETS)
+command_latency_seconds = Histogram('hermes_command_latency_seconds', 'Durée des commandes slash',
+                                    ['command', 'status'], buckets=_LATENCY_BUCKETS)
+handler_io_seconds      = Histogram('hermes_handler_io_seconds', 'Temps passé en base / API Discord par handler',
+                                    ['kind', 'name', 'target'], buckets=(0,) + _LATENCY_BUCKETS)
+
+# ── Requêtes SQL (voir utils/query_stats.py) ──────────────────────────────────
+db_query_seconds        = Histogram('hermes_db_query_seconds', 'Durée des requêtes par empreinte normalisée',
+                                    ['fingerprint'], buckets=_LATENCY_BUCKETS)
+db_pool_acquire_seconds = Histogram('hermes_db_pool_acquire_seconds', 'Attente d\'une connexion du pool',
+                                    buckets=(0,) + _LATENCY_BUCKETS)
+
+# ── Collecteur des KPI en base ────────────────────────────────────────────────
+metrics_collection_errors = Counter('hermes_metrics_collection_errors', 'Collectes des KPI en base en échec')
+
+# nom de la colonne SQL -> (métrique, description)
+_SCALARS = {
+    'members':            ('hermes_members_total',          'Membres actuellement suivis'),
+    'messages':           ('hermes_messages_total',         'Messages envoyés — total cumulé'),
+    'xp_total':           ('hermes_xp_total',               'XP distribué — total cumulé'),
+    'xp_weekly':          ('hermes_xp_weekly_total',        'XP distribué cette semaine'),
+    'avg_xp':             ('hermes_avg_xp',                 'XP moyen par membre actif'),
+    'top_level':          ('hermes_top_level',              'Niveau le plus élevé du serveur'),
+    'voice_hours':        ('hermes_voice_hours_total',      'Heures en vocal — total cumulé'),
+    'warns':              ('hermes_warns_total',            'Avertissements — total cumulé'),
+    'warns_30d':          ('hermes_warns_30d',              'Avertissements ces 30 derniers jours'),
+    'users_warned':       ('hermes_users_with_warns',       'Membres ayant au moins 1 avertissement'),
+    'active_quests':      ('hermes_active_quests_total',    'Quêtes actives cette semaine'),
+    'quest_completions':  ('hermes_quest_completions_week', 'Complétions de quêtes cette semaine'),
+    'bumps':              ('hermes_bumps_total',            'Bumps DISBOARD — total cumulé'),
+    'achievements':       ('hermes_achievements_total',     'Succès débloqués — total cumulé'),
+    'achievements_7d':    ('hermes_achievements_7d',        'Succès débloqués ces 7 derniers jours'),
+    'voice_streaks':      ('hermes_active_voice_streaks',   'Membres avec un streak vocal en cours'),
+    'msg_streaks':        ('hermes_active_msg_streaks',     'Membres avec un streak messages en cours'),
+    'max_voice_streak':   ('hermes_max_voice_streak',       'Plus long streak vocal du serveur'),
+    'max_msg_streak':     ('hermes_max_msg_streak',         'Plus long streak messages du serveur'),
+    'invite_codes':       ('hermes_invites_total',          'Codes d\'invitation actifs'),
+    'invite_uses':        ('hermes_invites_uses_total',     'Utilisations d\'invitations — total cumulé'),
+    'invite_uses_7d':     ('hermes_invites_uses_7d',        'Membres ayant rejoint via invitation ces 7 derniers jours'),
+}
 
-# ── Avec labels — quêtes actives ─────────────────────────────────────────────
 _Q = ['quest_id', 'title', 'quest_type', 'icon']
-quest_participants     = Gauge('hermes_quest_participants',    'Participants par quête', _Q)
-quest_completions_cnt  = Gauge('hermes_quest_completions_cnt', 'Complétions par quête', _Q)
-quest_completion_rate  = Gauge('hermes_quest_completion_rate', 'Taux de complétion par quête (%)', _Q)
-quest_xp_reward        = Gauge('hermes_quest_xp_reward',      'Récompense XP par quête', _Q)
-
-# ── Avec labels — distribution des niveaux ────────────────────────────────────
-level_distribution     = Gauge('hermes_level_distribution',   'Membres par tranche de niveau', ['range'])
-
-# ── Avec labels — avertissements par membre ───────────────────────────────────
-user_warn_count        = Gauge('hermes_user_warn_count',      'Avertissements par membre', ['username', 'user_id'])
-
-# ── Avec labels — top 15 XP ───────────────────────────────────────────────────
-user_xp_top            = Gauge('hermes_user_xp_top',          'XP des 15 meilleurs membres', ['username', 'level'])
-
-# ── Scalaires — invitations ────────────────────────────────────────────────────
-invites_total          = Gauge('hermes_invites_total',         'Codes d\'invitation actifs')
-invites_uses_total     = Gauge('hermes_invites_uses_total',    'Utilisations d\'invitations — total cumulé')
-invites_uses_7d        = Gauge('hermes_invites_uses_7d',       'Membres ayant rejoint via invitation ces 7 derniers jours')
-
-# ── Avec labels — top 15 inviters ─────────────────────────────────────────────
-top_inviters           = Gauge('hermes_top_inviters',          'Classement invitations (comme /classement et le site)', ['username', 'user_id', 'rank'])
-
-# ── Avec labels — liste des codes d'invitation actifs ─────────────────────────
-invite_codes_list      = Gauge('hermes_invite_codes',          'Invitations actives par code', ['code', 'host', 'expires_at'])
-
-
-async def refresh(guild=None):
-    """Interroge la BDD et met à jour toutes les jauges. guild = discord.Guild or None."""
-    try:
+# série SQL -> (métrique, description, labels)
+_SERIES = {
+    'quest_participants':    ('hermes_quest_participants',    'Participants par quête', _Q),
+    'quest_completions_cnt': ('hermes_quest_completions_cnt', 'Complétions par quête', _Q),
+    'quest_completion_rate': ('hermes_quest_completion_rate', 'Taux de complétion par quête (%)', _Q),
+    'quest_xp_reward':       ('hermes_quest_xp_reward',       'Récompense XP par quête', _Q),
+    'level_distribution':    ('hermes_level_distribution',    'Membres par tranche de niveau', ['range']),
+    'user_warn_count':       ('hermes_user_warn_count',       'Avertissements par membre', ['username', 'user_id']),
+    'user_xp_top':           ('hermes_user_xp_top',           'XP des 15 meilleurs membres', ['username', 'level']),
+    'top_inviters':          ('hermes_top_inviters',
+                              'Classement invitations (comme /classement et le site)', ['username', 'user_id', 'rank']),
+    'invite_codes':          ('hermes_invite_codes',          'Invitations actives par code', ['code', 'host', 'expires_at']),
+}
+
+_SCALAR_QUERY = """
+    WITH m AS (
+        SELECT COUNT(*) FILTER (WHERE is_member = TRUE)    AS members,
+               COALESCE(SUM(total_time) / 3600.0, 0)       AS voice_hours
+        FROM user_voice_data
+    ), t AS (
+        SELECT COALESCE(SUM(messages), 0) AS messages FROM user_totals
+    ), x AS (
+        SELECT COALESCE(SUM(u.total_xp), 0)                              AS xp_total,
+               COALESCE(SUM(u.weekly_xp), 0)                             AS xp_weekly,
+               COALESCE(MAX(u.current_level), 0)                         AS top_level,
+               COALESCE(AVG(u.total_xp) FILTER (WHERE v.is_member = TRUE), 0) AS avg_xp
+        FROM user_xp u LEFT JOIN user_voice_data v ON v.user_id = u.user_id
+    ), w AS (
+        SELECT COUNT(*)                                   AS warns,
+               COUNT(*) FILTER (WHERE create_time > $1)   AS warns_30d,
+               COUNT(DISTINCT user_id)                    AS users_warned
+        FROM warn
+    ), q AS (
+        SELECT COUNT(*) AS active_quests FROM weekly_quests WHERE is_active = TRUE
+    ), qc AS (
+        SELECT COUNT(*) AS quest_completions
+        FROM user_quest_progress uqp JOIN weekly_quests q ON q.id = uqp.quest_id
+        WHERE uqp.completed = TRUE AND q.week_start >= date_trunc('week', CURRENT_DATE)
+    ), b AS (
+        SELECT COALESCE(SUM(bump_count), 0) AS bumps FROM user_bump_stats
+    ), a AS (
+        SELECT COUNT(*)                                                          AS achievements,
+               COUNT(*) FILTER (WHERE unlocked_at > NOW() - INTERVAL '7 days')   AS achievements_7d
+        FROM user_achievements
+    ), vs AS (
+        SELECT COUNT(*) FILTER (WHERE current_streak > 0) AS voice_streaks,
+               COALESCE(MAX(max_streak), 0)               AS max_voice_streak
+        FROM user_streaks
+    ), ms AS (
+        SELECT COUNT(*) FILTER (WHERE current_streak > 0) AS msg_streaks,
+               COALESCE(MAX(max_streak), 0)               AS max_msg_streak
+        FROM user_message_streaks
+    ), ic AS (
+        SELECT COUNT(*) AS invite_codes FROM invite_codes WHERE is_active = TRUE
+    ), iu AS (
+        SELECT COALESCE(SUM(invite_count), 0) AS invite_uses FROM user_invite_stats
+    ), i7 AS (
+        SELECT COUNT(*) AS invite_uses_7d FROM invite_uses WHERE joined_at > NOW() - INTERVAL '7 days'
+    )
+    SELECT * FROM m, t, x, w, q, qc, b, a, vs, ms, ic, iu, i7
+"""
+
+_SERIES_QUERY = """
+    WITH qs AS (
+        SELECT jsonb_build_object('quest_id', q.id::text, 'title', q.title,
+                                  'quest_type', q.quest_type, 'icon', q.icon) AS labels,
+               q.xp_reward,
+               COUNT(DISTINCT uqp.user_id)                                     AS participants,
+               COUNT(DISTINCT uqp.user_id) FILTER (WHERE uqp.completed = TRUE) AS completions
+        FROM weekly_quests q
+        LEFT JOIN user_quest_progress uqp ON uqp.quest_id = q.id
+        WHERE q.is_active = TRUE
+        GROUP BY q.id, q.title, q.quest_type, q.icon, q.xp_reward
+    ), lv AS (
+        SELECT CASE
+                   WHEN u.current_level BETWEEN 1  AND 5  THEN '1-5'
+                   WHEN u.current_level BETWEEN 6  AND 10 THEN '6-10'
+                   WHEN u.current_level BETWEEN 11 AND 20 THEN '11-20'
+                   WHEN u.current_level BETWEEN 21 AND 50 THEN '21-50'
+                   ELSE '51+'
+               END AS range,
+               COUNT(*) AS cnt
+        FROM user_xp u JOIN user_voice_data v ON v.user_id = u.user_id
+        WHERE v.is_member = TRUE
+        GROUP BY 1
+    ), inv AS (
+        SELECT u.user_id, u.username, COALESCE(i.invite_count, 0) AS uses,
+               RANK() OVER (ORDER BY COALESCE(i.invite_count, 0) DESC) AS rank
+        FROM user_voice_data u
+        LEFT JOIN user_invite_stats i ON u.user_id = i.user_id
+        WHERE u.is_member = TRUE
+        ORDER BY rank
+        LIMIT 15
+    )
+    SELECT 'quest_participants' AS series, labels, participants::float8 AS value FROM qs
+    UNION ALL SELECT 'quest_completions_cnt', labels, completions FROM qs
+    UNION ALL SELECT 'quest_completion_rate', labels,
+                     CASE WHEN participants > 0 THEN round(completions * 100.0 / participants, 1) ELSE 0 END
+              FROM qs
+    UNION ALL SELECT 'quest_xp_reward', labels, COALESCE(xp_reward, 0) FROM qs
+    UNION ALL SELECT 'level_distribution', jsonb_build_object('range', range), cnt FROM lv
+    UNION ALL (
+        SELECT 'user_warn_count', jsonb_build_object('username', v.username, 'user_id', w.user_id::text), COUNT(*)
+        FROM warn w JOIN user_voice_data v ON v.user_id = w.user_id
+        GROUP BY v.username, w.user_id
+    )
+    UNION ALL (
+        SELECT 'user_xp_top', jsonb_build_object('username', v.username, 'level', u.current_level::text), u.total_xp
+        FROM user_xp u JOIN user_voice_data v ON v.user_id = u.user_id
+        WHERE v.is_member = TRUE
+        ORDER BY u.total_xp DESC
+        LIMIT 15
+    )
+    UNION ALL SELECT 'top_inviters',
+                     jsonb_build_object('username', COALESCE(username, user_id::text),
+                                        'user_id', user_id::text, 'rank', rank::text),
+                     uses
+              FROM inv
+    UNION ALL (
+        SELECT 'invite_codes',
+               jsonb_build_object('code', ic.code,
+                                  'host', COALESCE(v.username, ic.inviter_id::text),
+                                  'expires_at', COALESCE(to_char(ic.expires_at AT TIME ZONE 'UTC',
+                                                                 'DD/MM/YYYY HH24:MI'), '∞')),
+               ic.uses
+        FROM invite_codes ic
+        LEFT JOIN user_voice_data v ON v.user_id = ic.inviter_id
+        WHERE ic.is_active = TRUE
+    )
+"""
+
+
+class HermesCollector:
+    """Émet les KPI en base au moment du scrape, à partir d'un instantané mis en cache."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._scalars: Dict[str, float] = {}
+        self._series: Dict[str, List[tuple]] = {}
+        self._collected_at: Optional[float] = None
+        self._duration = 0.0
+        self._lock = asyncio.Lock()
+        self._guild_provider: Optional[Callable] = None
+
+    def set_guild_provider(self, provider: Callable):
+        """`provider()` retourne la guilde (ou None) pour hermes_members_in_voice."""
+        self._guild_provider = provider
+
+    async def refresh_if_stale(self):
+        if self._collected_at is not None and _time.monotonic() - self._collected_at < self.ttl:
+            return
+        async with self._lock:
+            # Un scrape concurrent a pu rafraîchir pendant l'attente du verrou
+            if self._collected_at is not None and _time.monotonic() - self._collected_at < self.ttl:
+                return
+            await self._collect_from_db()
+
+    async def _collect_from_db(self):
         from utils.database import db_manager
-
-        # ── Membres ───────────────────────────────────────────────────────────
-        members_total.set(
-            await db_manager.fetchval("SELECT COUNT(*) FROM user_voice_data WHERE is_member = TRUE") or 0
-        )
-
+        started = _time.monotonic()
+        try:
+            ts_30d = int(_time.time()) - 30 * 86400
+            row = await db_manager.fetchrow(_SCALAR_QUERY, ts_30d)
+            rows = await db_manager.fetch(_SERIES_QUERY)
+        except Exception as e:
+            metrics_collection_errors.inc()
+            logger.warning("metrics collection error: %s", e)
+            return
+        series: Dict[str, List[tuple]] = {}
+        for r in rows:
+            labels = json.loads(r['labels']) if isinstance(r['labels'], str) else r['labels']
+            series.setdefault(r['series'], []).append((labels, float(r['value'] or 0)))
+        self._scalars = {k: float(v or 0) for k, v in row.items()}
+        self._series = series
+        self._collected_at = _time.monotonic()
+        self._duration = self._collected_at - started
+
+    def _families(self, with_samples: bool):
+        for col, (name, doc) in _SCALARS.items():
+            fam = GaugeMetricFamily(name, doc)
+            if with_samples and col in self._scalars:
+                fam.add_metric([], self._scalars[col])
+            yield fam
+
+        for key, (name, doc, labels) in _SERIES.items():
+            fam = GaugeMetricFamily(name, doc, labels=labels)
+            if with_samples:
+                for lbl, value in self._series.get(key, []):
+                    fam.add_metric([str(lbl.get(l) or '') for l in labels], value)
+            yield fam
+
+        in_voice = GaugeMetricFamily('hermes_members_in_voice', 'Membres en vocal en ce moment')
+        guild = self._guild_provider() if (with_samples and self._guild_provider) else None
         if guild:
-            members_in_voice.set(sum(
-                1 for vc in guild.voice_channels
-                for m in vc.members if not m.bot
-            ))
-
-        # ── Messages ──────────────────────────────────────────────────────────
-        messages_total.set(
-            await db_manager.fetchval(
-                "SELECT COALESCE(SUM(message_count), 0) FROM user_message_stats"
-            ) or 0
-        )
-
-        # ── XP ────────────────────────────────────────────────────────────────
-        xp_total.set(
-            await db_manager.fetchval("SELECT COALESCE(SUM(total_xp), 0) FROM user_xp") or 0
-        )
-        xp_weekly_total.set(
-            await db_manager.fetchval("SELECT COALESCE(SUM(weekly_xp), 0) FROM user_xp") or 0
-        )
-        avg_xp.set(float(
-            await db_manager.fetchval(
-                """SELECT COALESCE(AVG(u.total_xp), 0)
-                   FROM user_xp u JOIN user_voice_data v ON v.user_id = u.user_id
-                   WHERE v.is_member = TRUE"""
-            ) or 0
-        ))
-        top_level.set(
-            await db_manager.fetchval("SELECT COALESCE(MAX(current_level), 0) FROM user_xp") or 0
-        )
-
-        # ── Vocal ─────────────────────────────────────────────────────────────
-        voice_hours_total.set(float(
-            await db_manager.fetchval(
-                "SELECT COALESCE(SUM(total_time) / 3600.0, 0) FROM user_voice_data"
-            ) or 0
-        ))
-
-        # ── Modération ────────────────────────────────────────────────────────
-        warns_total.set(
-            await db_manager.fetchval("SELECT COUNT(*) FROM warn") or 0
-        )
-        ts_30d = int(_time.time()) - 30 * 86400
-        warns_30d.set(
-            await db_manager.fetchval(
-                "SELECT COUNT(*) FROM warn WHERE create_time > $1", ts_30d
-            ) or 0
-        )
-        users_with_warns.set(
-            await db_manager.fetchval("SELECT COUNT(DISTINCT user_id) FROM warn") or 0
-        )
-
-        # ── Quêtes ────────────────────────────────────────────────────────────
-        active_quests_total.set(
-            await db_manager.fetchval("SELECT COUNT(*) FROM weekly_quests WHERE is_active = TRUE") or 0
-        )
-        quest_completions_week.set(
-            await db_manager.fetchval(
-                """SELECT COUNT(*) FROM user_quest_progress uqp
-                   JOIN weekly_quests q ON q.id = uqp.quest_id
-                   WHERE uqp.completed = TRUE
-                     AND q.week_start >= date_trunc('week', CURRENT_DATE)"""
-            ) or 0
-        )
-
-        # ── Bumps ─────────────────────────────────────────────────────────────
-        bumps_total.set(
-            await db_manager.fetchval(
-                "SELECT COALESCE(SUM(bump_count), 0) FROM user_bump_stats"
-            ) or 0
-        )
-
-        # ── Succès ────────────────────────────────────────────────────────────
-        achievements_total.set(
-            await db_manager.fetchval("SELECT COUNT(*) FROM user_achievements") or 0
-        )
-        achievements_7d.set(
-            await db_manager.fetchval(
-                "SELECT COUNT(*) FROM user_achievements WHERE unlocked_at > NOW() - INTERVAL '7 days'"
-            ) or 0
-        )
-
-        # ── Streaks ───────────────────────────────────────────────────────────
-        active_voice_streaks.set(
-            await db_manager.fetchval(
-                "SELECT COUNT(*) FROM user_streaks WHERE current_streak > 0"
-            ) or 0
-        )
-        active_msg_streaks.set(
-            await db_manager.fetchval(
-                "SELECT COUNT(*) FROM user_message_streaks WHERE current_streak > 0"
-            ) or 0
-        )
-        max_voice_streak.set(
-            await db_manager.fetchval(
-                "SELECT COALESCE(MAX(max_streak), 0) FROM user_streaks"
-            ) or 0
-        )
-        max_msg_streak.set(
-            await db_manager.fetchval(
-                "SELECT COALESCE(MAX(max_streak), 0) FROM user_message_streaks"
-            ) or 0
-        )
-
-        # ── Labeled : quêtes actives ──────────────────────────────────────────
-        quests = await db_manager.fetch("""
-            SELECT
-                q.id, q.title, q.quest_type, q.icon, q.xp_reward,
-                COUNT(DISTINCT uqp.user_id)                                        AS participants,
-                COUNT(DISTINCT uqp.user_id) FILTER (WHERE uqp.completed = TRUE)    AS completions
-            FROM weekly_quests q
-            LEFT JOIN user_quest_progress uqp ON uqp.quest_id = q.id
-            WHERE q.is_active = TRUE
-            GROUP BY q.id, q.title, q.quest_type, q.icon, q.xp_reward
-            ORDER BY q.id
-        """)
-        quest_participants._metrics.clear()
-        quest_completions_cnt._metrics.clear()
-        quest_completion_rate._metrics.clear()
-        quest_xp_reward._metrics.clear()
-        for q in quests:
-            lbl = dict(quest_id=str(q['id']), title=q['title'],
-                       quest_type=q['quest_type'], icon=q['icon'])
-            p, c = q['participants'] or 0, q['completions'] or 0
-            quest_participants.labels(**lbl).set(p)
-            quest_completions_cnt.labels(**lbl).set(c)
-            quest_completion_rate.labels(**lbl).set(round(c / p * 100, 1) if p else 0.0)
-            quest_xp_reward.labels(**lbl).set(q['xp_reward'] or 0)
-
-        # ── Labeled : distribution des niveaux ────────────────────────────────
-        levels = await db_manager.fetch("""
-            SELECT
-                CASE
-                    WHEN u.current_level BETWEEN 1  AND 5  THEN '1-5'
-                    WHEN u.current_level BETWEEN 6  AND 10 THEN '6-10'
-                    WHEN u.current_level BETWEEN 11 AND 20 THEN '11-20'
-                    WHEN u.current_level BETWEEN 21 AND 50 THEN '21-50'
-                    ELSE '51+'
-                END AS range,
-                COUNT(*) AS cnt
-            FROM user_xp u
-            JOIN user_voice_data v ON v.user_id = u.user_id
-            WHERE v.is_member = TRUE
-            GROUP BY 1
-        """)
-        level_distribution._metrics.clear()
-        for row in levels:
-            level_distribution.labels(range=row['range']).set(row['cnt'])
-
-        # ── Labeled : avertissements par membre ───────────────────────────────
-        warned = await db_manager.fetch("""
-            SELECT v.username, w.user_id, COUNT(*) AS cnt
-            FROM warn w
-            JOIN user_voice_data v ON v.user_id = w.user_id
-            GROUP BY v.username, w.user_id
-            ORDER BY cnt DESC
-        """)
-        user_warn_count._metrics.clear()
-        for row in warned:
-            user_warn_count.labels(
-                username=row['username'], user_id=str(row['user_id'])
-            ).set(row['cnt'])
+            in_voice.add_metric([], sum(1 for vc in guild.voice_channels for m in vc.members if not m.bot))
+        yield in_voice
 
-        # ── Labeled : top 15 XP ───────────────────────────────────────────────
-        top_xp = await db_manager.fetch("""
-            SELECT v.username, u.current_level, u.total_xp
-            FROM user_xp u
-            JOIN user_voice_data v ON v.user_id = u.user_id
-            WHERE v.is_member = TRUE
-            ORDER BY u.total_xp DESC
-            LIMIT 15
-        """)
-        user_xp_top._metrics.clear()
-        for row in top_xp:
-            user_xp_top.labels(
-                username=row['username'], level=str(row['current_level'])
-            ).set(row['total_xp'])
+        duration = GaugeMetricFamily('hermes_metrics_collection_seconds',
+                                     'Durée de la dernière collecte des KPI en base')
+        age = GaugeMetricFamily('hermes_metrics_data_age_seconds',
+                                'Âge des KPI servis (depuis la dernière collecte réussie)')
+        if with_samples and self._collected_at is not None:
+            duration.add_metric([], self._duration)
+            age.add_metric([], _time.monotonic() - self._collected_at)
+        yield duration
+        yield age
 
-        # ── Invitations ───────────────────────────────────────────────────────
-        from utils.database import invite_manager
-        inv_stats = await invite_manager.get_invite_stats()
-        invites_total.set(inv_stats['total_codes'])
-        invites_uses_total.set(inv_stats['total_uses'])
-        invites_uses_7d.set(inv_stats['uses_7d'])
+    def describe(self):
+        return list(self._families(with_samples=False))
 
-        top_inv = await invite_manager.get_top_inviters(limit=15)
-        top_inviters._metrics.clear()
-        for row in top_inv:
-            top_inviters.labels(
-                username=row['username'] or str(row['inviter_id']),
-                user_id=str(row['inviter_id']),
-                rank=str(row['rank'])
-            ).set(row['uses'])
+    def collect(self):
+        return list(self._families(with_samples=True))
 
-        active_invites = await invite_manager.get_active_invites()
-        invite_codes_list._metrics.clear()
-        for row in active_invites:
-            expires = row['expires_at'].strftime('%d/%m/%Y %H:%M') if row['expires_at'] else '∞'
-            invite_codes_list.labels(
-                code=row['code'],
-                host=row['username'] or str(row['inviter_id']),
-                expires_at=expires
-            ).set(row['uses'])
 
-    except Exception as e:
-        logger.warning("metrics refresh error: %s", e)
+collector = HermesCollector(ttl=METRICS_CACHE_SECONDS)
+REGISTRY.register(collector)
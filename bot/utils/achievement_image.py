@@ -1,7 +1,40 @@
-"""Generate achievement unlock banner images using Pillow."""
+"""Generate achievement unlock banner images using Pillow.
+
+Les polices sont chargées une fois par processus et le fond de chaque palier
+(bordure, barre d'accent) est pré-rendu puis copié. `render_achievement_image`
+dessine dans un pool de processus, hors de la boucle d'événements, et garde
+le PNG en cache (LRU mémoire + disque) par (achievement, membre) : un renvoi
+ou un rattrapage ne redessine rien. Le cache disque est borné à
+DISK_CACHE_FILES fichiers, les plus anciens sont supprimés.
+"""
+import asyncio
+import hashlib
 import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional
+
 from PIL import Image, ImageDraw, ImageFont
 
+from config import HTTP_CACHE_DIR
+from utils.http_client import DiskCache
+
+W, H = 700, 220
+RENDER_WORKERS = int(os.getenv('ACHIEVEMENT_RENDER_WORKERS', '2'))
+MEMORY_CACHE_SIZE = 256
+DISK_CACHE_FILES = int(os.getenv('ACHIEVEMENT_DISK_CACHE_FILES', '5000'))
+_PRUNE_EVERY = 100          # écritures disque entre deux purges
+_FONT_CANDIDATES = (os.getenv('ACHIEVEMENT_FONT', ''), "arial.ttf", "DejaVuSans.ttf")
+
+_memory: "OrderedDict[str, bytes]" = OrderedDict()
+_inflight: Dict[str, asyncio.Task] = {}
+_disk = DiskCache(os.path.join(HTTP_CACHE_DIR, 'achievements'))
+_executor: Optional[ProcessPoolExecutor] = None
+_disk_writes = 0
+
 
 def _tier_color(points: int) -> tuple:
     if points >= 100:
@@ -13,36 +46,44 @@ def _tier_color(points: int) -> tuple:
     return (100, 149, 237)      # Blue (common)
 
 
-def generate_achievement_image(
+@lru_cache(maxsize=1)
+def _fonts() -> tuple:
+    """(big, title, body, small), chargées une seule fois par processus."""
+    for path in _FONT_CANDIDATES:
+        if not path:
+            continue
+        try:
+            return tuple(ImageFont.truetype(path, size) for size in (60, 26, 18, 14))
+        except OSError:
+            continue
+    default = ImageFont.load_default()
+    return default, default, default, default
+
+
+@lru_cache(maxsize=8)
+def _template(tier_color: tuple) -> Image.Image:
+    """Fond d'un palier : bordure dégradée + barre d'accent. Copié à chaque rendu."""
+    img = Image.new('RGBA', (W, H), (30, 30, 40, 255))
+    draw = ImageDraw.Draw(img)
+    for i in range(4):
+        draw.rectangle([i, i, W - 1 - i, H - 1 - i], outline=(*tier_color, 255 - i * 40))
+    draw.rectangle([0, 0, 8, H], fill=(*tier_color, 255))
+    return img
+
+
+def _render_png(
     achievement_name: str,
     achievement_desc: str,
     achievement_icon: str,
     points: int,
     username: str,
-) -> io.BytesIO:
-    """Return a BytesIO PNG image for the achievement unlock."""
-    W, H = 700, 220
+) -> bytes:
     tier_color = _tier_color(points)
+    font_big, font_title, font_body, font_small = _fonts()
 
-    img = Image.new('RGBA', (W, H), (30, 30, 40, 255))
+    img = _template(tier_color).copy()
     draw = ImageDraw.Draw(img)
 
-    # Gradient border
-    for i in range(4):
-        draw.rectangle([i, i, W - 1 - i, H - 1 - i], outline=(*tier_color, 255 - i * 40))
-
-    # Left colored accent bar
-    draw.rectangle([0, 0, 8, H], fill=(*tier_color, 255))
-
-    # Load fonts with fallback to default
-    try:
-        font_big = ImageFont.truetype("arial.ttf", 60)
-        font_title = ImageFont.truetype("arial.ttf", 26)
-        font_body = ImageFont.truetype("arial.ttf", 18)
-        font_small = ImageFont.truetype("arial.ttf", 14)
-    except Exception:
-        font_big = font_title = font_body = font_small = ImageFont.load_default()
-
     # Icon
     draw.text((30, H // 2 - 40), achievement_icon, font=font_big, fill=(255, 255, 255, 255))
 
@@ -56,13 +97,116 @@ def generate_achievement_image(
     draw.text((140, 90), achievement_desc[:80], font=font_body, fill=(200, 200, 200, 255))
 
     # Points
-    pts_text = f"+{points} pts"
-    draw.text((140, 125), pts_text, font=font_body, fill=(*tier_color, 255))
+    draw.text((140, 125), f"+{points} pts", font=font_body, fill=(*tier_color, 255))
 
     # Username at bottom right
     draw.text((W - 200, H - 30), f"@{username}", font=font_small, fill=(150, 150, 150, 255))
 
     buf = io.BytesIO()
     img.save(buf, format='PNG')
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
+
+
+def _cache_key(name: str, desc: str, icon: str, points: int, username: str) -> str:
+    # Tous les champs dessinés : une modification du catalogue invalide l'image
+    raw = '\x1f'.join((name, desc, icon, str(points), username))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _remember(key: str, png: bytes):
+    _memory[key] = png
+    _memory.move_to_end(key)
+    while len(_memory) > MEMORY_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+
+def _cached(key: str) -> Optional[bytes]:
+    png = _memory.get(key)
+    if png is not None:
+        _memory.move_to_end(key)
+        return png
+    png = _disk.get_bytes(key)
+    if png is not None:
+        _remember(key, png)
+    return png
+
+
+def _store(key: str, png: bytes):
+    """Écrit le PNG sur disque et purge régulièrement les plus anciens."""
+    global _disk_writes
+    _disk.set_bytes(key, png)
+    _disk_writes += 1
+    if _disk_writes % _PRUNE_EVERY == 0:
+        _disk.prune(DISK_CACHE_FILES)
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # forkserver : le pool est créé dans un processus déjà multithreadé (to_thread),
+        # un fork pourrait hériter d'un verrou tenu par un autre thread
+        _executor = ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS, initializer=_fonts,
+            mp_context=multiprocessing.get_context('forkserver'),
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _render_and_store(key: str, args: tuple) -> bytes:
+    png = await asyncio.to_thread(_disk.get_bytes, key)
+    if png is None:
+        png = await asyncio.get_running_loop().run_in_executor(_pool(), _render_png, *args)
+        await asyncio.to_thread(_store, key, png)
+    _remember(key, png)
+    return png
+
+
+async def render_achievement_image(
+    achievement_name: str,
+    achievement_desc: str,
+    achievement_icon: str,
+    points: int,
+    username: str,
+) -> bytes:
+    """PNG du bandeau, rendu hors de la boucle ; rendus identiques simultanés mutualisés.
+
+    Le rendu tourne dans sa propre tâche : l'annulation d'un appelant ne
+    l'interrompt pas pour les autres.
+    """
+    args = (achievement_name, achievement_desc, achievement_icon, points, username)
+    key = _cache_key(*args)
+    png = _memory.get(key)
+    if png is not None:
+        _memory.move_to_end(key)
+        return png
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_render_and_store(key, args))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key) if _inflight.get(key) is t else None)
+    return await asyncio.shield(task)
+
+
+def generate_achievement_image(
+    achievement_name: str,
+    achievement_desc: str,
+    achievement_icon: str,
+    points: int,
+    username: str,
+) -> io.BytesIO:
+    """Return a BytesIO PNG image for the achievement unlock (synchronous, same cache)."""
+    key = _cache_key(achievement_name, achievement_desc, achievement_icon, points, username)
+    png = _cached(key)
+    if png is None:
+        png = _render_png(achievement_name, achievement_desc, achievement_icon, points, username)
+        _store(key, png)
+        _remember(key, png)
+    return io.BytesIO(png)
@@ -1,28 +1,91 @@
 import asyncio
 import functools
-import os
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+import json
+import logging
+from typing import Dict, Optional, Tuple
+import asyncpg
 import discord
-from utils.database import db_manager
+from utils.database import db_manager, _pg_config
 from utils.embed_style import hermes_embed, Colors
 
-CACHE: Dict[str, bool] = {}
-CACHE_EXPIRY: Dict[str, datetime] = {}
-CACHE_TTL = timedelta(minutes=5)
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'command_status_changed'
+
+# (command_name, guild_id) -> (is_enabled, disabled_by_name). Chargé au démarrage puis
+# tenu à jour par LISTEN/NOTIFY : le décorateur command_enabled ne fait aucune requête.
+STATUS: Dict[Tuple[str, Optional[int]], Tuple[bool, Optional[str]]] = {}
+_state = {'loaded': False, 'listener': None}
 
 
 class CommandStatusManager:
 
     @staticmethod
-    def _key(name: str, guild_id: Optional[int]) -> str:
-        return f"{name}_{guild_id}" if guild_id else name
+    def _lookup(name: str, guild_id: Optional[int]) -> Tuple[bool, Optional[str]]:
+        if guild_id and (name, guild_id) in STATUS:
+            return STATUS[(name, guild_id)]
+        return STATUS.get((name, None), (True, None))
+
+    @staticmethod
+    async def load():
+        """Charge toute la table en mémoire et s'abonne aux changements (LISTEN)."""
+        if not db_manager._pool:
+            await db_manager.initialize()
+        await CommandStatusManager._listen()
+        rows = await db_manager.fetch(
+            "SELECT command_name, guild_id, is_enabled, disabled_by_name FROM command_status"
+        )
+        STATUS.clear()
+        for r in rows:
+            STATUS[(r['command_name'], r['guild_id'])] = (r['is_enabled'] is not False, r['disabled_by_name'])
+        _state['loaded'] = True
+        logger.info(f"Statuts de commandes chargés en mémoire ({len(rows)})")
+
+    @staticmethod
+    async def _listen():
+        current = _state['listener']
+        if current is not None and not current.is_closed():
+            return
+        conn = await asyncpg.connect(**_pg_config())
+        await conn.add_listener(NOTIFY_CHANNEL, CommandStatusManager._on_notify)
+        conn.add_termination_listener(CommandStatusManager._on_listener_lost)
+        _state['listener'] = conn
+
+    @staticmethod
+    def _on_notify(conn, pid, channel, payload: str):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return
+        key = (data['command_name'], data.get('guild_id'))
+        if data.get('op') == 'DELETE':
+            STATUS.pop(key, None)
+        else:
+            STATUS[key] = (data['is_enabled'] is not False, data.get('disabled_by_name'))
+
+    @staticmethod
+    def _on_listener_lost(conn):
+        # Sans LISTEN la map peut devenir périmée : repasse en lecture SQL jusqu'à la reconnexion
+        _state['loaded'] = False
+        _state['listener'] = None
+        logger.warning("Connexion LISTEN command_status perdue, reconnexion")
+        asyncio.get_running_loop().create_task(CommandStatusManager._reconnect())
+
+    @staticmethod
+    async def _reconnect():
+        delay = 1
+        while not _state['loaded']:
+            try:
+                await CommandStatusManager.load()
+            except Exception as e:
+                logger.warning(f"Reconnexion LISTEN command_status échouée: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
 
     @staticmethod
     async def get(name: str, guild_id: Optional[int] = None, use_cache: bool = True) -> bool:
-        key = CommandStatusManager._key(name, guild_id)
-        if use_cache and key in CACHE and datetime.now() < CACHE_EXPIRY.get(key, datetime.min):
-            return CACHE[key]
+        if use_cache and _state['loaded']:
+            return CommandStatusManager._lookup(name, guild_id)[0]
 
         try:
             if not db_manager._pool:
@@ -44,11 +107,9 @@ class CommandStatusManager:
                         "SELECT is_enabled FROM command_status WHERE command_name=$1 AND guild_id IS NULL",
                         name,
                     )
-                status = row['is_enabled'] if row else True
+                status = row['is_enabled'] is not False if row else True
                 if not row:
                     await CommandStatusManager.set(name, True, guild_id)
-                CACHE[key] = status
-                CACHE_EXPIRY[key] = datetime.now() + CACHE_TTL
                 return status
         except Exception as e:
             print(f"[CommandStatus] get error: {e}")
@@ -57,6 +118,8 @@ class CommandStatusManager:
     @staticmethod
     async def get_disabled_by(name: str, guild_id: Optional[int] = None) -> Optional[str]:
         """Return the name of whoever last disabled this command, or None."""
+        if _state['loaded']:
+            return CommandStatusManager._lookup(name, guild_id)[1]
         try:
             if not db_manager._pool:
                 await db_manager.initialize()
@@ -124,9 +187,8 @@ class CommandStatusManager:
                         name, guild_id, enabled, disabled_by,
                     )
 
-            key = CommandStatusManager._key(name, guild_id)
-            CACHE.pop(key, None)
-            CACHE_EXPIRY.pop(key, None)
+            # Le trigger notifie aussi ce changement ; mise à jour locale immédiate en attendant
+            STATUS[(name, guild_id)] = (enabled, disabled_by)
             return True
         except Exception as e:
             print(f"[CommandStatus] set error: {e}")
@@ -158,7 +220,7 @@ def command_enabled(guild_specific: bool = False):
         async def wrapper(self, interaction: discord.Interaction, *args, **kwargs):
             name = getattr(interaction.command, 'name', func.__name__)
             guild_id = interaction.guild_id if guild_specific else None
-            enabled = await CommandStatusManager.get(name, guild_id, use_cache=False)
+            enabled = await CommandStatusManager.get(name, guild_id)
             if not enabled:
                 disabled_by = await CommandStatusManager.get_disabled_by(name, guild_id)
                 if disabled_by:
@@ -204,4 +266,28 @@ async def init_command_status_table():
               AND a.command_name = b.command_name
               AND a.updated_at < b.updated_at
         """)
+        # Toute modification (bot, panel web, SQL manuel) est notifiée aux bots à l'écoute
+        await conn.execute("""
+            CREATE OR REPLACE FUNCTION notify_command_status() RETURNS trigger AS $$
+            DECLARE r command_status;
+            BEGIN
+                IF TG_OP = 'DELETE' THEN r := OLD; ELSE r := NEW; END IF;
+                PERFORM pg_notify('command_status_changed', json_build_object(
+                    'op',               TG_OP,
+                    'command_name',     r.command_name,
+                    'guild_id',         r.guild_id,
+                    'is_enabled',       r.is_enabled,
+                    'disabled_by_name', r.disabled_by_name
+                )::text);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        await conn.execute("DROP TRIGGER IF EXISTS command_status_notify ON command_status")
+        await conn.execute("""
+            CREATE TRIGGER command_status_notify
+            AFTER INSERT OR UPDATE OR DELETE ON command_status
+            FOR EACH ROW EXECUTE FUNCTION notify_command_status()
+        """)
+    await CommandStatusManager.load()
     print("✅ Table command_status prête")
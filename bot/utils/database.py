@@ -2,11 +2,17 @@ import asyncpg
 import asyncio
 import logging
 import os
+import time
+from bisect import bisect_right
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
+import metrics as bot_metrics
+from utils.instrumentation import add_db_time
+from utils.query_stats import query_stats
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -25,6 +31,7 @@ class DatabaseManager:
     def __init__(self):
         self._pool: Optional[asyncpg.Pool] = None
         self._lock = asyncio.Lock()
+        self._explains: set = set()
 
     async def initialize(self):
         cfg = _pg_config()
@@ -43,34 +50,63 @@ class DatabaseManager:
             async with self._lock:
                 if not self._pool:
                     await self.initialize()
+        started = time.perf_counter()
         conn = await self._pool.acquire()
+        query_stats.record_acquire(time.perf_counter() - started)
         try:
             yield conn
         except Exception:
             raise
         finally:
             await self._pool.release(conn)
+            add_db_time(time.perf_counter() - started)
 
-    async def fetch(self, query: str, *args) -> List[Dict[str, Any]]:
+    @asynccontextmanager
+    async def _statement(self, query: str, args: tuple):
+        """Connexion pour une instruction unique, chronométrée par empreinte (utils/query_stats.py)."""
         async with self.get_connection() as conn:
+            started = time.perf_counter()
+            error = False
+            try:
+                yield conn
+            except Exception:
+                error = True
+                raise
+            finally:
+                if query_stats.record(query, args, time.perf_counter() - started, error):
+                    task = asyncio.create_task(self._explain(query, args))
+                    self._explains.add(task)
+                    task.add_done_callback(self._explains.discard)
+
+    async def _explain(self, query: str, args: tuple):
+        """Échantillon de plan d'une requête lente (EXPLAIN sans ANALYZE : rien n'est exécuté)."""
+        try:
+            async with self.get_connection() as conn:
+                rows = await conn.fetch(f"EXPLAIN {query}", *args)
+            query_stats.set_plan(query, [r[0] for r in rows])
+        except Exception as e:
+            logger.debug(f"EXPLAIN impossible : {e}")
+
+    async def fetch(self, query: str, *args) -> List[Dict[str, Any]]:
+        async with self._statement(query, args) as conn:
             rows = await conn.fetch(query, *args)
-            return [dict(r) for r in rows]
+        return [dict(r) for r in rows]
 
     async def fetchrow(self, query: str, *args) -> Optional[Dict[str, Any]]:
-        async with self.get_connection() as conn:
+        async with self._statement(query, args) as conn:
             row = await conn.fetchrow(query, *args)
-            return dict(row) if row else None
+        return dict(row) if row else None
 
     async def fetchval(self, query: str, *args):
-        async with self.get_connection() as conn:
+        async with self._statement(query, args) as conn:
             return await conn.fetchval(query, *args)
 
     async def execute(self, query: str, *args) -> str:
-        async with self.get_connection() as conn:
+        async with self._statement(query, args) as conn:
             return await conn.execute(query, *args)
 
     async def executemany(self, query: str, params: list):
-        async with self.get_connection() as conn:
+        async with self._statement(query, tuple(params[0]) if params else ()) as conn:
             await conn.executemany(query, params)
 
 
@@ -96,23 +132,219 @@ class VoiceDataManager:
                   updated_at     = NOW()
         """, user_id, username, nickname, avatar)
 
+    async def sync_members_bulk(self, members: List[tuple]) -> Dict[str, int]:
+        """Synchronise toute la guilde : (user_id, username, nickname, avatar) par membre.
+
+        Les membres sont copiés (COPY) dans une table temporaire puis fusionnés en
+        une requête. Seules les lignes dont le pseudo, le surnom, l'avatar ou
+        `is_member` changent sont réécrites ; les absents passent à is_member = FALSE.
+        """
+        async with self.db.get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE member_sync (
+                        user_id        BIGINT PRIMARY KEY,
+                        username       TEXT,
+                        nickname       TEXT,
+                        discord_avatar TEXT
+                    ) ON COMMIT DROP
+                """)
+                await conn.copy_records_to_table(
+                    'member_sync', records=members,
+                    columns=['user_id', 'username', 'nickname', 'discord_avatar'],
+                )
+                row = await conn.fetchrow("""
+                    WITH up AS (
+                        INSERT INTO user_voice_data (user_id, username, nickname, discord_avatar, is_member, last_seen)
+                        SELECT user_id, username, nickname, discord_avatar, TRUE, NOW() FROM member_sync
+                        ON CONFLICT (user_id) DO UPDATE
+                          SET username       = EXCLUDED.username,
+                              nickname       = EXCLUDED.nickname,
+                              discord_avatar = COALESCE(EXCLUDED.discord_avatar, user_voice_data.discord_avatar),
+                              is_member      = TRUE,
+                              last_seen      = NOW(),
+                              updated_at     = NOW()
+                          WHERE (user_voice_data.username, user_voice_data.nickname,
+                                 user_voice_data.discord_avatar, user_voice_data.is_member)
+                                IS DISTINCT FROM
+                                (EXCLUDED.username, EXCLUDED.nickname,
+                                 COALESCE(EXCLUDED.discord_avatar, user_voice_data.discord_avatar), TRUE)
+                        RETURNING (xmax = 0) AS inserted
+                    ), gone AS (
+                        UPDATE user_voice_data u SET is_member = FALSE, updated_at = NOW()
+                        WHERE u.is_member IS DISTINCT FROM FALSE
+                          AND NOT EXISTS (SELECT 1 FROM member_sync s WHERE s.user_id = u.user_id)
+                        RETURNING 1
+                    )
+                    SELECT (SELECT COUNT(*) FROM up WHERE inserted)     AS inserted,
+                           (SELECT COUNT(*) FROM up WHERE NOT inserted) AS updated,
+                           (SELECT COUNT(*) FROM gone)                  AS departed
+                """)
+        return dict(row)
+
     async def mark_left(self, user_id: int):
         await self.db.execute(
             "UPDATE user_voice_data SET is_member = FALSE, updated_at = NOW() WHERE user_id = $1",
             user_id
         )
+        # Garde le cache des déblocages borné aux membres présents
+        achievement_manager.forget_user(user_id)
 
     async def update_voice_time(self, user_id: int, username: str, seconds: int):
         await self.db.execute("""
-            INSERT INTO user_voice_data (user_id, username, total_time, last_seen)
-            VALUES ($1, $2, $3, NOW())
+            WITH v AS (
+                INSERT INTO user_voice_data (user_id, username, total_time, last_seen)
+                VALUES ($1, $2, $3, NOW())
+                ON CONFLICT (user_id) DO UPDATE
+                  SET total_time = user_voice_data.total_time + EXCLUDED.total_time,
+                      username   = EXCLUDED.username,
+                      last_seen  = NOW(),
+                      updated_at = NOW()
+                RETURNING user_id
+            )
+            INSERT INTO user_totals (user_id, voice_seconds)
+            SELECT user_id, $3 FROM v
             ON CONFLICT (user_id) DO UPDATE
-              SET total_time = user_voice_data.total_time + EXCLUDED.total_time,
-                  username   = EXCLUDED.username,
-                  last_seen  = NOW(),
-                  updated_at = NOW()
+              SET voice_seconds = user_totals.voice_seconds + EXCLUDED.voice_seconds,
+                  updated_at    = NOW()
         """, user_id, username, seconds)
 
+    async def end_session(self, user_id: int, username: str, seconds: int, channel_id: Optional[int],
+                          night_minutes: int = 0, morning_minutes: int = 0,
+                          session_seconds: Optional[int] = None) -> Dict:
+        """Crédite une session vocale terminée en une seule requête.
+
+        `seconds` est le temps pas encore crédité par les points de reprise,
+        `session_seconds` la durée complète de la session (par défaut `seconds`).
+        Met à jour le streak vocal, le salon, user_voice_data et user_totals,
+        supprime le point de reprise, puis retourne la ligne user_voice_data
+        résultante avec `current_streak`/`max_streak`.
+        """
+        from datetime import date
+        return await self.db.fetchrow("""
+            WITH prev AS (
+                SELECT current_streak, max_streak, last_active_date
+                FROM user_streaks WHERE user_id = $1
+            ), calc AS (
+                SELECT CASE
+                           WHEN p.last_active_date = $5::date THEN p.current_streak
+                           WHEN p.last_active_date = $5::date - 1 THEN p.current_streak + 1
+                           ELSE 1
+                       END AS cur,
+                       COALESCE(p.max_streak, 0) AS mx
+                FROM (SELECT 1) d LEFT JOIN prev p ON TRUE
+            ), s AS (
+                INSERT INTO user_streaks (user_id, current_streak, max_streak, last_active_date, xp_multiplier)
+                SELECT $1::bigint, cur, GREATEST(cur, mx), $5::date,
+                       CASE WHEN cur >= 14 THEN 2.0 WHEN cur >= 7 THEN 1.5 ELSE 1.0 END
+                FROM calc
+                ON CONFLICT (user_id) DO UPDATE
+                  SET current_streak   = EXCLUDED.current_streak,
+                      max_streak       = EXCLUDED.max_streak,
+                      last_active_date = EXCLUDED.last_active_date,
+                      xp_multiplier    = EXCLUDED.xp_multiplier
+                RETURNING current_streak, max_streak
+            ), ch AS (
+                INSERT INTO user_voice_channels (user_id, channel_id, total_time, visit_count)
+                SELECT $1::bigint, $4::bigint, $8::int, 1 WHERE $4::bigint IS NOT NULL
+                ON CONFLICT (user_id, channel_id) DO UPDATE
+                  SET total_time  = user_voice_channels.total_time + EXCLUDED.total_time,
+                      visit_count = user_voice_channels.visit_count + 1
+                RETURNING (xmax = 0) AS inserted
+            ), v AS (
+                INSERT INTO user_voice_data (
+                    user_id, username, total_time, last_seen,
+                    voice_night_minutes, voice_morning_minutes, unique_voice_channels_count,
+                    longest_session_minutes, total_voice_sessions, last_voice_date, consecutive_voice_days
+                )
+                SELECT $1::bigint, $2::text, $3::int, NOW(), $6::int, $7::int,
+                       (SELECT COUNT(*) FROM user_voice_channels WHERE user_id = $1)
+                         + (SELECT COUNT(*) FROM ch WHERE inserted),
+                       $8::int / 60, 1, CURRENT_DATE, s.max_streak
+                FROM s
+                ON CONFLICT (user_id) DO UPDATE
+                  SET total_time                  = user_voice_data.total_time + EXCLUDED.total_time,
+                      username                    = EXCLUDED.username,
+                      last_seen                   = NOW(),
+                      voice_night_minutes         = user_voice_data.voice_night_minutes + EXCLUDED.voice_night_minutes,
+                      voice_morning_minutes       = user_voice_data.voice_morning_minutes + EXCLUDED.voice_morning_minutes,
+                      unique_voice_channels_count = EXCLUDED.unique_voice_channels_count,
+                      longest_session_minutes     = GREATEST(user_voice_data.longest_session_minutes,
+                                                             EXCLUDED.longest_session_minutes),
+                      total_voice_sessions        = user_voice_data.total_voice_sessions + 1,
+                      last_voice_date             = CURRENT_DATE,
+                      consecutive_voice_days      = EXCLUDED.consecutive_voice_days,
+                      updated_at                  = NOW()
+                RETURNING *
+            ), tot AS (
+                INSERT INTO user_totals (user_id, voice_seconds)
+                SELECT user_id, $3 FROM v
+                ON CONFLICT (user_id) DO UPDATE
+                  SET voice_seconds = user_totals.voice_seconds + EXCLUDED.voice_seconds,
+                      updated_at    = NOW()
+            ), cp AS (
+                DELETE FROM voice_session_checkpoints WHERE user_id = $1
+            )
+            SELECT v.*, s.current_streak, s.max_streak FROM v, s
+        """, user_id, username, seconds, channel_id, date.today(), night_minutes, morning_minutes,
+            seconds if session_seconds is None else session_seconds)
+
+    async def checkpoint_sessions(self, rows: List[tuple]):
+        """Crédite le temps des sessions en cours et enregistre leur point de reprise.
+
+        `rows` : (user_id, username, channel_id, started_at, checkpoint_at, seconds).
+        Les points de reprise des membres absents de `rows` sont supprimés.
+        """
+        user_ids    = [r[0] for r in rows]
+        usernames   = [r[1] for r in rows]
+        channel_ids = [r[2] for r in rows]
+        started     = [r[3] for r in rows]
+        checkpoints = [r[4] for r in rows]
+        seconds     = [r[5] for r in rows]
+        await self.db.execute("""
+            WITH batch AS (
+                SELECT * FROM unnest($1::bigint[], $2::text[], $3::bigint[],
+                                     $4::timestamptz[], $5::timestamptz[], $6::int[])
+                       AS b(user_id, username, channel_id, started_at, checkpoint_at, seconds)
+            ), v AS (
+                INSERT INTO user_voice_data (user_id, username, total_time, last_seen)
+                SELECT user_id, username, seconds, NOW() FROM batch
+                ON CONFLICT (user_id) DO UPDATE
+                  SET total_time = user_voice_data.total_time + EXCLUDED.total_time,
+                      username   = EXCLUDED.username,
+                      last_seen  = NOW(),
+                      updated_at = NOW()
+            ), tot AS (
+                INSERT INTO user_totals (user_id, voice_seconds)
+                SELECT user_id, seconds FROM batch
+                ON CONFLICT (user_id) DO UPDATE
+                  SET voice_seconds = user_totals.voice_seconds + EXCLUDED.voice_seconds,
+                      updated_at    = NOW()
+            ), cp AS (
+                INSERT INTO voice_session_checkpoints
+                    (user_id, channel_id, started_at, checkpoint_at, credited_seconds)
+                SELECT user_id, channel_id, started_at, checkpoint_at, seconds FROM batch
+                ON CONFLICT (user_id) DO UPDATE
+                  SET channel_id       = EXCLUDED.channel_id,
+                      started_at       = EXCLUDED.started_at,
+                      checkpoint_at    = EXCLUDED.checkpoint_at,
+                      credited_seconds = CASE
+                          WHEN voice_session_checkpoints.started_at = EXCLUDED.started_at
+                          THEN voice_session_checkpoints.credited_seconds + EXCLUDED.credited_seconds
+                          ELSE EXCLUDED.credited_seconds
+                      END
+            )
+            DELETE FROM voice_session_checkpoints WHERE user_id <> ALL($1::bigint[])
+        """, user_ids, usernames, channel_ids, started, checkpoints, seconds)
+
+    async def get_checkpoints(self) -> List[Dict]:
+        return await self.db.fetch("SELECT * FROM voice_session_checkpoints")
+
+    async def delete_checkpoints(self, user_ids: List[int]):
+        await self.db.execute(
+            "DELETE FROM voice_session_checkpoints WHERE user_id = ANY($1::bigint[])", user_ids
+        )
+
     async def get_leaderboard(self, limit: int = 10) -> List[Dict]:
         return await self.db.fetch(
             "SELECT * FROM user_voice_data ORDER BY total_time DESC LIMIT $1", limit
@@ -120,16 +352,20 @@ class VoiceDataManager:
 
     async def find_by_name(self, term: str) -> Optional[Dict]:
         t = term.strip().lower()
+        # ILIKE est servi par les index trigrammes (migration 020) ; à égalité de
+        # préfixe, le nom le plus proche du terme l'emporte
+        prefix = t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
         return await self.db.fetchrow("""
             SELECT * FROM user_voice_data
-            WHERE LOWER(username) = $1 OR LOWER(nickname) = $1
-               OR LOWER(username) LIKE $2 OR LOWER(nickname) LIKE $2
+            WHERE username ILIKE $2 OR nickname ILIKE $2
             ORDER BY CASE
                 WHEN LOWER(username) = $1 THEN 1
                 WHEN LOWER(nickname) = $1 THEN 2
                 ELSE 3
-            END LIMIT 1
-        """, t, f"{t}%")
+            END,
+            GREATEST(similarity(username, $1), similarity(COALESCE(nickname, ''), $1)) DESC
+            LIMIT 1
+        """, t, prefix)
 
 
 class WarnManager:
@@ -192,36 +428,114 @@ class MessageStatsManager:
         self.db = db
 
     async def increment(self, user_id: int, channel_id: int):
-        await self.db.execute("""
-            INSERT INTO user_voice_data (user_id, username)
-            VALUES ($1, $2) ON CONFLICT (user_id) DO NOTHING
-        """, user_id, f"User_{user_id}")
-        await self.db.execute("""
-            INSERT INTO user_message_stats (user_id, channel_id, message_count)
-            VALUES ($1, $2, 1)
-            ON CONFLICT (user_id, channel_id)
-            DO UPDATE SET message_count = user_message_stats.message_count + 1,
-                          updated_at = NOW()
-        """, user_id, channel_id)
+        await self.increment_many([(user_id, channel_id, 1)])
+
+    async def increment_many(self, rows: List[tuple]):
+        """Applique un lot de deltas (user_id, channel_id, count) en une transaction.
+
+        `user_totals` est mis à jour dans la même requête : messages ajoutés et
+        nombre de nouveaux couples (membre, salon) créés par l'upsert.
+        """
+        if not rows:
+            return
+        user_ids    = [r[0] for r in rows]
+        channel_ids = [r[1] for r in rows]
+        counts      = [r[2] for r in rows]
+        async with self.db.get_connection() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    INSERT INTO user_voice_data (user_id, username)
+                    SELECT DISTINCT u, 'User_' || u FROM unnest($1::bigint[]) AS u
+                    ON CONFLICT (user_id) DO NOTHING
+                """, user_ids)
+                await conn.execute("""
+                    WITH batch AS (
+                        SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::int[])
+                                 AS b(user_id, channel_id, n)
+                    ), up AS (
+                        INSERT INTO user_message_stats (user_id, channel_id, message_count)
+                        SELECT user_id, channel_id, n FROM batch
+                        ON CONFLICT (user_id, channel_id)
+                        DO UPDATE SET message_count = user_message_stats.message_count + EXCLUDED.message_count,
+                                      updated_at = NOW()
+                        RETURNING user_id, (xmax = 0) AS inserted
+                    )
+                    INSERT INTO user_totals (user_id, messages, distinct_channels)
+                    SELECT b.user_id, b.messages, COALESCE(u.new_channels, 0)
+                    FROM (SELECT user_id, SUM(n) AS messages FROM batch GROUP BY user_id) b
+                    LEFT JOIN (
+                        SELECT user_id, COUNT(*) FILTER (WHERE inserted) AS new_channels
+                        FROM up GROUP BY user_id
+                    ) u ON u.user_id = b.user_id
+                    ON CONFLICT (user_id) DO UPDATE
+                      SET messages          = user_totals.messages + EXCLUDED.messages,
+                          distinct_channels = user_totals.distinct_channels + EXCLUDED.distinct_channels,
+                          updated_at        = NOW()
+                """, user_ids, channel_ids, counts)
 
     async def get_total(self, user_id: int) -> int:
         return await self.db.fetchval(
-            "SELECT COALESCE(SUM(message_count), 0) FROM user_message_stats WHERE user_id = $1",
-            user_id
+            "SELECT messages FROM user_totals WHERE user_id = $1", user_id
         ) or 0
 
     async def get_leaderboard(self, limit: int = 10) -> List[Dict]:
         return await self.db.fetch("""
             SELECT u.user_id, u.username, u.discord_avatar,
-                   SUM(s.message_count) AS total_messages
-            FROM user_voice_data u
-            JOIN user_message_stats s ON u.user_id = s.user_id
-            GROUP BY u.user_id, u.username, u.discord_avatar
-            ORDER BY total_messages DESC
+                   t.messages AS total_messages
+            FROM user_totals t
+            JOIN user_voice_data u ON u.user_id = t.user_id
+            WHERE t.messages > 0
+            ORDER BY t.messages DESC
             LIMIT $1
         """, limit)
 
 
+class UserTotalsManager:
+    """Totaux dénormalisés par membre (table `user_totals`, migration 011).
+
+    Tenus à jour par les mêmes requêtes que les compteurs sources ;
+    `rebuild` les recalcule entièrement en cas de dérive.
+    """
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+
+    async def get(self, user_id: int) -> Optional[Dict]:
+        return await self.db.fetchrow("SELECT * FROM user_totals WHERE user_id = $1", user_id)
+
+    async def rebuild(self) -> int:
+        """Recalcule tous les totaux depuis les tables sources. Retourne le nombre de lignes."""
+        status = await self.db.execute("""
+            INSERT INTO user_totals (user_id, messages, distinct_channels, commands_used,
+                                     voice_seconds, achievement_count)
+            SELECT v.user_id,
+                   COALESCE(m.messages, 0),
+                   COALESCE(m.channels, 0),
+                   COALESCE(c.commands, 0),
+                   COALESCE(v.total_time, 0),
+                   COALESCE(a.achievements, 0)
+            FROM user_voice_data v
+            LEFT JOIN (
+                SELECT user_id, SUM(message_count) AS messages, COUNT(DISTINCT channel_id) AS channels
+                FROM user_message_stats GROUP BY user_id
+            ) m ON m.user_id = v.user_id
+            LEFT JOIN (
+                SELECT user_id, SUM(usage_count) AS commands FROM user_command_stats GROUP BY user_id
+            ) c ON c.user_id = v.user_id
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS achievements FROM user_achievements GROUP BY user_id
+            ) a ON a.user_id = v.user_id
+            ON CONFLICT (user_id) DO UPDATE
+              SET messages          = EXCLUDED.messages,
+                  distinct_channels = EXCLUDED.distinct_channels,
+                  commands_used     = EXCLUDED.commands_used,
+                  voice_seconds     = EXCLUDED.voice_seconds,
+                  achievement_count = EXCLUDED.achievement_count,
+                  updated_at        = NOW()
+        """)
+        return int(status.split()[-1]) if status else 0
+
+
 class XPManager:
     def __init__(self, db: DatabaseManager):
         self.db = db
@@ -245,33 +559,29 @@ class XPManager:
         return max(1, int((total_xp / 100) ** 0.5))
 
     async def add_xp(self, user_id: int, amount: int) -> dict:
-        """Add XP to user, return {new_xp, new_level, leveled_up}."""
-        await self.db.execute("""
-            INSERT INTO user_xp (user_id) VALUES ($1)
-            ON CONFLICT (user_id) DO NOTHING
-        """, user_id)
-
-        row = await self.db.fetchrow("SELECT * FROM user_xp WHERE user_id = $1", user_id)
-        old_level = row['current_level'] if row else 1
+        """Add XP to user, return {new_xp, new_level, leveled_up, old_level}.
 
-        await self.db.execute("""
-            UPDATE user_xp
-            SET total_xp = total_xp + $2,
-                weekly_xp = weekly_xp + $2,
-                monthly_xp = monthly_xp + $2
-            WHERE user_id = $1
+        Un seul upsert atomique : le niveau est recalculé côté SQL avec la même
+        courbe que `level_from_xp`, et l'ancien niveau se déduit de l'XP avant
+        le delta (le niveau est une fonction de l'XP totale), ce qui reste juste
+        même si plusieurs gains arrivent en parallèle pour le même membre.
+        """
+        row = await self.db.fetchrow("""
+            INSERT INTO user_xp (user_id, total_xp, weekly_xp, monthly_xp, current_level)
+            VALUES ($1, $2, $2, $2, GREATEST(1, FLOOR(SQRT(GREATEST($2, 0) / 100.0)))::int)
+            ON CONFLICT (user_id) DO UPDATE
+              SET total_xp      = user_xp.total_xp   + EXCLUDED.total_xp,
+                  weekly_xp     = user_xp.weekly_xp  + EXCLUDED.total_xp,
+                  monthly_xp    = user_xp.monthly_xp + EXCLUDED.total_xp,
+                  current_level = GREATEST(1, FLOOR(SQRT(
+                                      GREATEST(user_xp.total_xp + EXCLUDED.total_xp, 0) / 100.0
+                                  )))::int
+            RETURNING total_xp, current_level
         """, user_id, amount)
 
-        new_row = await self.db.fetchrow("SELECT total_xp FROM user_xp WHERE user_id = $1", user_id)
-        new_xp = new_row['total_xp'] if new_row else 0
-        new_level = self.level_from_xp(new_xp)
-
-        if new_level != old_level:
-            await self.db.execute(
-                "UPDATE user_xp SET current_level = $2 WHERE user_id = $1",
-                user_id, new_level
-            )
-
+        new_xp = row['total_xp'] if row else 0
+        new_level = row['current_level'] if row else 1
+        old_level = self.level_from_xp(new_xp - amount)
         return {'new_xp': new_xp, 'new_level': new_level, 'leveled_up': new_level > old_level, 'old_level': old_level}
 
     async def get_user_xp(self, user_id: int) -> Optional[Dict]:
@@ -378,37 +688,37 @@ class QuestManager:
 
     async def update_progress(self, user_id: int, quest_type: str, increment: int = 1) -> List[Dict]:
         """Update progress for all active quests of this type. Returns completed quests."""
-        quests = await self.db.fetch("""
-            SELECT q.id, q.target_value, q.xp_reward, q.title, q.icon
-            FROM weekly_quests q
-            LEFT JOIN user_quest_progress uqp ON q.id = uqp.quest_id AND uqp.user_id = $1
-            WHERE q.is_active = TRUE AND q.quest_type = $2
-              AND (uqp.completed IS NULL OR uqp.completed = FALSE)
-        """, user_id, quest_type)
-
-        newly_completed = []
-        for q in quests:
-            await self.db.execute("""
-                INSERT INTO user_quest_progress (user_id, quest_id, progress_value)
-                VALUES ($1, $2, $3)
-                ON CONFLICT (user_id, quest_id)
-                DO UPDATE SET progress_value = user_quest_progress.progress_value + $3
-            """, user_id, q['id'], increment)
-
-            row = await self.db.fetchrow("""
-                SELECT progress_value FROM user_quest_progress WHERE user_id = $1 AND quest_id = $2
-            """, user_id, q['id'])
-
-            if row and row['progress_value'] >= q['target_value']:
-                result = await self.db.execute("""
-                    UPDATE user_quest_progress
-                    SET completed = TRUE, completed_at = NOW()
-                    WHERE user_id = $1 AND quest_id = $2 AND completed = FALSE
-                """, user_id, q['id'])
-                if result != 'UPDATE 0':
-                    newly_completed.append(dict(q))
-
-        return newly_completed
+        # Une seule requête : progression et passage à completed dans le même upsert.
+        # Seules les quêtes non terminées sont touchées, donc `completed` en retour
+        # signifie « terminée par cet incrément ».
+        return await self.db.fetch("""
+            WITH active AS (
+                SELECT q.id, q.target_value, q.xp_reward, q.title, q.icon
+                FROM weekly_quests q
+                LEFT JOIN user_quest_progress uqp ON q.id = uqp.quest_id AND uqp.user_id = $1
+                WHERE q.is_active = TRUE AND q.quest_type = $2
+                  AND (uqp.completed IS NULL OR uqp.completed = FALSE)
+            ), up AS (
+                INSERT INTO user_quest_progress (user_id, quest_id, progress_value, completed, completed_at)
+                SELECT $1::bigint, a.id, $3::int, $3::int >= a.target_value,
+                       CASE WHEN $3::int >= a.target_value THEN NOW() END
+                FROM active a
+                ON CONFLICT (user_id, quest_id) DO UPDATE
+                  SET progress_value = user_quest_progress.progress_value + EXCLUDED.progress_value,
+                      completed      = user_quest_progress.progress_value + EXCLUDED.progress_value
+                                       >= (SELECT target_value FROM weekly_quests WHERE id = EXCLUDED.quest_id),
+                      completed_at   = CASE
+                                         WHEN user_quest_progress.progress_value + EXCLUDED.progress_value
+                                              >= (SELECT target_value FROM weekly_quests WHERE id = EXCLUDED.quest_id)
+                                         THEN NOW()
+                                       END
+                  WHERE user_quest_progress.completed = FALSE
+                RETURNING quest_id, completed
+            )
+            SELECT a.id, a.target_value, a.xp_reward, a.title, a.icon
+            FROM up JOIN active a ON a.id = up.quest_id
+            WHERE up.completed
+        """, user_id, quest_type, increment)
 
     async def get_user_progress(self, user_id: int) -> List[Dict]:
         from datetime import date
@@ -511,13 +821,26 @@ class CommandStatsManager:
     def __init__(self, db: DatabaseManager):
         self.db = db
 
-    async def increment(self, user_id: int, command_name: str):
-        await self.db.execute("""
-            INSERT INTO user_command_stats (user_id, command_name, usage_count, last_used)
-            VALUES ($1, $2, 1, NOW())
-            ON CONFLICT (user_id, command_name)
-            DO UPDATE SET usage_count = user_command_stats.usage_count + 1, last_used = NOW()
+    async def increment(self, user_id: int, command_name: str) -> Dict:
+        """Incrémente le compteur et retourne {usage_count, commands_used} en un aller-retour."""
+        row = await self.db.fetchrow("""
+            WITH c AS (
+                INSERT INTO user_command_stats (user_id, command_name, usage_count, last_used)
+                VALUES ($1, $2, 1, NOW())
+                ON CONFLICT (user_id, command_name)
+                DO UPDATE SET usage_count = user_command_stats.usage_count + 1, last_used = NOW()
+                RETURNING user_id, usage_count
+            ), t AS (
+                INSERT INTO user_totals (user_id, commands_used)
+                SELECT user_id, 1 FROM c
+                ON CONFLICT (user_id) DO UPDATE
+                  SET commands_used = user_totals.commands_used + 1,
+                      updated_at    = NOW()
+                RETURNING commands_used
+            )
+            SELECT c.usage_count, t.commands_used FROM c, t
         """, user_id, command_name)
+        return row or {'usage_count': 0, 'commands_used': 0}
 
     async def get_count(self, user_id: int, command_name: str) -> int:
         return await self.db.fetchval(
@@ -527,27 +850,103 @@ class CommandStatsManager:
 
 
 class AchievementManager:
+    """Vérification des achievements sur un index en mémoire.
+
+    Le catalogue `achievements` est chargé en tableaux de seuils triés par
+    `condition_type`, et les achievements déjà débloqués sont gardés par membre
+    sous forme de bitset (bit = id). Une vérification se résume à un `bisect` :
+    seuls les vrais déblocages touchent la base.
+    """
+
     def __init__(self, db: DatabaseManager):
         self.db = db
+        self._catalogue: Dict[int, Dict] = {}
+        self._thresholds: Dict[str, List[int]] = {}
+        self._threshold_ids: Dict[str, List[int]] = {}
+        self._unlocked: Dict[int, int] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def reload(self):
+        """(Re)charge le catalogue et vide le cache des déblocages par membre."""
+        rows = await self.db.fetch(
+            "SELECT * FROM achievements ORDER BY condition_type, condition_value, id"
+        )
+        catalogue, thresholds, ids = {}, {}, {}
+        for r in rows:
+            catalogue[r['id']] = r
+            thresholds.setdefault(r['condition_type'], []).append(r['condition_value'])
+            ids.setdefault(r['condition_type'], []).append(r['id'])
+        self._catalogue, self._thresholds, self._threshold_ids = catalogue, thresholds, ids
+        self._unlocked = {}
+        self._loaded = True
+        logger.info(f"Catalogue achievements chargé : {len(catalogue)} entrées")
+
+    async def _ensure_loaded(self):
+        if not self._loaded:
+            async with self._load_lock:
+                if not self._loaded:
+                    await self.reload()
+
+    async def _unlocked_mask(self, user_id: int) -> int:
+        mask = self._unlocked.get(user_id)
+        if mask is None:
+            rows = await self.db.fetch(
+                "SELECT achievement_id FROM user_achievements WHERE user_id = $1", user_id
+            )
+            mask = 0
+            for r in rows:
+                mask |= 1 << r['achievement_id']
+            self._unlocked[user_id] = mask
+        return mask
+
+    def get_cached(self, achievement_id: int) -> Optional[Dict]:
+        return self._catalogue.get(achievement_id)
+
+    def forget_user(self, user_id: int):
+        """Invalide le cache d'un membre (ex. achievement retiré à la main)."""
+        self._unlocked.pop(user_id, None)
 
     async def check_and_unlock(self, user_id: int, condition_type: str, current_value: int) -> List[Dict]:
         """Unlock achievements whose threshold is met, return newly unlocked ones."""
-        newly = await self.db.fetch("""
-            SELECT a.* FROM achievements a
-            WHERE a.condition_type = $1
-              AND a.condition_value <= $2
-              AND NOT EXISTS (
-                SELECT 1 FROM user_achievements ua
-                WHERE ua.user_id = $3 AND ua.achievement_id = a.id
-              )
-        """, condition_type, current_value, user_id)
-
-        for a in newly:
-            await self.db.execute(
-                "INSERT INTO user_achievements (user_id, achievement_id) VALUES ($1, $2) ON CONFLICT DO NOTHING",
-                user_id, a['id']
+        await self._ensure_loaded()
+        values = self._thresholds.get(condition_type)
+        if not values:
+            bot_metrics.achievement_checks_avoided.inc()
+            return []
+        reached = self._threshold_ids[condition_type][:bisect_right(values, current_value)]
+        if not reached:
+            bot_metrics.achievement_checks_avoided.inc()
+            return []
+
+        mask = await self._unlocked_mask(user_id)
+        candidates = [aid for aid in reached if not mask & (1 << aid)]
+        if not candidates:
+            bot_metrics.achievement_checks_avoided.inc()
+            return []
+
+        # RETURNING ne renvoie que les lignes réellement insérées : un déblocage
+        # fait ailleurs (web-api, autre événement concurrent) n'est pas renotifié.
+        rows = await self.db.fetch("""
+            WITH ins AS (
+                INSERT INTO user_achievements (user_id, achievement_id)
+                SELECT $1, unnest($2::int[])
+                ON CONFLICT DO NOTHING
+                RETURNING achievement_id
+            ), tot AS (
+                INSERT INTO user_totals (user_id, achievement_count)
+                SELECT $1, COUNT(*) FROM ins HAVING COUNT(*) > 0
+                ON CONFLICT (user_id) DO UPDATE
+                  SET achievement_count = user_totals.achievement_count + EXCLUDED.achievement_count,
+                      updated_at        = NOW()
             )
-        return [dict(a) for a in newly]
+            SELECT achievement_id FROM ins
+        """, user_id, candidates)
+
+        for aid in candidates:
+            mask |= 1 << aid
+        self._unlocked[user_id] = mask
+        return [dict(self._catalogue[r['achievement_id']]) for r in rows]
 
 
 class BumpManager:
@@ -687,6 +1086,7 @@ db_manager            = DatabaseManager()
 voice_manager         = VoiceDataManager(db_manager)
 warn_manager          = WarnManager(db_manager)
 message_stats_manager = MessageStatsManager(db_manager)
+user_totals_manager   = UserTotalsManager(db_manager)
 xp_manager            = XPManager(db_manager)
 streak_manager        = StreakManager(db_manager)
 quest_manager         = QuestManager(db_manager)
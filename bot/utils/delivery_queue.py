@@ -0,0 +1,323 @@
+"""File d'envoi durable vers Discord : DM, messages de salon, attributions de rôles.
+
+Les cogs n'appellent plus Discord depuis le chemin chaud : ils insèrent une ligne
+dans `outbound_deliveries` et un dispatcher unique l'envoie plus tard.
+
+- chaque route (DM, salon, rôles) a son token bucket calé sur les limites Discord ;
+  une route saturée replanifie ses envois au lieu de bloquer les autres ;
+- les DM portant la même `coalesce_key` pour un même membre (déblocages
+  d'achievements en rafale) sont regroupés en un seul message ;
+- un 429 replanifie après `retry_after`, les autres erreurs temporaires
+  réessaient avec un backoff exponentiel ; Forbidden/NotFound sont définitifs.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+import metrics as bot_metrics
+from utils.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS      = 2.0
+BATCH_SIZE        = 50
+LEASE_SECONDS     = 60      # une ligne réclamée puis perdue (crash) redevient éligible
+COALESCE_SECONDS  = 5       # délai laissé aux déblocages en rafale pour être regroupés
+MAX_ATTEMPTS      = 5
+RETENTION_DAYS    = 7
+
+# (capacité, jetons par seconde) — alignés sur les limites Discord par route
+_ROUTE_LIMITS = {
+    'dm':      (5, 1.0),     # ouverture de DM + envoi
+    'channel': (5, 1.0),     # 5 messages / 5 s par salon
+    'roles':   (10, 1.0),    # modifications de membres : 10 / 10 s par guilde
+}
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def acquire(self) -> float:
+        """Consomme un jeton. Retourne 0 si accordé, sinon le délai avant le prochain jeton."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def penalize(self, seconds: float):
+        """Vide le bucket pour `seconds` (après un 429)."""
+        self.tokens = -seconds * self.rate
+        self.updated = time.monotonic()
+
+
+async def ensure_role(guild: discord.Guild, role_name: str, color: discord.Color) -> Optional[discord.Role]:
+    """Retourne le rôle existant ou le crée."""
+    role = discord.utils.get(guild.roles, name=role_name)
+    if role:
+        return role
+    try:
+        role = await guild.create_role(
+            name=role_name,
+            color=color,
+            reason="Rôle achievement créé automatiquement par Hermes",
+        )
+        logger.info(f"Rôle achievement créé : '{role_name}'")
+        return role
+    except discord.Forbidden:
+        logger.warning(f"Permissions insuffisantes pour créer le rôle '{role_name}'")
+        return None
+    except Exception as e:
+        logger.error(f"Erreur création rôle '{role_name}': {e}")
+        return None
+
+
+class _Permanent(Exception):
+    """Échec qui ne sera pas réessayé (membre parti, DM fermés, permissions)."""
+
+
+class DeliveryQueue:
+    def __init__(self, db):
+        self.db = db
+        self.bot = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._last_cleanup = 0.0
+
+    # ── Enqueue ───────────────────────────────────────────────────────────────
+
+    async def _enqueue(self, kind: str, user_id: Optional[int], channel_id: Optional[int],
+                       payload: dict, coalesce_key: Optional[str] = None, delay: float = 0):
+        await self.db.execute("""
+            INSERT INTO outbound_deliveries (kind, user_id, channel_id, coalesce_key, payload, next_attempt_at)
+            VALUES ($1, $2, $3, $4, $5::jsonb, NOW() + make_interval(secs => $6))
+        """, kind, user_id, channel_id, coalesce_key, json.dumps(payload), float(delay))
+        if not delay:
+            self._wakeup.set()
+
+    async def send_dm(self, user_id: int, title: str, line: str, *,
+                      coalesce_key: Optional[str] = None, title_many: Optional[str] = None,
+                      color: Optional[int] = None):
+        """DM au membre. Les DM de même `coalesce_key` sont fusionnés (titre `title_many`, {n} = nombre)."""
+        await self._enqueue(
+            'dm', user_id, None,
+            {'title': title, 'title_many': title_many or title, 'line': line, 'color': color},
+            coalesce_key, delay=COALESCE_SECONDS if coalesce_key else 0,
+        )
+
+    async def send_channel_message(self, channel_id: int, embed: discord.Embed, content: Optional[str] = None):
+        await self._enqueue('channel_message', None, channel_id, {'embed': embed.to_dict(), 'content': content})
+
+    async def add_role(self, user_id: int, role_name: str, reason: str = '',
+                       create_color: Optional[int] = None):
+        """Attribue un rôle par nom. Avec `create_color`, le rôle est créé s'il n'existe pas."""
+        await self._enqueue('role_add', user_id, None,
+                            {'role': role_name, 'reason': reason, 'create_color': create_color})
+
+    # ── Dispatcher ────────────────────────────────────────────────────────────
+
+    def start(self, bot):
+        self.bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._dispatch_once()
+                await self._maintenance()
+            except Exception as e:
+                logger.error(f"Delivery dispatcher error: {e}", exc_info=True)
+
+    async def _claim(self) -> List[dict]:
+        """Réclame les lignes dues, plus les DM en attente de même (membre, coalesce_key)
+        quelle que soit leur échéance : un déblocage arrivé juste après part dans le même DM."""
+        return await self.db.fetch(f"""
+            WITH due AS (
+                SELECT id, kind, user_id, coalesce_key FROM outbound_deliveries
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+                ORDER BY next_attempt_at
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            ), siblings AS (
+                SELECT o.id FROM outbound_deliveries o
+                JOIN due d ON d.kind = 'dm' AND d.coalesce_key IS NOT NULL
+                          AND o.user_id = d.user_id AND o.coalesce_key = d.coalesce_key
+                WHERE o.kind = 'dm' AND o.status = 'pending'
+                FOR UPDATE OF o SKIP LOCKED
+            )
+            UPDATE outbound_deliveries SET next_attempt_at = NOW() + INTERVAL '{LEASE_SECONDS} seconds'
+            WHERE id IN (SELECT id FROM due UNION SELECT id FROM siblings)
+            RETURNING *, EXTRACT(EPOCH FROM NOW() - created_at) AS age_seconds
+        """, BATCH_SIZE)
+
+    async def _dispatch_once(self):
+        rows = await self._claim()
+        if not rows:
+            return
+
+        # DM regroupés par (membre, coalesce_key) ; le reste est envoyé ligne à ligne
+        groups: Dict[Tuple, List[dict]] = defaultdict(list)
+        for r in rows:
+            if r['kind'] == 'dm' and r['coalesce_key']:
+                groups[('dm', r['user_id'], r['coalesce_key'])].append(r)
+            else:
+                groups[('row', r['id'])].append(r)
+
+        for group in groups.values():
+            head = group[0]
+            route = self._route(head)
+            bucket = self._bucket(route)
+            wait = bucket.acquire()
+            if wait:
+                await self._reschedule(group, wait, count_attempt=False)
+                continue
+            kind = head['kind']
+            try:
+                await self._deliver(group)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    retry_after = float(getattr(e, 'retry_after', 0) or 5)
+                    bucket.penalize(retry_after)
+                    await self._reschedule(group, retry_after, count_attempt=False)
+                elif isinstance(e, (discord.Forbidden, discord.NotFound)):
+                    await self._finish(group, 'failed', str(e))
+                else:
+                    await self._retry(group, str(e))
+            except _Permanent as e:
+                await self._finish(group, 'failed', str(e))
+            except Exception as e:
+                await self._retry(group, str(e))
+            else:
+                await self._finish(group, 'delivered')
+                for r in group:
+                    bot_metrics.delivery_latency_seconds.labels(kind=kind).observe(float(r['age_seconds']))
+
+    def _route(self, row: dict) -> str:
+        if row['kind'] == 'dm':
+            return 'dm'
+        if row['kind'] == 'channel_message':
+            return f"channel:{row['channel_id']}"
+        return 'roles'
+
+    def _bucket(self, route: str) -> TokenBucket:
+        if route not in self._buckets:
+            capacity, rate = _ROUTE_LIMITS[route.split(':', 1)[0]]
+            self._buckets[route] = TokenBucket(capacity, rate)
+        return self._buckets[route]
+
+    def _guild(self) -> discord.Guild:
+        guild = self.bot.get_guild(int(os.getenv('GUILD_ID', '0'))) if self.bot else None
+        if not guild:
+            raise RuntimeError("guild indisponible")
+        return guild
+
+    async def _deliver(self, group: List[dict]):
+        head = group[0]
+        payload = json.loads(head['payload']) if isinstance(head['payload'], str) else head['payload']
+
+        if head['kind'] == 'dm':
+            lines = []
+            for r in group:
+                p = json.loads(r['payload']) if isinstance(r['payload'], str) else r['payload']
+                lines.append(p['line'])
+            title = payload['title'] if len(lines) == 1 else payload['title_many'].format(n=len(lines))
+            embed = discord.Embed(title=title, description="\n".join(lines),
+                                  color=payload.get('color') or discord.Color.gold())
+            user = self.bot.get_user(head['user_id']) or await self.bot.fetch_user(head['user_id'])
+            await user.send(embed=embed)
+
+        elif head['kind'] == 'channel_message':
+            channel = self.bot.get_channel(head['channel_id'])
+            if channel is None:
+                raise _Permanent("salon introuvable")
+            await channel.send(content=payload.get('content'), embed=discord.Embed.from_dict(payload['embed']))
+
+        elif head['kind'] == 'role_add':
+            guild = self._guild()
+            if payload.get('create_color') is not None:
+                role = await ensure_role(guild, payload['role'], discord.Color(payload['create_color']))
+            else:
+                role = discord.utils.get(guild.roles, name=payload['role'])
+            if role is None:
+                raise _Permanent(f"rôle '{payload['role']}' introuvable")
+            member = guild.get_member(head['user_id']) or await guild.fetch_member(head['user_id'])
+            if role not in member.roles:
+                await member.add_roles(role, reason=payload.get('reason') or None)
+
+    async def _finish(self, group: List[dict], status: str, error: Optional[str] = None):
+        ids = [r['id'] for r in group]
+        await self.db.execute("""
+            UPDATE outbound_deliveries
+            SET status = $2, last_error = $3, delivered_at = CASE WHEN $2 = 'delivered' THEN NOW() END
+            WHERE id = ANY($1::bigint[])
+        """, ids, status, error)
+        if status == 'failed':
+            bot_metrics.delivery_failures.labels(kind=group[0]['kind']).inc(len(ids))
+            logger.warning(f"Envoi {group[0]['kind']} abandonné ({len(ids)} lignes): {error}")
+
+    async def _reschedule(self, group: List[dict], delay: float, count_attempt: bool):
+        await self.db.execute("""
+            UPDATE outbound_deliveries
+            SET next_attempt_at = NOW() + make_interval(secs => $2),
+                attempts        = attempts + $3
+            WHERE id = ANY($1::bigint[])
+        """, [r['id'] for r in group], float(delay), 1 if count_attempt else 0)
+
+    async def _retry(self, group: List[dict], error: str):
+        attempts = max(r['attempts'] for r in group) + 1
+        if attempts >= MAX_ATTEMPTS:
+            await self._finish(group, 'failed', error)
+            return
+        bot_metrics.delivery_retries.labels(kind=group[0]['kind']).inc()
+        await self.db.execute("""
+            UPDATE outbound_deliveries SET last_error = $2 WHERE id = ANY($1::bigint[])
+        """, [r['id'] for r in group], error)
+        await self._reschedule(group, 5 * 2 ** attempts, count_attempt=True)
+
+    async def _maintenance(self):
+        backlog = await self.db.fetchrow("""
+            SELECT COUNT(*) AS pending,
+                   COALESCE(EXTRACT(EPOCH FROM NOW() - MIN(created_at)), 0) AS oldest
+            FROM outbound_deliveries WHERE status = 'pending'
+        """)
+        bot_metrics.delivery_backlog.set(backlog['pending'])
+        bot_metrics.delivery_oldest_pending_seconds.set(float(backlog['oldest']))
+
+        if time.monotonic() - self._last_cleanup > 3600:
+            self._last_cleanup = time.monotonic()
+            await self.db.execute(f"""
+                DELETE FROM outbound_deliveries
+                WHERE status <> 'pending' AND created_at < NOW() - INTERVAL '{RETENTION_DAYS} days'
+            """)
+
+
+# ── Singleton ─────────────────────────────────────────────────────────────────
+delivery_queue = DeliveryQueue(db_manager)
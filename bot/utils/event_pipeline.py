@@ -0,0 +1,144 @@
+"""Pipeline d'événements interne : découple la gateway Discord du travail en base.
+
+Les handlers d'événements (`on_message`, `on_voice_state_update`, ...) ne font
+plus que capturer ce dont ils ont besoin puis déposent un `PipelineEvent` dans
+une file bornée. Un pool de workers consomme les files ; chaque membre est
+toujours routé vers le même worker (`user_id % workers`), ce qui garantit que
+ses événements sont traités dans l'ordre d'arrivée.
+
+Quand une file est pleine :
+- les événements `droppable` suivent `drop_policy` (`drop_new` ou `drop_oldest`) ;
+- les autres (temps vocal, arrivées de membres) attendent une place — la
+  contre-pression remonte alors jusqu'au handler de la gateway.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable, List, Optional
+
+import metrics as bot_metrics
+from config import EVENT_WORKERS, EVENT_QUEUE_SIZE, EVENT_DROP_POLICY
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ('drop_new', 'drop_oldest')
+
+
+class EventKind(str, Enum):
+    MESSAGE       = 'message'
+    VOICE         = 'voice'
+    REACTION      = 'reaction'
+    MEMBER_JOIN   = 'member_join'
+    MEMBER_REMOVE = 'member_remove'
+
+
+@dataclass
+class PipelineEvent:
+    kind:      EventKind
+    user_id:   int
+    handler:   Callable[..., Awaitable[Any]]
+    args:      tuple = ()
+    droppable: bool = True
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class EventPipeline:
+    def __init__(self, workers: int = 4, max_queue: int = 1000, drop_policy: str = 'drop_oldest'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy doit être l'une de {DROP_POLICIES}")
+        self.workers = max(1, workers)
+        self.drop_policy = drop_policy
+        # Une file par worker : capacité totale ≈ max_queue
+        per_queue = max(1, max_queue // self.workers)
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=per_queue) for _ in range(self.workers)]
+        self._tasks: List[asyncio.Task] = []
+        bot_metrics.event_queue_depth.set_function(self.depth)
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+        logger.info(f"Pipeline d'événements démarré ({self.workers} workers, politique {self.drop_policy})")
+
+    async def submit(self, kind: EventKind, user_id: int, handler: Callable[..., Awaitable[Any]],
+                     *args, droppable: bool = True) -> bool:
+        """Dépose un événement. Retourne False s'il a été rejeté (file pleine)."""
+        event = PipelineEvent(kind, user_id, handler, args, droppable)
+        queue = self._queues[user_id % self.workers]
+
+        if not droppable:
+            await queue.put(event)
+            return True
+
+        try:
+            queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.drop_policy == 'drop_new':
+            bot_metrics.events_dropped.labels(kind=kind.value).inc()
+            return False
+
+        # drop_oldest : on sacrifie le plus ancien événement jetable de cette file
+        dropped: Optional[PipelineEvent] = None
+        kept = []
+        while not queue.empty():
+            ev = queue.get_nowait()
+            queue.task_done()
+            if dropped is None and ev.droppable:
+                dropped = ev
+            else:
+                kept.append(ev)
+        for ev in kept:
+            queue.put_nowait(ev)
+        if dropped is None:
+            bot_metrics.events_dropped.labels(kind=kind.value).inc()
+            return False
+        bot_metrics.events_dropped.labels(kind=dropped.kind.value).inc()
+        queue.put_nowait(event)
+        return True
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            event: PipelineEvent = await queue.get()
+            started = time.monotonic()
+            bot_metrics.event_queue_wait_seconds.labels(kind=event.kind.value).observe(started - event.enqueued_at)
+            try:
+                await event.handler(*event.args)
+            except Exception as e:
+                logger.error(f"Événement {event.kind.value} ({event.user_id}) en échec: {e}", exc_info=True)
+            finally:
+                bot_metrics.event_processing_seconds.labels(kind=event.kind.value).observe(
+                    time.monotonic() - started
+                )
+                queue.task_done()
+
+    async def close(self, timeout: float = 10.0):
+        """Laisse les workers vider les files (au plus `timeout` secondes), puis les arrête."""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Pipeline arrêté avec {self.depth()} événements non traités")
+        for t in self._tasks:
+            t.cancel()
+        for t in self._tasks:
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+# ── Singleton ─────────────────────────────────────────────────────────────────
+event_pipeline = EventPipeline(
+    workers=EVENT_WORKERS,
+    max_queue=EVENT_QUEUE_SIZE,
+    drop_policy=EVENT_DROP_POLICY,
+)
@@ -0,0 +1,149 @@
+"""Client HTTP partagé du bot : une session aiohttp (keep-alive) et un cache disque.
+
+`get(url, conditional=True)` renvoie If-None-Match / If-Modified-Since à partir
+des en-têtes mémorisés ; sur 304 le corps est relu depuis le disque et
+`changed` vaut False, ce qui permet aussi de réutiliser un résultat dérivé
+(liste d'articles parsée, couleur d'une image) stocké avec `cache.set_json`.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import aiohttp
+
+from config import HTTP_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'HermesBot (+https://github.com/DrTableBasse/Hermes)'
+
+
+class DiskCache:
+    """Fichiers nommés par le hash de la clé ; écriture atomique (fichier temporaire + rename)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ext)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key, '.bin'), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set_bytes(self, key: str, data: bytes):
+        self._write(self._path(key, '.bin'), data)
+
+    def get_json(self, key: str) -> Any:
+        try:
+            with open(self._path(key, '.json'), 'rb') as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def set_json(self, key: str, value: Any):
+        self._write(self._path(key, '.json'), json.dumps(value).encode())
+
+    def prune(self, max_files: int) -> int:
+        """Supprime les fichiers les plus anciens (mtime) au-delà de `max_files`."""
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith('.tmp')]
+        except OSError:
+            return 0
+        if len(entries) <= max_files:
+            return 0
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        removed = 0
+        for e in entries[:len(entries) - max_files]:
+            try:
+                os.remove(e.path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def delete_json(self, key: str):
+        try:
+            os.remove(self._path(key, '.json'))
+        except OSError:
+            pass
+
+
+@dataclass
+class HttpResponse:
+    status:  int
+    body:    bytes
+    changed: bool = True     # False : 304, corps relu depuis le cache
+
+    def text(self, encoding: str = 'utf-8') -> str:
+        return self.body.decode(encoding, errors='replace')
+
+
+class HttpClient:
+    def __init__(self, cache_dir: str):
+        self.cache = DiskCache(cache_dir)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, limit_per_host=6, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=20, connect=5),
+                headers={'User-Agent': USER_AGENT},
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def get(self, url: str, *, conditional: bool = False) -> HttpResponse:
+        headers = {}
+        meta = self.cache.get_json(f"meta:{url}") if conditional else None
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        async with self.session.get(url, headers=headers) as resp:
+            if resp.status != 304 or not meta:
+                resp.raise_for_status()
+                body = await resp.read()
+                if conditional and (resp.headers.get('ETag') or resp.headers.get('Last-Modified')):
+                    await asyncio.to_thread(self._store, url, body, resp.headers)
+                return HttpResponse(resp.status, body)
+
+        body = await asyncio.to_thread(self.cache.get_bytes, f"body:{url}")
+        if body is not None:
+            return HttpResponse(304, body, changed=False)
+        # Corps perdu (cache purgé) : on oublie les validateurs et on refait la
+        # requête, connexion rendue au pool, dont le résultat est de nouveau mis en cache
+        await asyncio.to_thread(self.cache.delete_json, f"meta:{url}")
+        return await self.get(url, conditional=True)
+
+    def _store(self, url: str, body: bytes, headers):
+        self.cache.set_bytes(f"body:{url}", body)
+        self.cache.set_json(f"meta:{url}", {
+            'etag':          headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        })
+
+
+# ── Singleton ─────────────────────────────────────────────────────────────────
+http_client = HttpClient(HTTP_CACHE_DIR)
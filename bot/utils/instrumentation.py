@@ -0,0 +1,123 @@
+"""Latence des handlers d'événements et des commandes slash.
+
+`@timed()` mesure un handler (histogramme par nom et statut success/error).
+Pendant son exécution, le temps passé en base (DatabaseManager.get_connection)
+et dans l'API Discord (bot.http.request) est cumulé sur le span courant, puis
+publié séparément : on sait si un handler lent attend Postgres ou Discord.
+
+Les commandes slash sont mesurées par `InstrumentedTree`, sans décorateur.
+"""
+import functools
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import discord
+from discord import app_commands
+
+import metrics as bot_metrics
+
+
+class Span:
+    __slots__ = ('kind', 'name', 'parent', 'started', 'db', 'discord')
+
+    def __init__(self, kind: str, name: str, parent: Optional['Span']):
+        self.kind    = kind
+        self.name    = name
+        self.parent  = parent
+        self.started = time.perf_counter()
+        self.db      = 0.0
+        self.discord = 0.0
+
+
+_current: ContextVar[Optional[Span]] = ContextVar('hermes_span', default=None)
+
+
+def add_db_time(seconds: float):
+    # Un handler imbriqué (award_xp dans _process_message) compte aussi pour son parent
+    span = _current.get()
+    while span is not None:
+        span.db += seconds
+        span = span.parent
+
+
+def add_discord_time(seconds: float):
+    span = _current.get()
+    while span is not None:
+        span.discord += seconds
+        span = span.parent
+
+
+def _observe(span: Span, status: str):
+    elapsed = time.perf_counter() - span.started
+    if span.kind == 'command':
+        bot_metrics.command_latency_seconds.labels(command=span.name, status=status).observe(elapsed)
+    else:
+        bot_metrics.handler_latency_seconds.labels(handler=span.name, status=status).observe(elapsed)
+    bot_metrics.handler_io_seconds.labels(kind=span.kind, name=span.name, target='db').observe(span.db)
+    bot_metrics.handler_io_seconds.labels(kind=span.kind, name=span.name, target='discord').observe(span.discord)
+
+
+def timed(name: str = None):
+    """Décorateur pour handler async. Nom par défaut : __qualname__ (ex. VoiceCog.on_voice_state_update)."""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            span  = Span('handler', label, _current.get())
+            token = _current.set(span)
+            status = 'success'
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                status = 'error'
+                raise
+            finally:
+                _current.reset(token)
+                _observe(span, status)
+        return wrapper
+    return decorator
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """CommandTree qui mesure chaque commande slash.
+
+    Le span démarre dans interaction_check (même tâche que le callback, donc
+    le ContextVar couvre la commande) ; il est clos par on_error, ou par
+    `finish_command()` depuis on_app_command_completion.
+    """
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        command = interaction.command
+        span = Span('command', command.qualified_name if command else 'unknown', None)
+        _current.set(span)
+        interaction.extras['hermes_span'] = span
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        span = interaction.extras.pop('hermes_span', None)
+        if span is not None:
+            _observe(span, 'error')
+        await super().on_error(interaction, error)
+
+
+def finish_command(interaction: discord.Interaction):
+    span = interaction.extras.pop('hermes_span', None)
+    if span is not None:
+        _observe(span, 'success')
+
+
+def instrument_http(client: discord.Client):
+    """Chronomètre chaque appel REST Discord (rate-limit inclus) sur le span courant."""
+    request = client.http.request
+
+    @functools.wraps(request)
+    async def timed_request(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await request(*args, **kwargs)
+        finally:
+            add_discord_time(time.perf_counter() - started)
+
+    client.http.request = timed_request
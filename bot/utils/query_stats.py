@@ -0,0 +1,165 @@
+"""Statistiques par requête SQL (empreinte normalisée) et journal des requêtes lentes.
+
+DatabaseManager appelle `record()` après chaque instruction : la requête est
+réduite à une empreinte (littéraux remplacés par ?, espaces compactés), les
+durées sont agrégées par empreinte et publiées dans hermes_db_query_seconds.
+Au-delà de SLOW_QUERY_MS, la requête est journalisée avec la forme de ses
+paramètres (types, jamais les valeurs) et un échantillon de plan EXPLAIN.
+"""
+import hashlib
+import logging
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import metrics as bot_metrics
+from config import SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_COOLDOWN = 600      # un plan par empreinte toutes les 10 minutes au plus
+PLAN_SAMPLE_LINES = 15
+_MAX_FINGERPRINTS = 2000
+_OVERFLOW = 'other'
+
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING  = re.compile(r"'(?:[^']|'')*'")
+_NUMBER  = re.compile(r'(?<![\w$])\d+(?:\.\d+)?\b')
+_LIST    = re.compile(r'\(\s*(?:\?|\$\d+)(?:\s*,\s*(?:\?|\$\d+))+\s*\)')
+_SPACE   = re.compile(r'\s+')
+_EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+
+def normalize(query: str) -> str:
+    q = _COMMENT.sub(' ', query)
+    q = _STRING.sub('?', q)
+    q = _NUMBER.sub('?', q)
+    q = _LIST.sub('(?, ...)', q)
+    return _SPACE.sub(' ', q).strip()
+
+
+def params_shape(args: tuple) -> str:
+    """Types des paramètres, sans leurs valeurs : (int, str, list[3], None)."""
+    parts = []
+    for a in args:
+        if a is None:
+            parts.append('None')
+        elif isinstance(a, (list, tuple)):
+            parts.append(f'{type(a).__name__}[{len(a)}]')
+        else:
+            parts.append(type(a).__name__)
+    return '(' + ', '.join(parts) + ')'
+
+
+class _Entry:
+    __slots__ = ('fid', 'text', 'calls', 'errors', 'total', 'max', 'plan', 'plan_at')
+
+    def __init__(self, fid: str, text: str):
+        self.fid     = fid
+        self.text    = text
+        self.calls   = 0
+        self.errors  = 0
+        self.total   = 0.0
+        self.max     = 0.0
+        self.plan: Optional[List[str]] = None
+        self.plan_at = 0.0
+
+
+class QueryStats:
+    def __init__(self, slow_ms: float):
+        self.slow_seconds = slow_ms / 1000
+        self._fingerprints: Dict[str, Tuple[str, str]] = {}   # requête brute -> (fid, texte)
+        self._entries: Dict[str, _Entry] = {}
+        self._acquire_count = 0
+        self._acquire_total = 0.0
+        self._acquire_max   = 0.0
+        self.since = time.time()
+
+    def fingerprint(self, query: str) -> Tuple[str, str]:
+        fp = self._fingerprints.get(query)
+        if fp is None:
+            text = normalize(query)
+            fp = (hashlib.sha1(text.encode()).hexdigest()[:12], text)
+            if len(self._fingerprints) < _MAX_FINGERPRINTS:
+                self._fingerprints[query] = fp
+        return fp
+
+    def record_acquire(self, seconds: float):
+        self._acquire_count += 1
+        self._acquire_total += seconds
+        self._acquire_max = max(self._acquire_max, seconds)
+        bot_metrics.db_pool_acquire_seconds.observe(seconds)
+
+    def record(self, query: str, args: tuple, seconds: float, error: bool = False) -> bool:
+        """Agrège une exécution. Retourne True si un plan EXPLAIN doit être échantillonné."""
+        fid, text = self.fingerprint(query)
+        entry = self._entries.get(fid)
+        if entry is None and len(self._entries) >= _MAX_FINGERPRINTS:
+            # Au-delà du plafond, les nouvelles empreintes partagent une seule entrée
+            entry = self._entries.get(_OVERFLOW)
+            if entry is None:
+                entry = self._entries[_OVERFLOW] = _Entry(_OVERFLOW, '(autres empreintes)')
+        elif entry is None:
+            entry = self._entries[fid] = _Entry(fid, text)
+        entry.calls += 1
+        entry.total += seconds
+        entry.max = max(entry.max, seconds)
+        if error:
+            entry.errors += 1
+        bot_metrics.db_query_seconds.labels(fingerprint=entry.fid).observe(seconds)
+
+        if seconds < self.slow_seconds or error:
+            return False
+        logger.warning(
+            "Requête lente %.0f ms [%s] params=%s : %s",
+            seconds * 1000, fid, params_shape(args), text[:500],
+        )
+        now = time.monotonic()
+        if now - entry.plan_at < EXPLAIN_COOLDOWN or not text.lower().startswith(_EXPLAINABLE):
+            return False
+        entry.plan_at = now
+        return True
+
+    def set_plan(self, query: str, plan: List[str]):
+        fid, _ = self.fingerprint(query)
+        entry = self._entries.get(fid)
+        if entry is not None:
+            entry.plan = plan[:PLAN_SAMPLE_LINES]
+        logger.warning("Plan [%s] :\n%s", fid, '\n'.join(plan[:PLAN_SAMPLE_LINES]))
+
+    def top(self, limit: int = 20, order: str = 'total') -> List[dict]:
+        key = {
+            'total': lambda e: e.total,
+            'mean':  lambda e: e.total / e.calls,
+            'max':   lambda e: e.max,
+            'calls': lambda e: e.calls,
+        }.get(order, lambda e: e.total)
+        return [
+            {
+                'fingerprint': e.fid,
+                'query':       e.text,
+                'calls':       e.calls,
+                'errors':      e.errors,
+                'total_ms':    round(e.total * 1000, 1),
+                'mean_ms':     round(e.total * 1000 / e.calls, 2),
+                'max_ms':      round(e.max * 1000, 1),
+                'plan':        e.plan,
+            }
+            for e in sorted(self._entries.values(), key=key, reverse=True)[:limit]
+        ]
+
+    def report(self, limit: int = 20, order: str = 'total') -> dict:
+        return {
+            'since':          self.since,
+            'slow_query_ms':  self.slow_seconds * 1000,
+            'pool_acquire': {
+                'count':   self._acquire_count,
+                'mean_ms': round(self._acquire_total * 1000 / self._acquire_count, 2) if self._acquire_count else 0,
+                'max_ms':  round(self._acquire_max * 1000, 1),
+            },
+            'queries': self.top(limit, order),
+        }
+
+
+# ── Singleton ─────────────────────────────────────────────────────────────────
+query_stats = QueryStats(SLOW_QUERY_MS)
@@ -0,0 +1,156 @@
+"""Planificateur persistant des actions différées (fin de tempban, tempmute, rappels).
+
+Les actions sont stockées dans `scheduled_actions`. Un seul timer en mémoire
+dort jusqu'à la prochaine échéance (lue via l'index partiel sur `run_at`),
+exécute toutes les actions dues par lots, puis se rendort. La mémoire reste
+constante quel que soit le nombre d'actions en attente, et rien n'est perdu
+au redémarrage : les actions échues pendant l'arrêt partent au démarrage.
+
+Les cogs enregistrent un handler par type d'action avec `register()`.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE    = 100
+MAX_SLEEP     = 300     # revérifie la table au moins toutes les 5 minutes
+LEASE_SECONDS = 120     # une action réclamée puis perdue (crash) redevient éligible
+MAX_ATTEMPTS  = 5
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ActionScheduler:
+    def __init__(self, db):
+        self.db = db
+        self._handlers: Dict[str, Handler] = {}
+        self._wakeup = asyncio.Event()
+        self._next_run: Optional[datetime] = None
+        self._task: asyncio.Task | None = None
+
+    def register(self, action_type: str, handler: Handler):
+        """`handler(action)` reçoit la ligne scheduled_actions (payload décodé)."""
+        self._handlers[action_type] = handler
+
+    async def schedule(self, action_type: str, run_at: datetime, *, user_id: int = None,
+                       guild_id: int = None, payload: dict = None) -> int:
+        action_id = await self.db.fetchval("""
+            INSERT INTO scheduled_actions (action_type, guild_id, user_id, payload, run_at)
+            VALUES ($1, $2, $3, $4::jsonb, $5)
+            RETURNING id
+        """, action_type, guild_id, user_id, json.dumps(payload or {}), run_at)
+        # Réveille le timer seulement si cette échéance passe avant celle attendue
+        if self._next_run is None or run_at < self._next_run:
+            self._wakeup.set()
+        return action_id
+
+    async def cancel(self, action_type: str, *, user_id: int = None, guild_id: int = None) -> int:
+        """Annule les actions en attente de ce type pour ce membre. Retourne le nombre annulé."""
+        result = await self.db.execute("""
+            UPDATE scheduled_actions SET status = 'cancelled', executed_at = NOW()
+            WHERE status = 'pending' AND action_type = $1
+              AND user_id IS NOT DISTINCT FROM $2 AND guild_id IS NOT DISTINCT FROM $3
+        """, action_type, user_id, guild_id)
+        return int(result.split()[-1])
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self._run_due()
+                self._next_run = await self.db.fetchval(
+                    "SELECT MIN(run_at) FROM scheduled_actions WHERE status = 'pending'"
+                )
+            except Exception as e:
+                logger.error(f"Scheduler error: {e}", exc_info=True)
+                self._next_run = None
+
+            delay = MAX_SLEEP
+            if self._next_run is not None:
+                delay = min(MAX_SLEEP, max(0.0, (self._next_run - datetime.now(timezone.utc)).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> List[dict]:
+        return await self.db.fetch(f"""
+            UPDATE scheduled_actions SET run_at = NOW() + INTERVAL '{LEASE_SECONDS} seconds'
+            WHERE id IN (
+                SELECT id FROM scheduled_actions
+                WHERE status = 'pending' AND run_at <= NOW()
+                ORDER BY run_at
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+        """, BATCH_SIZE)
+
+    async def _run_due(self):
+        while True:
+            actions = await self._claim()
+            if not actions:
+                return
+            results = await asyncio.gather(*(self._execute(a) for a in actions), return_exceptions=True)
+
+            done, failed, retry = [], [], []
+            for action, result in zip(actions, results):
+                if result is None:
+                    done.append(action['id'])
+                elif action['attempts'] + 1 >= MAX_ATTEMPTS:
+                    failed.append((action['id'], str(result)))
+                else:
+                    retry.append((action['id'], str(result), float(30 * 2 ** action['attempts'])))
+
+            if done:
+                await self.db.execute("""
+                    UPDATE scheduled_actions SET status = 'done', executed_at = NOW()
+                    WHERE id = ANY($1::bigint[])
+                """, done)
+            if failed:
+                await self.db.executemany("""
+                    UPDATE scheduled_actions
+                    SET status = 'failed', attempts = attempts + 1, last_error = $2, executed_at = NOW()
+                    WHERE id = $1
+                """, failed)
+                logger.warning(f"{len(failed)} actions planifiées abandonnées")
+            if retry:
+                await self.db.executemany("""
+                    UPDATE scheduled_actions
+                    SET attempts = attempts + 1, last_error = $2, run_at = NOW() + make_interval(secs => $3)
+                    WHERE id = $1
+                """, retry)
+            if len(actions) < BATCH_SIZE:
+                return
+
+    async def _execute(self, action: dict):
+        handler = self._handlers.get(action['action_type'])
+        if handler is None:
+            raise RuntimeError(f"aucun handler pour '{action['action_type']}'")
+        action = dict(action)
+        if isinstance(action['payload'], str):
+            action['payload'] = json.loads(action['payload'])
+        await handler(action)
+
+
+# ── Singleton ─────────────────────────────────────────────────────────────────
+scheduler = ActionScheduler(db_manager)
@@ -0,0 +1,103 @@
+"""Tampon write-behind pour les compteurs de messages.
+
+`on_message` n'écrit plus directement en base : il incrémente un compteur en
+mémoire par (user_id, channel_id). Les deltas sont vidés toutes les quelques
+secondes (ou dès que le seuil de clés en attente est atteint) en une seule
+requête d'upsert sur `unnest` des tableaux de deltas (`increment_many`),
+puis les callbacks enregistrés reçoivent les totaux par utilisateur pour les
+traitements dérivés (quêtes, achievements).
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from config import MESSAGE_FLUSH_SECONDS, MESSAGE_FLUSH_MAX_PENDING
+from utils.database import message_stats_manager
+
+logger = logging.getLogger(__name__)
+
+FlushCallback = Callable[[Dict[int, int]], Awaitable[None]]
+
+
+class MessageCounterBuffer:
+    def __init__(self, stats_manager, flush_interval: float = 5.0, max_pending: int = 500):
+        self.stats_manager = stats_manager
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[int, int], int] = defaultdict(int)
+        self._callbacks: List[FlushCallback] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def on_flush(self, callback: FlushCallback):
+        """Enregistre un callback appelé avec {user_id: messages} après chaque flush."""
+        self._callbacks.append(callback)
+
+    def add(self, user_id: int, channel_id: int, count: int = 1):
+        self._pending[(user_id, channel_id)] += count
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Flush compteurs messages échoué: {e}", exc_info=True)
+
+    async def flush(self) -> Dict[int, int]:
+        async with self._flush_lock:
+            if not self._pending:
+                return {}
+            batch, self._pending = self._pending, defaultdict(int)
+            rows = [(uid, cid, n) for (uid, cid), n in batch.items()]
+            try:
+                await self.stats_manager.increment_many(rows)
+            except Exception:
+                # Réinjecte les deltas pour le prochain essai plutôt que de les perdre
+                for (uid, cid), n in batch.items():
+                    self._pending[(uid, cid)] += n
+                raise
+
+        per_user: Dict[int, int] = defaultdict(int)
+        for uid, _, n in rows:
+            per_user[uid] += n
+        for cb in self._callbacks:
+            try:
+                await cb(dict(per_user))
+            except Exception as e:
+                logger.warning(f"Callback flush messages: {e}")
+        return dict(per_user)
+
+    async def close(self):
+        """Arrête la boucle et vide ce qui reste en attente."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Flush final compteurs messages échoué: {e}")
+
+
+# ── Singleton ─────────────────────────────────────────────────────────────────
+message_buffer = MessageCounterBuffer(
+    message_stats_manager,
+    flush_interval=MESSAGE_FLUSH_SECONDS,
+    max_pending=MESSAGE_FLUSH_MAX_PENDING,
+)
@@ -0,0 +1,51 @@
+-- Migration 011 : totaux dénormalisés par membre
+-- Exécuter manuellement : psql -U <user> -d <db> -f 011_user_totals.sql
+--
+-- Une ligne par membre, maintenue par le bot dans les mêmes requêtes que les
+-- compteurs sources (messages, commandes, vocal, achievements). Évite les
+-- SUM(message_count) / COUNT(DISTINCT channel_id) recalculés à chaque message
+-- et à chaque affichage de classement. Reconstruction : /reconcile-totals.
+
+CREATE TABLE IF NOT EXISTS user_totals (
+    user_id           BIGINT PRIMARY KEY REFERENCES user_voice_data(user_id) ON DELETE CASCADE,
+    messages          BIGINT  NOT NULL DEFAULT 0,
+    distinct_channels INTEGER NOT NULL DEFAULT 0,
+    commands_used     BIGINT  NOT NULL DEFAULT 0,
+    voice_seconds     BIGINT  NOT NULL DEFAULT 0,
+    achievement_count INTEGER NOT NULL DEFAULT 0,
+    updated_at        TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Index couvrants : classements et rangs en index-only scan
+CREATE INDEX IF NOT EXISTS idx_user_totals_messages     ON user_totals(messages DESC, user_id);
+CREATE INDEX IF NOT EXISTS idx_user_totals_achievements ON user_totals(achievement_count DESC, user_id);
+CREATE INDEX IF NOT EXISTS idx_user_totals_voice        ON user_totals(voice_seconds DESC, user_id);
+
+-- Remplissage initial depuis les tables sources
+INSERT INTO user_totals (user_id, messages, distinct_channels, commands_used, voice_seconds, achievement_count)
+SELECT v.user_id,
+       COALESCE(m.messages, 0),
+       COALESCE(m.channels, 0),
+       COALESCE(c.commands, 0),
+       COALESCE(v.total_time, 0),
+       COALESCE(a.achievements, 0)
+FROM user_voice_data v
+LEFT JOIN (
+    SELECT user_id, SUM(message_count) AS messages, COUNT(DISTINCT channel_id) AS channels
+    FROM user_message_stats GROUP BY user_id
+) m ON m.user_id = v.user_id
+LEFT JOIN (
+    SELECT user_id, SUM(usage_count) AS commands FROM user_command_stats GROUP BY user_id
+) c ON c.user_id = v.user_id
+LEFT JOIN (
+    SELECT user_id, COUNT(*) AS achievements FROM user_achievements GROUP BY user_id
+) a ON a.user_id = v.user_id
+ON CONFLICT (user_id) DO UPDATE
+    SET messages          = EXCLUDED.messages,
+        distinct_channels = EXCLUDED.distinct_channels,
+        commands_used     = EXCLUDED.commands_used,
+        voice_seconds     = EXCLUDED.voice_seconds,
+        achievement_count = EXCLUDED.achievement_count,
+        updated_at        = NOW();
+
+ANALYZE user_totals;
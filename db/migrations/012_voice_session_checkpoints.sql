@@ -0,0 +1,15 @@
+-- Migration 012 : points de reprise des sessions vocales en cours
+-- Exécuter manuellement : psql -U <user> -d <db> -f 012_voice_session_checkpoints.sql
+--
+-- Une ligne par membre actuellement en vocal. Le bot crédite le temps écoulé
+-- toutes les VOICE_CHECKPOINT_MINUTES et met à jour checkpoint_at ; la ligne
+-- est supprimée en fin de session. Au redémarrage, les sessions encore actives
+-- reprennent depuis leur dernier point de reprise.
+
+CREATE TABLE IF NOT EXISTS voice_session_checkpoints (
+    user_id          BIGINT PRIMARY KEY REFERENCES user_voice_data(user_id) ON DELETE CASCADE,
+    channel_id       BIGINT,
+    started_at       TIMESTAMPTZ NOT NULL,
+    checkpoint_at    TIMESTAMPTZ NOT NULL,
+    credited_seconds INTEGER NOT NULL DEFAULT 0
+);
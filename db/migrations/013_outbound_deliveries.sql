@@ -0,0 +1,27 @@
+-- Migration 013 : file d'envoi durable vers Discord (DM, messages, rôles)
+-- Exécuter manuellement : psql -U <user> -d <db> -f 013_outbound_deliveries.sql
+--
+-- Les cogs n'appellent plus l'API Discord depuis le chemin chaud : ils insèrent
+-- une ligne ici et le dispatcher du bot (utils/delivery_queue.py) l'envoie en
+-- respectant les limites de débit, avec regroupement des DM et reprises.
+
+CREATE TABLE IF NOT EXISTS outbound_deliveries (
+    id              BIGSERIAL PRIMARY KEY,
+    kind            VARCHAR(20) NOT NULL CHECK (kind IN ('dm', 'channel_message', 'role_add')),
+    user_id         BIGINT,
+    channel_id      BIGINT,
+    coalesce_key    VARCHAR(50),
+    payload         JSONB NOT NULL DEFAULT '{}',
+    status          VARCHAR(20) NOT NULL DEFAULT 'pending'
+                    CHECK (status IN ('pending', 'delivered', 'failed')),
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    last_error      TEXT,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    delivered_at    TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbound_pending
+    ON outbound_deliveries(next_attempt_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_outbound_created
+    ON outbound_deliveries(created_at) WHERE status <> 'pending';
@@ -0,0 +1,25 @@
+-- Migration 014 : actions différées persistantes (fin de tempban, tempmute, rappels)
+-- Exécuter manuellement : psql -U <user> -d <db> -f 014_scheduled_actions.sql
+--
+-- Le bot ne garde en mémoire que la prochaine échéance (utils/scheduler.py) ;
+-- les actions en attente survivent aux redémarrages et sont exécutées par lots.
+
+CREATE TABLE IF NOT EXISTS scheduled_actions (
+    id          BIGSERIAL PRIMARY KEY,
+    action_type VARCHAR(30) NOT NULL,
+    guild_id    BIGINT,
+    user_id     BIGINT,
+    payload     JSONB NOT NULL DEFAULT '{}',
+    run_at      TIMESTAMPTZ NOT NULL,
+    status      VARCHAR(20) NOT NULL DEFAULT 'pending'
+                CHECK (status IN ('pending', 'done', 'failed', 'cancelled')),
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    last_error  TEXT,
+    created_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    executed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_scheduled_actions_due
+    ON scheduled_actions(run_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_scheduled_actions_target
+    ON scheduled_actions(action_type, guild_id, user_id) WHERE status = 'pending';
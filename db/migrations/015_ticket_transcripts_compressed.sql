@@ -0,0 +1,27 @@
+-- Migration 015 : transcripts de tickets compressés, hors de la table tickets
+-- Exécuter manuellement : psql -U <user> -d <db> -f 015_ticket_transcripts_compressed.sql
+--
+-- Le bot écrit le HTML compressé (gzip) en flux ; l'API le renvoie tel quel
+-- avec Content-Encoding: gzip. tickets.transcript_html n'est plus alimenté :
+-- les transcripts existants sont déplacés ici (encoding 'identity').
+
+CREATE TABLE IF NOT EXISTS ticket_transcripts (
+    ticket_id     INTEGER PRIMARY KEY REFERENCES tickets(id) ON DELETE CASCADE,
+    encoding      VARCHAR(10) NOT NULL DEFAULT 'gzip' CHECK (encoding IN ('gzip', 'identity')),
+    data          BYTEA   NOT NULL,
+    raw_size      BIGINT  NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Données déjà compressées : pas de seconde compression TOAST, et substring()
+-- lit directement les morceaux demandés (lecture en flux côté API)
+ALTER TABLE ticket_transcripts ALTER COLUMN data SET STORAGE EXTERNAL;
+
+INSERT INTO ticket_transcripts (ticket_id, encoding, data, raw_size)
+SELECT id, 'identity', convert_to(transcript_html, 'UTF8'), octet_length(transcript_html)
+FROM tickets
+WHERE transcript_html IS NOT NULL
+ON CONFLICT (ticket_id) DO NOTHING;
+
+UPDATE tickets SET transcript_html = NULL WHERE transcript_html IS NOT NULL;
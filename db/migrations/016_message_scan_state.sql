@@ -0,0 +1,28 @@
+-- Migration 016 : état du scanner d'historique (scripts/message_stats_scanner.py)
+-- Exécuter manuellement : psql -U <user> -d <db> -f 016_message_scan_state.sql
+--
+-- Le scanner parcourt les salons en parallèle, du plus ancien au plus récent.
+-- Chaque lot de comptages est fusionné dans message_scan_counts dans la même
+-- transaction que le point de reprise du salon : un scan interrompu reprend
+-- exactement après le dernier message compté. Une fois tous les salons
+-- terminés, le résultat remplace user_message_stats en une transaction et
+-- applied_at est renseigné : relancé sans --restart, le scanner refuse de
+-- réappliquer des comptages figés qui écraseraient ceux du bot.
+
+CREATE TABLE IF NOT EXISTS message_scan_checkpoints (
+    channel_id      BIGINT PRIMARY KEY,
+    channel_name    VARCHAR(255),
+    last_message_id BIGINT,
+    message_count   BIGINT  NOT NULL DEFAULT 0,
+    done            BOOLEAN NOT NULL DEFAULT FALSE,
+    applied_at      TIMESTAMPTZ,
+    updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS message_scan_counts (
+    user_id       BIGINT NOT NULL,
+    channel_id    BIGINT NOT NULL,
+    username      VARCHAR(255) NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, channel_id)
+);
@@ -0,0 +1,23 @@
+-- Migration 017 : articles anime/manga déjà publiés (remplace sent_articles_cache.json)
+-- Exécuter manuellement : psql -U <user> -d <db> -f 017_sent_articles.sql
+--
+-- Clé : md5 du lien de l'article. Le cog réserve les articles par
+-- INSERT … ON CONFLICT DO NOTHING RETURNING avant de les envoyer : une
+-- vérification relancée (ou concurrente) ne publie jamais deux fois.
+
+CREATE TABLE IF NOT EXISTS sent_articles (
+    article_hash CHAR(32) PRIMARY KEY,
+    url          TEXT,
+    title        TEXT,
+    sent_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sent_articles_sent_at ON sent_articles(sent_at);
+
+-- Reprise de l'ancien cache JSON
+INSERT INTO sent_articles (article_hash) VALUES
+    ('4ccc9c85f463d2382d344d2cb2ad5941'),
+    ('549d88342b66a39a824fd75e8e56c95e'),
+    ('50f2f14e53439eb6604657585c563108'),
+    ('53e8c198e494dad8c112fb1e32e0ced6')
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,31 @@
+-- Migration 018 : classements précalculés
+-- Exécuter manuellement : psql -U <user> -d <db> -f 018_leaderboard_ranks.sql
+--
+-- Une ligne par (classement, membre) avec son score, son rang (RANK, ex æquo
+-- partagés) et sa position (ordre strict, sans trou). L'API les rafraîchit à
+-- intervalle court (web-api/rankings.py) en n'écrivant que les lignes dont le
+-- score ou le rang a changé ; les routes /leaderboard/* deviennent une lecture
+-- par plage sur (metric, position) au lieu d'un RANK() OVER + COUNT(*) par page.
+--
+-- Metrics : voice, messages, achievements, bumps, invites, streaks, global,
+--           xp, xp_weekly, levels (score2 = départage, ex. total_xp pour levels)
+
+CREATE TABLE IF NOT EXISTS leaderboard_ranks (
+    metric   VARCHAR(20) NOT NULL,
+    user_id  BIGINT      NOT NULL REFERENCES user_voice_data(user_id) ON DELETE CASCADE,
+    score    BIGINT      NOT NULL DEFAULT 0,
+    score2   BIGINT      NOT NULL DEFAULT 0,
+    rank     INTEGER     NOT NULL,
+    position INTEGER     NOT NULL,
+    PRIMARY KEY (metric, user_id)
+);
+
+-- Pas UNIQUE : les positions glissent pendant le rafraîchissement
+CREATE INDEX IF NOT EXISTS idx_leaderboard_ranks_position ON leaderboard_ranks(metric, position);
+
+-- Taille de chaque classement (remplace le COUNT(*) de chaque page)
+CREATE TABLE IF NOT EXISTS leaderboard_rank_state (
+    metric       VARCHAR(20) PRIMARY KEY,
+    total        INTEGER     NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
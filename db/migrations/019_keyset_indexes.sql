@@ -0,0 +1,25 @@
+-- Migration 019 : index de pagination par curseur (keyset)
+-- Exécuter manuellement : psql -U <user> -d <db> -f 019_keyset_indexes.sql
+--
+-- Les listes paginées acceptent un `cursor` (clé de tri de la dernière ligne,
+-- voir web-api/pagination.py) : la page suivante est lue par
+-- WHERE (clé) < (curseur) ORDER BY clé DESC sur ces index, au même coût
+-- quelle que soit la profondeur, sans OFFSET.
+
+-- Classements : (score, score2, user_id), parcouru à rebours
+CREATE INDEX IF NOT EXISTS idx_leaderboard_ranks_keyset ON leaderboard_ranks(metric, score, score2, user_id);
+
+-- Articles publiés : (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_articles_published_keyset ON articles(published, created_at, id);
+
+-- Journal admin : tous types, puis filtré par type
+CREATE INDEX IF NOT EXISTS idx_admin_logs_keyset      ON admin_logs(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_admin_logs_type_keyset ON admin_logs(action_type, created_at, id);
+
+-- Tickets : tous, puis filtrés par statut
+CREATE INDEX IF NOT EXISTS idx_tickets_keyset        ON tickets(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tickets_status_keyset ON tickets(status, created_at, id);
+
+-- Remplacés par les index ci-dessus (mêmes colonnes de tête)
+DROP INDEX IF EXISTS idx_articles_published;
+DROP INDEX IF EXISTS idx_admin_logs_created;
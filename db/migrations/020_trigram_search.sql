@@ -0,0 +1,13 @@
+-- Migration 020 : recherche de membres par trigrammes
+-- Exécuter manuellement : psql -U <user> -d <db> -f 020_trigram_search.sql
+--
+-- Les recherches par nom (search= des classements, /admin/users/search,
+-- VoiceDataManager.find_by_name) filtrent en ILIKE '%terme%' ou par préfixe :
+-- le btree sur username ne sert à rien, d'où un parcours séquentiel. Les index
+-- GIN pg_trgm couvrent ILIKE (quelle que soit la position du terme), l'opérateur
+-- de similarité % et le tri par similarity().
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_user_voice_username_trgm ON user_voice_data USING GIN (username gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_user_voice_nickname_trgm ON user_voice_data USING GIN (nickname gin_trgm_ops);
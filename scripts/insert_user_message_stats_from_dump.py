@@ -1,38 +1,241 @@
-import psycopg2
+"""
+Import d'une section COPY d'un dump PostgreSQL (pg_dump, db/import_v1_data.sql…)
+
+Le script lit le dump en flux, repère la section `COPY <source> (...) FROM stdin;`
+et l'envoie telle quelle à COPY vers une table temporaire (aucune liste en
+mémoire), puis fusionne dans la table cible en une requête, avec la politique
+de conflit choisie.
+
+Usage :
+    python scripts/insert_user_message_stats_from_dump.py dump.sql
+    python scripts/insert_user_message_stats_from_dump.py db/import_v1_data.sql \\
+        --source tmp_ums --target user_message_stats --on-conflict max
+    python scripts/insert_user_message_stats_from_dump.py dump.sql --list
+
+Politiques (--on-conflict) :
+    update   remplace les colonnes non-clé par celles du dump (défaut)
+    max      garde la plus grande valeur, colonne par colonne
+    add      additionne les colonnes numériques, remplace les autres
+    nothing  conserve les lignes existantes
+    error    échoue au premier conflit
+
+Connexion : variables PG_HOST, PG_PORT, PG_DB, PG_USER, PG_PASSWORD (.env).
+"""
+
+import argparse
+import asyncio
+import logging
+import os
 import re
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1 << 20   # taille des blocs envoyés à COPY
+_COPY_HEADER = re.compile(rb'^COPY\s+(\S+)\s*\(([^)]*)\)\s+FROM\s+stdin;', re.I)
+_NUMERIC = {'smallint', 'integer', 'bigint', 'numeric', 'real', 'double precision'}
+
+
+def pg_config() -> dict:
+    return {
+        'host':     os.getenv('PG_HOST', 'localhost'),
+        'port':     int(os.getenv('PG_PORT', '5432')),
+        'database': os.getenv('PG_DB'),
+        'user':     os.getenv('PG_USER'),
+        'password': os.getenv('PG_PASSWORD'),
+    }
 
-DUMP_FILE = './dump.sql'  # Adapter le chemin si besoin
-PG_HOST = 'localhost'
-PG_USER = 'hermes_bot'
-PG_DB = 'saucisseland'
-PG_PASSWORD = 'bot_password_2024'
 
-# Connexion à la base
-conn = psycopg2.connect(host=PG_HOST, user=PG_USER, password=PG_PASSWORD, database=PG_DB)
-cursor = conn.cursor()
+def _unqualified(name: str) -> str:
+    return name.split('.')[-1].strip('"')
 
-# Extraction des lignes COPY
-with open(DUMP_FILE, 'r', encoding='utf-8') as f:
-    in_copy = False
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def list_sections(path: str):
+    with open(path, 'rb') as f:
+        for line in f:
+            m = _COPY_HEADER.match(line)
+            if m:
+                print(f"{m.group(1).decode()} ({m.group(2).decode()})")
+
+
+def find_section(f, source: str):
+    """Avance `f` jusqu'à la section COPY de `source`. Retourne ses colonnes."""
     for line in f:
-        if line.strip().startswith('COPY public.user_message_stats'):
-            in_copy = True
-            continue
-        if in_copy:
-            if line.strip() == '' or line.startswith('\\.'):
+        m = _COPY_HEADER.match(line)
+        if m and _unqualified(m.group(1).decode()) == _unqualified(source):
+            return [c.strip().strip('"') for c in m.group(2).decode().split(',')]
+    raise SystemExit(f"❌ Section COPY {source} introuvable")
+
+
+class SectionReader:
+    """Itérable async des données d'une section COPY, par blocs, jusqu'à la ligne '\\.'."""
+
+    def __init__(self, f):
+        self.f = f
+        self.bytes = 0
+
+    async def __aiter__(self):
+        chunk = []
+        size = 0
+        for line in self.f:
+            if line.startswith(b'\\.'):
                 break
-            # Format: user_id\tchannel_id\tmessage_count
-            parts = line.strip().split('\t')
-            if len(parts) != 3:
-                continue
-            user_id, channel_id, message_count = parts
-            cursor.execute('''
-                INSERT INTO user_message_stats (user_id, channel_id, message_count)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (user_id, channel_id) DO UPDATE SET message_count = EXCLUDED.message_count
-            ''', (user_id, channel_id, message_count))
-
-conn.commit()
-cursor.close()
-conn.close()
-print('✅ Insertion terminée !') 
\ No newline at end of file
+            chunk.append(line)
+            size += len(line)
+            if size >= CHUNK_BYTES:
+                self.bytes += size
+                yield b''.join(chunk)
+                chunk, size = [], 0
+                await asyncio.sleep(0)
+        if chunk:
+            self.bytes += size
+            yield b''.join(chunk)
+
+
+async def target_columns(conn, target: str) -> dict:
+    """{colonne: type} de la table cible."""
+    rows = await conn.fetch("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod) AS type
+        FROM pg_attribute a
+        WHERE a.attrelid = $1::text::regclass AND a.attnum > 0 AND NOT a.attisdropped
+        ORDER BY a.attnum
+    """, target)
+    return {r['attname']: r['type'] for r in rows}
+
+
+async def primary_key(conn, target: str) -> list:
+    rows = await conn.fetch("""
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = $1::text::regclass AND i.indisprimary
+        ORDER BY array_position(i.indkey::int[], a.attnum::int)
+    """, target)
+    return [r['attname'] for r in rows]
+
+
+def merge_sql(target: str, columns: list, types: dict, key: list, policy: str) -> str:
+    cols = ', '.join(_ident(c) for c in columns)
+    select = f"SELECT {cols} FROM import_staging"
+    if key and policy in ('update', 'max', 'add'):
+        # Un doublon de clé dans le dump ferait échouer ON CONFLICT DO UPDATE :
+        # la dernière occurrence (ordre des lignes du dump) l'emporte
+        keys = ', '.join(_ident(k) for k in key)
+        select = (f"SELECT DISTINCT ON ({keys}) {cols} FROM import_staging "
+                  f"ORDER BY {keys}, import_line DESC")
+    sql = f"INSERT INTO {target} ({cols})\n{select}"
+    if policy == 'error' or not key:
+        return sql
+    if policy == 'nothing':
+        return sql + f"\nON CONFLICT ({', '.join(_ident(k) for k in key)}) DO NOTHING"
+
+    sets = []
+    for c in columns:
+        if c in key:
+            continue
+        q = _ident(c)
+        if policy == 'max':
+            sets.append(f"{q} = GREATEST({target}.{q}, EXCLUDED.{q})")
+        elif policy == 'add' and types[c] in _NUMERIC:
+            sets.append(f"{q} = COALESCE({target}.{q}, 0) + COALESCE(EXCLUDED.{q}, 0)")
+        else:
+            sets.append(f"{q} = EXCLUDED.{q}")
+    if not sets:
+        return sql + f"\nON CONFLICT ({', '.join(_ident(k) for k in key)}) DO NOTHING"
+    return sql + f"\nON CONFLICT ({', '.join(_ident(k) for k in key)}) DO UPDATE SET " + ', '.join(sets)
+
+
+async def import_section(path: str, source: str, target: str, policy: str, key: list):
+    conn = await asyncpg.connect(**pg_config())
+    started = time.monotonic()
+    try:
+        types = await target_columns(conn, target)
+        key = key or await primary_key(conn, target)
+
+        with open(path, 'rb') as f:
+            dump_columns = find_section(f, source)
+            ignored = [c for c in dump_columns if c not in types]
+            if ignored:
+                logger.info(f"ℹ️ Colonnes absentes de {target}, ignorées : {', '.join(ignored)}")
+            columns = [c for c in dump_columns if c in types]
+            missing_key = [k for k in key if k not in columns]
+            if missing_key:
+                raise SystemExit(f"❌ Clé {missing_key} absente de la section {source}")
+
+            async with conn.transaction():
+                # Même ordre de colonnes que le dump : les colonnes ignorées restent en text.
+                # import_line (hors COPY) numérote les lignes dans l'ordre du dump.
+                staging = ', '.join(f"{_ident(c)} {types.get(c, 'text')}" for c in dump_columns)
+                staging += ", import_line BIGSERIAL"
+                await conn.execute(f"CREATE TEMP TABLE import_staging ({staging}) ON COMMIT DROP")
+
+                reader = SectionReader(f)
+                status = await conn.copy_to_table(
+                    'import_staging', source=reader, columns=dump_columns, format='text'
+                )
+                copied = int(status.split()[-1])
+                copy_time = time.monotonic() - started
+                logger.info(
+                    f"📥 {copied:,} lignes copiées ({reader.bytes / 1e6:.1f} Mo) en {copy_time:.1f} s "
+                    f"— {copied / max(copy_time, 1e-6):,.0f} lignes/s"
+                )
+
+                await conn.execute("ANALYZE import_staging")
+                status = await conn.execute(merge_sql(target, columns, types, key, policy))
+                merged = int(status.split()[-1])
+
+                if target == 'user_message_stats':
+                    # Classements, rangs et profils lisent user_totals
+                    await conn.execute("""
+                        INSERT INTO user_totals (user_id, messages, distinct_channels)
+                        SELECT m.user_id, SUM(m.message_count), COUNT(DISTINCT m.channel_id)
+                        FROM user_message_stats m
+                        WHERE m.user_id IN (SELECT DISTINCT user_id FROM import_staging)
+                        GROUP BY m.user_id
+                        ON CONFLICT (user_id) DO UPDATE
+                          SET messages          = EXCLUDED.messages,
+                              distinct_channels = EXCLUDED.distinct_channels,
+                              updated_at        = NOW()
+                    """)
+                    logger.info("🔢 user_totals recalculé pour les membres importés")
+
+        duration = time.monotonic() - started
+        logger.info(
+            f"✅ {target} : {merged:,} lignes insérées/mises à jour ({policy}) en {duration:.1f} s "
+            f"— {copied / max(duration, 1e-6):,.0f} lignes/s"
+        )
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en flux d'une section COPY d'un dump PostgreSQL")
+    parser.add_argument('dump', help="fichier .sql (pg_dump en format texte)")
+    parser.add_argument('--source', default='public.user_message_stats', help="table de la section COPY dans le dump")
+    parser.add_argument('--target', help="table cible (défaut : même nom que la source)")
+    parser.add_argument('--on-conflict', default='update', choices=['update', 'max', 'add', 'nothing', 'error'])
+    parser.add_argument('--key', help="colonnes de conflit, séparées par des virgules (défaut : clé primaire)")
+    parser.add_argument('--list', action='store_true', help="liste les sections COPY du dump")
+    args = parser.parse_args()
+
+    if args.list:
+        list_sections(args.dump)
+        return
+
+    target = args.target or _unqualified(args.source)
+    key = [k.strip() for k in args.key.split(',')] if args.key else []
+    asyncio.run(import_section(args.dump, args.source, target, args.on_conflict, key))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,38 @@
 """
 Script de scan des messages Discord pour les statistiques
 
-Ce script va scanner tous les messages du serveur Discord pour :
-1. Compter le nombre total de messages par utilisateur
-2. Compter le nombre de messages par salon
+Ce script parcourt l'historique de tous les salons textuels du serveur pour :
+1. Compter les messages par (utilisateur, salon)
+2. Reprendre là où il s'est arrêté (point de reprise par salon)
 3. Exclure les catégories spécifiées
 
+Les salons sont scannés en parallèle (SCAN_CONCURRENCY), du plus ancien au
+plus récent. Les comptages sont envoyés par COPY dans une table temporaire,
+puis fusionnés en une requête avec le point de reprise du salon. Quand tous
+les salons sont terminés, une passe de rattrapage compte les messages postés
+depuis leur dernier point de reprise, puis le résultat remplace
+user_message_stats (les compteurs du bot sont ainsi à jour à quelques
+secondes près). Un scan n'est appliqué qu'une fois : --restart pour refaire.
+
+Prérequis : db/migrations/016_message_scan_state.sql
+
+Usage :
+    python scripts/message_stats_scanner.py             # reprend le scan en cours
+    python scripts/message_stats_scanner.py --restart   # repart de zéro
+
 Auteur: Dr.TableBasse
 """
 
-import discord
+import argparse
 import asyncio
+import logging
 import os
+import time
+from collections import Counter
+
+import asyncpg
+import discord
 from dotenv import load_dotenv
-import psycopg2
-from datetime import datetime
-import logging
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -31,239 +48,308 @@ EXCLUDED_CATEGORIES = [
     989815462755962890
 ]
 
-# Configuration PostgreSQL
-PG_HOST = os.getenv('PG_HOST')
-PG_USER = os.getenv('PG_USER')
-PG_DB = os.getenv('PG_DB')
-PG_PASSWORD = os.getenv('PG_PASSWORD')
+# Salons scannés simultanément (chaque salon a son propre bucket de rate-limit)
+SCAN_CONCURRENCY = int(os.getenv('SCAN_CONCURRENCY', '4'))
+# Un salon est flushé tous les FLUSH_MESSAGES messages ou FLUSH_SECONDS secondes
+FLUSH_MESSAGES = 5000
+FLUSH_SECONDS = 30
+PROGRESS_SECONDS = 30
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def pg_config() -> dict:
+    return {
+        'host':     os.getenv('PG_HOST', 'localhost'),
+        'port':     int(os.getenv('PG_PORT', '5432')),
+        'database': os.getenv('PG_DB'),
+        'user':     os.getenv('PG_USER'),
+        'password': os.getenv('PG_PASSWORD'),
+    }
+
+
 class MessageStatsScanner:
-    def __init__(self):
-        intents = discord.Intents.all()
-        intents.message_content = True
+    def __init__(self, concurrency: int = SCAN_CONCURRENCY):
+        intents = discord.Intents.none()
         intents.guilds = True
-        intents.messages = True
         self.client = discord.Client(intents=intents)
-        self.user_message_counts = {}
-        self.channel_message_counts = {}
+        self.concurrency = concurrency
+        self.pool: asyncpg.Pool = None
         self.total_messages_scanned = 0
         self.start_time = None
-        
+
     async def connect_db(self):
-        """Connexion à la base de données PostgreSQL"""
-        try:
-            self.db_conn = psycopg2.connect(
-                host=PG_HOST,
-                user=PG_USER,
-                password=PG_PASSWORD,
-                database=PG_DB
-            )
-            self.db_cursor = self.db_conn.cursor()
-            logger.info("✅ Connexion à la base de données réussie")
-        except Exception as e:
-            logger.error(f"❌ Erreur de connexion à la base: {e}")
-            raise
-    
+        """Pool PostgreSQL : une connexion par salon scanné en parallèle"""
+        self.pool = await asyncpg.create_pool(**pg_config(), min_size=1, max_size=self.concurrency + 1)
+        logger.info("✅ Connexion à la base de données réussie")
+
+    async def reset(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute("TRUNCATE message_scan_checkpoints, message_scan_counts")
+        logger.info("🗑️ Scan précédent effacé, reprise depuis le début")
+
     def get_valid_channels(self, guild):
         """Récupère tous les canaux textuels valides (excluant les catégories spécifiées)"""
         valid_channels = []
-        
-        for channel in guild.channels:
-            # Vérifier si c'est un canal textuel
-            if isinstance(channel, discord.TextChannel):
-                # Vérifier si la catégorie est exclue
-                if channel.category_id in EXCLUDED_CATEGORIES:
-                    logger.info(f"🚫 Canal exclu (catégorie {channel.category_id}): {channel.name}")
-                    continue
-                
-                valid_channels.append(channel)
-                logger.info(f"✅ Canal inclus: {channel.name} (ID: {channel.id})")
-        
+        for channel in guild.text_channels:
+            if channel.category_id in EXCLUDED_CATEGORIES:
+                logger.info(f"🚫 Canal exclu (catégorie {channel.category_id}): {channel.name}")
+                continue
+            valid_channels.append(channel)
         logger.info(f"📊 Total des canaux valides: {len(valid_channels)}")
         return valid_channels
-    
-    async def scan_channel_messages(self, channel):
-        """Scanne tous les messages d'un canal"""
-        logger.info(f"🔍 Scan du canal: {channel.name}")
-        
+
+    async def load_checkpoints(self) -> dict:
+        rows = await self.pool.fetch("SELECT channel_id, last_message_id, done FROM message_scan_checkpoints")
+        return {r['channel_id']: r for r in rows}
+
+    async def register_channels(self, channels):
+        """Un point de reprise par salon avant le scan : un salon en échec reste « incomplet »"""
+        await self.pool.executemany("""
+            INSERT INTO message_scan_checkpoints (channel_id, channel_name)
+            VALUES ($1, $2)
+            ON CONFLICT (channel_id) DO NOTHING
+        """, [(c.id, c.name) for c in channels])
+
+    async def forget_channel(self, channel):
+        """Salon illisible : hors du scan, ses compteurs du bot sont conservés"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("DELETE FROM message_scan_counts WHERE channel_id = $1", channel.id)
+                await conn.execute("DELETE FROM message_scan_checkpoints WHERE channel_id = $1", channel.id)
+
+    async def flush(self, channel, counts: Counter, names: dict, last_message_id: int, scanned: int, done: bool):
+        """COPY des comptages dans la table temporaire, puis fusion + point de reprise en une requête"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS message_scan_staging (
+                        user_id  BIGINT,
+                        username VARCHAR(255),
+                        n        INTEGER
+                    ) ON COMMIT DELETE ROWS
+                """)
+                if counts:
+                    await conn.copy_records_to_table(
+                        'message_scan_staging',
+                        records=[(uid, names[uid], n) for uid, n in counts.items()],
+                    )
+                await conn.execute("""
+                    WITH up AS (
+                        INSERT INTO message_scan_counts (user_id, channel_id, username, message_count)
+                        SELECT user_id, $1, username, n FROM message_scan_staging
+                        ON CONFLICT (user_id, channel_id) DO UPDATE
+                          SET message_count = message_scan_counts.message_count + EXCLUDED.message_count,
+                              username      = EXCLUDED.username
+                    )
+                    INSERT INTO message_scan_checkpoints
+                        (channel_id, channel_name, last_message_id, message_count, done, updated_at)
+                    VALUES ($1, $2, $3, $4, $5, NOW())
+                    ON CONFLICT (channel_id) DO UPDATE
+                      SET channel_name    = EXCLUDED.channel_name,
+                          last_message_id = COALESCE(EXCLUDED.last_message_id, message_scan_checkpoints.last_message_id),
+                          message_count   = message_scan_checkpoints.message_count + EXCLUDED.message_count,
+                          done            = EXCLUDED.done,
+                          updated_at      = NOW()
+                """, channel.id, channel.name, last_message_id, scanned, done)
+
+    async def scan_channel_messages(self, channel, checkpoint, catch_up: bool = False):
+        """Scanne un canal depuis son point de reprise, du plus ancien au plus récent.
+
+        catch_up : repasse aussi sur les salons terminés (messages postés depuis).
+        """
+        if checkpoint and checkpoint['done'] and not catch_up:
+            logger.info(f"⏭️ {channel.name}: déjà terminé")
+            return
+        after = discord.Object(id=checkpoint['last_message_id']) if checkpoint and checkpoint['last_message_id'] else None
+        logger.info(f"🔍 Scan du canal: {channel.name}" + (" (reprise)" if after else ""))
+
+        counts: Counter = Counter()
+        names = {}
+        last_id = None
+        pending = 0
+        channel_total = 0
+        last_flush = time.monotonic()
         try:
-            message_count = 0
-            last_save_count = 0
-            
-            async for message in channel.history(limit=None):
-                # Compter pour l'utilisateur
-                user_id = message.author.id
-                if user_id not in self.user_message_counts:
-                    self.user_message_counts[user_id] = 0
-                self.user_message_counts[user_id] += 1
-                
-                # Compter pour le canal
-                channel_id = channel.id
-                if channel_id not in self.channel_message_counts:
-                    self.channel_message_counts[channel_id] = 0
-                self.channel_message_counts[channel_id] += 1
-                
-                message_count += 1
-                self.total_messages_scanned += 1
-                
-                # Affichage en temps réel tous les 10 messages
-                if self.total_messages_scanned % 10 == 0:
-                    print(f"{self.total_messages_scanned} messages scannés")
-                
-                # Log tous les 500 messages avec progression globale
-                if message_count % 500 == 0:
-                    logger.info(f"📝 {channel.name}: {message_count:,} messages | Total global: {self.total_messages_scanned:,}")
-                
-                # Sauvegarde progressive tous les 2000 messages
-                if self.total_messages_scanned - last_save_count >= 2000:
-                    await self.save_progress()
-                    last_save_count = self.total_messages_scanned
-                    
-                    # Calculer le temps écoulé et la vitesse
-                    if self.start_time:
-                        elapsed_time = datetime.now() - self.start_time
-                        speed = self.total_messages_scanned / elapsed_time.total_seconds()
-                        logger.info(f"💾 Sauvegarde progressive: {self.total_messages_scanned:,} messages traités | Temps: {elapsed_time} | Vitesse: {speed:.1f} msg/s")
-                    else:
-                        logger.info(f"💾 Sauvegarde progressive: {self.total_messages_scanned:,} messages traités")
-            
-            logger.info(f"✅ {channel.name}: {message_count:,} messages au total")
-            
+            async for message in channel.history(limit=None, after=after, oldest_first=True):
+                counts[message.author.id] += 1
+                names[message.author.id] = message.author.name
+                last_id = message.id
+                pending += 1
+
+                if pending >= FLUSH_MESSAGES or time.monotonic() - last_flush >= FLUSH_SECONDS:
+                    await self.flush(channel, counts, names, last_id, pending, done=False)
+                    self.total_messages_scanned += pending
+                    channel_total += pending
+                    counts.clear()
+                    names.clear()
+                    pending = 0
+                    last_flush = time.monotonic()
+
+            await self.flush(channel, counts, names, last_id, pending, done=True)
+            self.total_messages_scanned += pending
+            channel_total += pending
+            logger.info(f"✅ {channel.name}: {channel_total:,} messages")
+
+        except discord.Forbidden:
+            logger.warning(f"🔒 {channel.name}: accès refusé, ignoré")
+            await self.forget_channel(channel)
         except Exception as e:
+            # Le point de reprise reste au dernier lot enregistré
             logger.error(f"❌ Erreur lors du scan de {channel.name}: {e}")
-    
-    async def save_progress(self):
-        """Sauvegarde progressive des données sans vider les tables"""
-        try:
-            # Sauvegarder les stats utilisateurs (UPSERT)
-            for user_id, message_count in self.user_message_counts.items():
-                self.db_cursor.execute("""
-                    INSERT INTO user_message_stats (user_id, channel_id, message_count)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (user_id, channel_id) 
-                    DO UPDATE SET message_count = EXCLUDED.message_count
-                """, (user_id, 0, message_count))
-            
-            # Sauvegarder les stats par canal (UPSERT)
-            for channel_id, message_count in self.channel_message_counts.items():
-                self.db_cursor.execute("""
-                    INSERT INTO channel_message_stats (channel_id, message_count, last_updated)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (channel_id) 
-                    DO UPDATE SET message_count = EXCLUDED.message_count, last_updated = EXCLUDED.last_updated
-                """, (channel_id, message_count, datetime.now()))
-            
-            self.db_conn.commit()
-            
-        except Exception as e:
-            logger.error(f"❌ Erreur lors de la sauvegarde progressive: {e}")
-            self.db_conn.rollback()
 
-    async def save_to_database(self):
-        """Sauvegarde finale des statistiques dans la base de données"""
-        try:
-            # Vider les tables existantes
-            self.db_cursor.execute("DELETE FROM user_message_stats")
-            self.db_cursor.execute("DELETE FROM channel_message_stats")
-            logger.info("🗑️ Tables vidées")
-            
-            # Insérer les stats utilisateurs
-            for user_id, message_count in self.user_message_counts.items():
-                self.db_cursor.execute("""
+    async def report_progress(self):
+        while True:
+            await asyncio.sleep(PROGRESS_SECONDS)
+            elapsed = time.monotonic() - self.start_time
+            logger.info(
+                f"📝 {self.total_messages_scanned:,} messages enregistrés | "
+                f"{self.total_messages_scanned / elapsed:.0f} msg/s"
+            )
+
+    async def remaining_channels(self) -> int:
+        return await self.pool.fetchval("SELECT COUNT(*) FROM message_scan_checkpoints WHERE NOT done")
+
+    async def already_applied(self) -> bool:
+        return await self.pool.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM message_scan_checkpoints WHERE applied_at IS NOT NULL)"
+        )
+
+    async def apply_results(self):
+        """Remplace user_message_stats par le résultat du scan (tous les salons terminés, rattrapage fait)"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Auteurs absents de user_voice_data (anciens membres) : clé étrangère
+                await conn.execute("""
+                    INSERT INTO user_voice_data (user_id, username, is_member)
+                    SELECT DISTINCT ON (user_id) user_id, username, FALSE
+                    FROM message_scan_counts
+                    ORDER BY user_id
+                    ON CONFLICT (user_id) DO NOTHING
+                """)
+                # Salons scannés : les comptages du scan font foi. channel_id = 0 :
+                # total global écrit par l'ancienne version du scanner.
+                await conn.execute("""
+                    WITH del AS (
+                        DELETE FROM user_message_stats u
+                        WHERE u.channel_id = 0
+                           OR (u.channel_id IN (SELECT channel_id FROM message_scan_checkpoints)
+                               AND NOT EXISTS (SELECT 1 FROM message_scan_counts c
+                                               WHERE c.user_id = u.user_id AND c.channel_id = u.channel_id))
+                    )
                     INSERT INTO user_message_stats (user_id, channel_id, message_count)
-                    VALUES (%s, %s, %s)
-                """, (user_id, 0, message_count))  # channel_id = 0 pour le total global
-            
-            # Insérer les stats par canal
-            for channel_id, message_count in self.channel_message_counts.items():
-                self.db_cursor.execute("""
-                    INSERT INTO channel_message_stats (channel_id, message_count, last_updated)
-                    VALUES (%s, %s, %s)
-                """, (channel_id, message_count, datetime.now()))
-            
-            self.db_conn.commit()
-            logger.info(f"💾 {len(self.user_message_counts)} utilisateurs et {len(self.channel_message_counts)} canaux sauvegardés")
-            
-        except Exception as e:
-            logger.error(f"❌ Erreur lors de la sauvegarde: {e}")
-            self.db_conn.rollback()
-    
-    async def run_scan(self):
-        """Lance le scan complet"""
+                    SELECT user_id, channel_id, message_count FROM message_scan_counts
+                    ON CONFLICT (user_id, channel_id) DO UPDATE
+                      SET message_count = EXCLUDED.message_count,
+                          updated_at    = NOW()
+                """)
+                await conn.execute("""
+                    INSERT INTO user_totals (user_id, messages, distinct_channels)
+                    SELECT user_id, SUM(message_count), COUNT(*)
+                    FROM user_message_stats
+                    GROUP BY user_id
+                    ON CONFLICT (user_id) DO UPDATE
+                      SET messages          = EXCLUDED.messages,
+                          distinct_channels = EXCLUDED.distinct_channels,
+                          updated_at        = NOW()
+                """)
+                # Un second passage sans --restart réappliquerait des comptages périmés
+                await conn.execute("UPDATE message_scan_checkpoints SET applied_at = NOW()")
+
+    async def log_summary(self, guild):
+        top_users = await self.pool.fetch("""
+            SELECT user_id, MAX(username) AS username, SUM(message_count) AS n
+            FROM message_scan_counts GROUP BY user_id ORDER BY n DESC LIMIT 10
+        """)
+        logger.info("🏆 TOP 10 UTILISATEURS:")
+        for i, r in enumerate(top_users, 1):
+            logger.info(f"   {i}. {r['username']}: {r['n']:,} messages")
+
+        top_channels = await self.pool.fetch("""
+            SELECT channel_name, message_count FROM message_scan_checkpoints
+            ORDER BY message_count DESC LIMIT 10
+        """)
+        logger.info("📺 TOP 10 CANAUX:")
+        for i, r in enumerate(top_channels, 1):
+            logger.info(f"   {i}. #{r['channel_name']}: {r['message_count']:,} messages")
+
+    async def run_scan(self, restart: bool = False):
+        """Lance le scan complet (ou reprend le scan en cours)"""
         logger.info("🚀 Début du scan des messages Discord")
-        self.start_time = datetime.now()
-        
+        await self.connect_db()
+        if restart:
+            await self.reset()
+
+        progress = None
         try:
-            # Connexion à la base
-            await self.connect_db()
-            
-            # Démarrer le client Discord
-            await self.client.start(TOKEN)
-            
-            # Attendre que le client soit prêt
-            await self.client.wait_until_ready()
-            
-            # Récupérer le serveur
-            guild = self.client.get_guild(GUILD_ID)
-            if not guild:
-                logger.error(f"❌ Serveur {GUILD_ID} non trouvé")
-                return
-            
-            logger.info(f"🎯 Serveur trouvé: {guild.name}")
-            
-            # Récupérer les canaux valides
-            valid_channels = self.get_valid_channels(guild)
-            
-            # Scanner chaque canal
-            for channel in valid_channels:
-                await self.scan_channel_messages(channel)
-            
-            # Sauvegarder dans la base
-            await self.save_to_database()
-            
-            # Calculer le temps écoulé
-            end_time = datetime.now()
-            duration = end_time - self.start_time
-            
-            # Afficher le résumé
-            logger.info("📊 RÉSUMÉ DU SCAN:")
-            logger.info(f"   - Messages scannés: {self.total_messages_scanned:,}")
-            logger.info(f"   - Utilisateurs uniques: {len(self.user_message_counts)}")
-            logger.info(f"   - Canaux scannés: {len(self.channel_message_counts)}")
-            logger.info(f"   - Temps écoulé: {duration}")
-            logger.info(f"   - Vitesse: {self.total_messages_scanned / duration.total_seconds():.1f} messages/seconde")
-            
-            # Top 10 utilisateurs
-            top_users = sorted(self.user_message_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-            logger.info("🏆 TOP 10 UTILISATEURS:")
-            for i, (user_id, count) in enumerate(top_users, 1):
-                user = guild.get_member(user_id)
-                username = user.display_name if user else f"User_{user_id}"
-                logger.info(f"   {i}. {username}: {count} messages")
-            
-            # Top 10 canaux
-            top_channels = sorted(self.channel_message_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-            logger.info("📺 TOP 10 CANAUX:")
-            for i, (channel_id, count) in enumerate(top_channels, 1):
-                channel = guild.get_channel(channel_id)
-                channel_name = channel.name if channel else f"Channel_{channel_id}"
-                logger.info(f"   {i}. #{channel_name}: {count} messages")
-            
-        except Exception as e:
-            logger.error(f"❌ Erreur lors du scan: {e}")
+            async with self.client:
+                await self.client.login(TOKEN)
+                gateway = asyncio.create_task(self.client.connect())
+                await self.client.wait_until_ready()
+
+                guild = self.client.get_guild(GUILD_ID)
+                if not guild:
+                    logger.error(f"❌ Serveur {GUILD_ID} non trouvé")
+                    return
+                logger.info(f"🎯 Serveur trouvé: {guild.name}")
+
+                if await self.already_applied():
+                    logger.warning("⚠️ Ce scan a déjà été appliqué : relancer avec --restart pour refaire un scan")
+                    return
+
+                channels = self.get_valid_channels(guild)
+                await self.register_channels(channels)
+                checkpoints = await self.load_checkpoints()
+
+                self.start_time = time.monotonic()
+                progress = asyncio.create_task(self.report_progress())
+                semaphore = asyncio.Semaphore(self.concurrency)
+
+                async def worker(channel, catch_up=False):
+                    async with semaphore:
+                        await self.scan_channel_messages(channel, checkpoints.get(channel.id), catch_up)
+
+                await asyncio.gather(*(worker(c) for c in channels))
+
+                duration = time.monotonic() - self.start_time
+                logger.info("📊 RÉSUMÉ DU SCAN:")
+                logger.info(f"   - Messages scannés: {self.total_messages_scanned:,}")
+                logger.info(f"   - Temps écoulé: {duration:.0f} s")
+                logger.info(f"   - Vitesse: {self.total_messages_scanned / max(duration, 1):.1f} messages/seconde")
+
+                remaining = await self.remaining_channels()
+                if remaining:
+                    logger.warning(f"⚠️ {remaining} salon(s) incomplet(s) : relancer le script pour reprendre")
+                else:
+                    # Le bot a compté en direct les messages postés pendant le scan ; on les
+                    # rattrape juste avant d'écraser ses compteurs pour ne pas les perdre
+                    logger.info("🔁 Rattrapage des messages postés pendant le scan")
+                    checkpoints = await self.load_checkpoints()
+                    await asyncio.gather(*(worker(c, catch_up=True) for c in channels))
+                    if await self.remaining_channels():
+                        logger.warning("⚠️ Rattrapage incomplet : relancer le script pour reprendre")
+                    else:
+                        await self.apply_results()
+                        logger.info("💾 user_message_stats et user_totals mis à jour")
+                        await self.log_summary(guild)
+                gateway.cancel()
         finally:
-            if hasattr(self, 'db_conn'):
-                self.db_conn.close()
-            await self.client.close()
+            if progress:
+                progress.cancel()
+            await self.pool.close()
+
 
 async def main():
     """Fonction principale"""
-    scanner = MessageStatsScanner()
-    await scanner.run_scan()
+    parser = argparse.ArgumentParser(description="Scan de l'historique des messages")
+    parser.add_argument('--restart', action='store_true', help="efface les points de reprise et repart de zéro")
+    parser.add_argument('--concurrency', type=int, default=SCAN_CONCURRENCY, help="salons scannés en parallèle")
+    args = parser.parse_args()
+
+    scanner = MessageStatsScanner(concurrency=args.concurrency)
+    await scanner.run_scan(restart=args.restart)
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
@@ -1,13 +1,31 @@
+import asyncio
 import asyncpg
+import logging
 import os
+import time
 from contextlib import asynccontextmanager
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, List, Optional
+
+from query_stats import query_stats
+
+logger = logging.getLogger(__name__)
+
+# Optional read replica: leaderboards and stats read there so they don't
+# contend with the bot's writes on the primary. Unset = everything on primary.
+REPLICA_HOST     = os.getenv('PG_REPLICA_HOST', '')
+REPLICA_MAX_LAG  = float(os.getenv('PG_REPLICA_MAX_LAG', '5'))   # seconds
+_LAG_CHECK_EVERY = 5
 
 _pool: Optional[asyncpg.Pool] = None
+_replica_pool: Optional[asyncpg.Pool] = None
+_replica_lag: Optional[float] = None        # None = unknown or unreachable
+_recent_writes: Dict[Hashable, float] = {}  # key -> monotonic time of the last write
+_lag_task: Optional[asyncio.Task] = None
+_explains: set = set()
 
 
 async def init_pool():
-    global _pool
+    global _pool, _replica_pool, _lag_task
     _pool = await asyncpg.create_pool(
         host=os.getenv('PG_HOST', 'localhost'),
         port=int(os.getenv('PG_PORT', '5432')),
@@ -17,44 +35,186 @@ async def init_pool():
         min_size=2,
         max_size=10,
     )
+    if REPLICA_HOST:
+        try:
+            _replica_pool = await asyncpg.create_pool(
+                host=REPLICA_HOST,
+                port=int(os.getenv('PG_REPLICA_PORT', os.getenv('PG_PORT', '5432'))),
+                database=os.getenv('PG_DB'),
+                user=os.getenv('PG_REPLICA_USER', os.getenv('PG_USER')),
+                password=os.getenv('PG_REPLICA_PASSWORD', os.getenv('PG_PASSWORD')),
+                min_size=2,
+                max_size=int(os.getenv('PG_REPLICA_POOL_SIZE', '20')),
+            )
+            _lag_task = asyncio.create_task(_watch_replica_lag())
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.warning(f"Read replica unavailable, reads stay on primary: {e}")
 
 
 async def close_pool():
+    if _lag_task:
+        _lag_task.cancel()
+    if _replica_pool:
+        await _replica_pool.close()
     if _pool:
         await _pool.close()
 
 
+async def _watch_replica_lag():
+    """Replay lag of the replica, None when it is not streaming from the primary.
+
+    Caught up (receive = replay) counts as 0 even if the primary is idle, but
+    only while the WAL receiver is streaming: a disconnected replica also has
+    receive = replay and would otherwise report 0 lag forever. Reading
+    pg_stat_wal_receiver.status needs pg_read_all_stats for the replica user.
+    """
+    global _replica_lag
+    while True:
+        try:
+            async with _replica_pool.acquire() as conn:
+                lag = await conn.fetchval("""
+                    SELECT CASE
+                        WHEN NOT pg_is_in_recovery() THEN 0
+                        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                    END
+                """)
+            if lag is None and _replica_lag is not None:
+                logger.warning("Read replica is not streaming from the primary, reads go to primary")
+            _replica_lag = float(lag) if lag is not None else None
+        except Exception as e:
+            if _replica_lag is not None:
+                logger.warning(f"Read replica check failed, reads go to primary: {e}")
+            _replica_lag = None
+        await asyncio.sleep(_LAG_CHECK_EVERY)
+
+
+def mark_written(key: Hashable):
+    """Record a write affecting `key` (e.g. a user id) for read_*(fresh_for=key)."""
+    now = time.monotonic()
+    _recent_writes[key] = now
+    if len(_recent_writes) > 10_000:
+        for k, t in list(_recent_writes.items()):
+            if now - t > REPLICA_MAX_LAG:
+                del _recent_writes[k]
+
+
+def _use_replica(fresh_for: Optional[Hashable]) -> bool:
+    if _replica_pool is None or _replica_lag is None or _replica_lag > REPLICA_MAX_LAG:
+        return False
+    # Read-your-writes: a write younger than the allowed lag may not be replayed yet
+    if fresh_for is not None:
+        written = _recent_writes.get(fresh_for)
+        if written is not None and time.monotonic() - written < REPLICA_MAX_LAG:
+            return False
+    return True
+
+
+def replica_status() -> dict:
+    return {
+        "configured": _replica_pool is not None,
+        "lag_seconds": _replica_lag,
+        "in_use": _use_replica(None),
+    }
+
+
 @asynccontextmanager
-async def get_conn():
-    conn = await _pool.acquire()
+async def get_conn(pool: Optional[asyncpg.Pool] = None):
+    pool = pool or _pool
+    started = time.perf_counter()
+    conn = await pool.acquire()
+    query_stats.record_acquire(time.perf_counter() - started)
     try:
         yield conn
     finally:
-        await _pool.release(conn)
+        await pool.release(conn)
+
+
+@asynccontextmanager
+async def _statement(q: str, args: tuple, pool: Optional[asyncpg.Pool] = None):
+    """Connection for a single statement, timed per fingerprint (see query_stats.py)."""
+    async with get_conn(pool) as conn:
+        started = time.perf_counter()
+        error = False
+        try:
+            yield conn
+        except Exception:
+            error = True
+            raise
+        finally:
+            if query_stats.record(q, args, time.perf_counter() - started, error):
+                task = asyncio.create_task(_explain(q, args, pool))
+                _explains.add(task)
+                task.add_done_callback(_explains.discard)
+
+
+async def _explain(q: str, args: tuple, pool: Optional[asyncpg.Pool]):
+    """Plan sample for a slow statement (plain EXPLAIN: nothing is executed)."""
+    try:
+        async with get_conn(pool) as conn:
+            rows = await conn.fetch(f"EXPLAIN {q}", *args)
+        query_stats.set_plan(q, [r[0] for r in rows])
+    except Exception as e:
+        logger.debug(f"EXPLAIN failed: {e}")
 
 
 async def fetch(q: str, *args) -> List[Dict[str, Any]]:
-    async with get_conn() as conn:
+    async with _statement(q, args) as conn:
         rows = await conn.fetch(q, *args)
-        return [dict(r) for r in rows]
+    return [dict(r) for r in rows]
 
 
 async def fetchrow(q: str, *args) -> Optional[Dict[str, Any]]:
-    async with get_conn() as conn:
+    async with _statement(q, args) as conn:
         row = await conn.fetchrow(q, *args)
-        return dict(row) if row else None
+    return dict(row) if row else None
 
 
 async def fetchval(q: str, *args):
-    async with get_conn() as conn:
+    async with _statement(q, args) as conn:
         return await conn.fetchval(q, *args)
 
 
 async def execute(q: str, *args):
-    async with get_conn() as conn:
+    async with _statement(q, args) as conn:
         return await conn.execute(q, *args)
 
 
 async def executemany(q: str, params: list):
-    async with get_conn() as conn:
+    async with _statement(q, tuple(params[0]) if params else ()) as conn:
         await conn.executemany(q, params)
+
+
+# ── Read-only helpers (replica when healthy, primary otherwise) ───────────────
+
+async def _read(method: str, q: str, args: tuple, fresh_for: Optional[Hashable]):
+    global _replica_lag
+    if _use_replica(fresh_for):
+        try:
+            async with _statement(q, args, _replica_pool) as conn:
+                return await getattr(conn, method)(q, *args)
+        except (OSError, asyncpg.InterfaceError, asyncpg.PostgresConnectionError) as e:
+            # Replica down: fall back now, the lag watcher re-enables it once it answers
+            logger.warning(f"Read replica error, falling back to primary: {e}")
+            _replica_lag = None
+    async with _statement(q, args) as conn:
+        return await getattr(conn, method)(q, *args)
+
+
+async def read_fetch(q: str, *args, fresh_for: Optional[Hashable] = None) -> List[Dict[str, Any]]:
+    return [dict(r) for r in await _read('fetch', q, args, fresh_for)]
+
+
+async def read_fetchrow(q: str, *args, fresh_for: Optional[Hashable] = None) -> Optional[Dict[str, Any]]:
+    row = await _read('fetchrow', q, args, fresh_for)
+    return dict(row) if row else None
+
+
+async def read_fetchval(q: str, *args, fresh_for: Optional[Hashable] = None):
+    return await _read('fetchval', q, args, fresh_for)
+
+
+def like_escape(term: str) -> str:
+    """Escape LIKE wildcards so a search term matches literally (default ESCAPE '\\')."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
@@ -12,6 +12,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import database as db
+import rankings
+from response_cache import response_cache
+import single_flight
 from routes import auth, users, leaderboard, articles, tags, media, admin
 from routes import xp, notifications, endorsements, activity, quests, comments, tickets
 
@@ -19,7 +22,9 @@ from routes import xp, notifications, endorsements, activity, quests, comments,
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.init_pool()
+    rankings.start()
     yield
+    await rankings.stop()
     await db.close_pool()
 
 
@@ -56,4 +61,9 @@ app.mount("/media", StaticFiles(directory="/app/media"), name="media")
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status":         "ok",
+        "replica":        db.replica_status(),
+        "response_cache": response_cache.stats(),
+        "single_flight":  single_flight.stats(),
+    }
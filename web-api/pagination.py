@@ -0,0 +1,37 @@
+"""Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row of a page (e.g. (score, score2, user_id)
+or (created_at, id)), JSON-encoded then base64url. The next page is read with
+`WHERE (sort key) < (cursor)` on a matching index, so it costs the same at any
+depth and does not shift when rows are added or rescored mid-browse.
+`page` stays supported as OFFSET pagination for older clients.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional, Sequence
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable]) -> tuple:
+    """Values of `cursor` converted by `types` (e.g. (datetime.fromisoformat, int)). 400 if malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(t(v) for t, v in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def next_cursor(rows: list, limit: int, key: Callable) -> Optional[str]:
+    """Cursor after the last row, None if the page (fetched with limit + 1) was the last one."""
+    if len(rows) <= limit:
+        return None
+    return encode_cursor(*key(rows[limit - 1]))
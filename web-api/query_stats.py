@@ -0,0 +1,175 @@
+"""Per-statement timing keyed by normalized query fingerprint, plus slow-query log.
+
+database.py calls `record()` after every statement. Literals are replaced by ?
+and whitespace collapsed, so calls that differ only in values share one entry.
+Statements slower than SLOW_QUERY_MS are logged with their parameter shape
+(types only, never values) and an EXPLAIN plan sample.
+"""
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS     = float(os.getenv('SLOW_QUERY_MS', '250'))
+EXPLAIN_COOLDOWN  = 600     # at most one plan per fingerprint every 10 minutes
+PLAN_SAMPLE_LINES = 15
+_MAX_FINGERPRINTS = 2000
+_OVERFLOW = 'other'
+
+_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRING  = re.compile(r"'(?:[^']|'')*'")
+_NUMBER  = re.compile(r'(?<![\w$])\d+(?:\.\d+)?\b')
+_LIST    = re.compile(r'\(\s*(?:\?|\$\d+)(?:\s*,\s*(?:\?|\$\d+))+\s*\)')
+_SPACE   = re.compile(r'\s+')
+_EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+# Buckets (seconds) of the per-fingerprint latency histogram
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+def normalize(query: str) -> str:
+    q = _COMMENT.sub(' ', query)
+    q = _STRING.sub('?', q)
+    q = _NUMBER.sub('?', q)
+    q = _LIST.sub('(?, ...)', q)
+    return _SPACE.sub(' ', q).strip()
+
+
+def params_shape(args: tuple) -> str:
+    """Parameter types without their values: (int, str, list[3], None)."""
+    parts = []
+    for a in args:
+        if a is None:
+            parts.append('None')
+        elif isinstance(a, (list, tuple)):
+            parts.append(f'{type(a).__name__}[{len(a)}]')
+        else:
+            parts.append(type(a).__name__)
+    return '(' + ', '.join(parts) + ')'
+
+
+class _Entry:
+    __slots__ = ('fid', 'text', 'calls', 'errors', 'total', 'max', 'buckets', 'plan', 'plan_at')
+
+    def __init__(self, fid: str, text: str):
+        self.fid     = fid
+        self.text    = text
+        self.calls   = 0
+        self.errors  = 0
+        self.total   = 0.0
+        self.max     = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.plan: Optional[List[str]] = None
+        self.plan_at = 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the q-th quantile."""
+        rank, seen = q * self.calls, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+
+class QueryStats:
+    def __init__(self, slow_ms: float):
+        self.slow_seconds = slow_ms / 1000
+        self._fingerprints: Dict[str, Tuple[str, str]] = {}   # raw query -> (fid, text)
+        self._entries: Dict[str, _Entry] = {}
+        self._acquire_count = 0
+        self._acquire_total = 0.0
+        self._acquire_max   = 0.0
+        self.since = time.time()
+
+    def fingerprint(self, query: str) -> Tuple[str, str]:
+        fp = self._fingerprints.get(query)
+        if fp is None:
+            text = normalize(query)
+            fp = (hashlib.sha1(text.encode()).hexdigest()[:12], text)
+            if len(self._fingerprints) < _MAX_FINGERPRINTS:
+                self._fingerprints[query] = fp
+        return fp
+
+    def record_acquire(self, seconds: float):
+        self._acquire_count += 1
+        self._acquire_total += seconds
+        self._acquire_max = max(self._acquire_max, seconds)
+
+    def record(self, query: str, args: tuple, seconds: float, error: bool = False) -> bool:
+        """Aggregate one execution. Returns True when an EXPLAIN sample should be taken."""
+        fid, text = self.fingerprint(query)
+        entry = self._entries.get(fid)
+        if entry is None and len(self._entries) >= _MAX_FINGERPRINTS:
+            # Past the cap, new fingerprints share a single entry
+            entry = self._entries.get(_OVERFLOW)
+            if entry is None:
+                entry = self._entries[_OVERFLOW] = _Entry(_OVERFLOW, '(other fingerprints)')
+        elif entry is None:
+            entry = self._entries[fid] = _Entry(fid, text)
+        entry.calls += 1
+        entry.total += seconds
+        entry.max = max(entry.max, seconds)
+        entry.buckets[next((i for i, b in enumerate(BUCKETS) if seconds <= b), len(BUCKETS))] += 1
+        if error:
+            entry.errors += 1
+
+        if seconds < self.slow_seconds or error:
+            return False
+        logger.warning(
+            "Slow query %.0f ms [%s] params=%s: %s",
+            seconds * 1000, fid, params_shape(args), text[:500],
+        )
+        now = time.monotonic()
+        if now - entry.plan_at < EXPLAIN_COOLDOWN or not text.lower().startswith(_EXPLAINABLE):
+            return False
+        entry.plan_at = now
+        return True
+
+    def set_plan(self, query: str, plan: List[str]):
+        fid, _ = self.fingerprint(query)
+        entry = self._entries.get(fid)
+        if entry is not None:
+            entry.plan = plan[:PLAN_SAMPLE_LINES]
+        logger.warning("Plan [%s]:\n%s", fid, '\n'.join(plan[:PLAN_SAMPLE_LINES]))
+
+    def top(self, limit: int = 20, order: str = 'total') -> List[dict]:
+        key = {
+            'total': lambda e: e.total,
+            'mean':  lambda e: e.total / e.calls,
+            'max':   lambda e: e.max,
+            'calls': lambda e: e.calls,
+        }.get(order, lambda e: e.total)
+        return [
+            {
+                'fingerprint': e.fid,
+                'query':       e.text,
+                'calls':       e.calls,
+                'errors':      e.errors,
+                'total_ms':    round(e.total * 1000, 1),
+                'mean_ms':     round(e.total * 1000 / e.calls, 2),
+                'p95_ms':      round(e.quantile(0.95) * 1000, 1),
+                'max_ms':      round(e.max * 1000, 1),
+                'plan':        e.plan,
+            }
+            for e in sorted(self._entries.values(), key=key, reverse=True)[:limit]
+        ]
+
+    def report(self, limit: int = 20, order: str = 'total') -> dict:
+        return {
+            'since':         self.since,
+            'slow_query_ms': self.slow_seconds * 1000,
+            'pool_acquire': {
+                'count':   self._acquire_count,
+                'mean_ms': round(self._acquire_total * 1000 / self._acquire_count, 2) if self._acquire_count else 0,
+                'max_ms':  round(self._acquire_max * 1000, 1),
+            },
+            'queries': self.top(limit, order),
+        }
+
+
+query_stats = QueryStats(SLOW_QUERY_MS)
@@ -0,0 +1,161 @@
+"""Precomputed leaderboard ranks (see db/migrations/018_leaderboard_ranks.sql).
+
+A background task recomputes every ranking on the primary every
+RANKINGS_REFRESH_SECONDS and upserts only the rows whose score, rank or
+position changed, so /leaderboard/* pages are range reads on
+(metric, position). One API worker refreshes at a time (advisory lock).
+
+At the first refresh of each week/month the voice, messages and xp standings
+are copied into leaderboard_snapshots, which keeps the history of the
+period starts.
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+import database as db
+from response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = float(os.getenv('RANKINGS_REFRESH_SECONDS', '30'))
+_LOCK_KEY = 0x4c42524b   # 'LBRK'
+
+# metric -> SELECT user_id, score, score2 (score2 breaks ties, 0 when unused)
+SOURCES = {
+    'voice': """
+        SELECT user_id, COALESCE(total_time, 0), 0 FROM user_voice_data
+    """,
+    'messages': """
+        SELECT v.user_id, COALESCE(t.messages, 0), 0
+        FROM user_voice_data v LEFT JOIN user_totals t ON t.user_id = v.user_id
+    """,
+    'achievements': """
+        SELECT v.user_id, COALESCE(t.achievement_count, 0), 0
+        FROM user_voice_data v LEFT JOIN user_totals t ON t.user_id = v.user_id
+    """,
+    'bumps': """
+        SELECT v.user_id, COALESCE(b.bump_count, 0), 0
+        FROM user_voice_data v LEFT JOIN user_bump_stats b ON b.user_id = v.user_id
+    """,
+    'invites': """
+        SELECT v.user_id, COALESCE(i.invite_count, 0), 0
+        FROM user_voice_data v LEFT JOIN user_invite_stats i ON i.user_id = v.user_id
+    """,
+    'streaks': """
+        SELECT v.user_id, COALESCE(s.current_streak, 0), 0
+        FROM user_voice_data v LEFT JOIN user_streaks s ON s.user_id = v.user_id
+    """,
+    # 1pt/min voice + 1pt/message + 200pt/achievement
+    'global': """
+        SELECT v.user_id,
+               COALESCE(v.total_time / 60, 0) + COALESCE(t.messages, 0)
+                 + COALESCE(t.achievement_count * 200, 0),
+               0
+        FROM user_voice_data v LEFT JOIN user_totals t ON t.user_id = v.user_id
+    """,
+    'xp': """
+        SELECT x.user_id, COALESCE(x.total_xp, 0), 0
+        FROM user_xp x JOIN user_voice_data v ON v.user_id = x.user_id
+    """,
+    'xp_weekly': """
+        SELECT x.user_id, COALESCE(x.weekly_xp, 0), 0
+        FROM user_xp x JOIN user_voice_data v ON v.user_id = x.user_id
+    """,
+    'levels': """
+        SELECT x.user_id, COALESCE(x.current_level, 0), COALESCE(x.total_xp, 0)
+        FROM user_xp x JOIN user_voice_data v ON v.user_id = x.user_id
+    """,
+}
+
+# leaderboard_snapshots.metric_type -> ranking it is copied from
+SNAPSHOT_METRICS = {'voice': 'voice', 'messages': 'messages', 'xp': 'xp'}
+SNAPSHOT_PERIODS = {'weekly': 'week', 'monthly': 'month'}
+
+_REFRESH_SQL = """
+    WITH src (user_id, score, score2) AS ({source}),
+    ranked AS (
+        SELECT user_id, score, score2,
+               RANK()       OVER (ORDER BY score DESC, score2 DESC)                    AS rank,
+               ROW_NUMBER() OVER (ORDER BY score DESC, score2 DESC, user_id DESC) AS position
+        FROM src
+    ),
+    gone AS (
+        DELETE FROM leaderboard_ranks r
+        WHERE r.metric = $1 AND NOT EXISTS (SELECT 1 FROM ranked k WHERE k.user_id = r.user_id)
+        RETURNING 1
+    ),
+    changed AS (
+        INSERT INTO leaderboard_ranks (metric, user_id, score, score2, rank, position)
+        SELECT $1, user_id, score, score2, rank, position FROM ranked
+        ON CONFLICT (metric, user_id) DO UPDATE
+            SET score = EXCLUDED.score, score2 = EXCLUDED.score2,
+                rank = EXCLUDED.rank, position = EXCLUDED.position
+            WHERE (leaderboard_ranks.score, leaderboard_ranks.score2,
+                   leaderboard_ranks.rank, leaderboard_ranks.position)
+                  IS DISTINCT FROM
+                  (EXCLUDED.score, EXCLUDED.score2, EXCLUDED.rank, EXCLUDED.position)
+        RETURNING 1
+    )
+    INSERT INTO leaderboard_rank_state (metric, total, refreshed_at)
+    SELECT $1, (SELECT COUNT(*) FROM ranked), NOW()
+    ON CONFLICT (metric) DO UPDATE
+        SET total = EXCLUDED.total, refreshed_at = EXCLUDED.refreshed_at
+    RETURNING (SELECT COUNT(*) FROM changed) + (SELECT COUNT(*) FROM gone) AS changed
+"""
+
+_SNAPSHOT_SQL = """
+    INSERT INTO leaderboard_snapshots (period_type, period_start, user_id, metric_type, metric_value, rank)
+    SELECT $1, DATE_TRUNC($2, CURRENT_DATE)::DATE, user_id, $3, score, rank
+    FROM leaderboard_ranks
+    WHERE metric = $4
+      AND NOT EXISTS (
+          SELECT 1 FROM leaderboard_snapshots
+          WHERE period_type = $1 AND period_start = DATE_TRUNC($2, CURRENT_DATE)::DATE
+            AND metric_type = $3
+      )
+    ON CONFLICT DO NOTHING
+"""
+
+_task: Optional[asyncio.Task] = None
+
+
+async def refresh() -> Optional[dict]:
+    """Refresh every ranking. Returns {metric: changed rows}, None if another worker holds the lock."""
+    async with db.get_conn() as conn:
+        async with conn.transaction():
+            if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", _LOCK_KEY):
+                return None
+            changed = {}
+            for metric, source in SOURCES.items():
+                changed[metric] = await conn.fetchval(_REFRESH_SQL.format(source=source), metric)
+            for period_type, trunc in SNAPSHOT_PERIODS.items():
+                for metric_type, metric in SNAPSHOT_METRICS.items():
+                    await conn.execute(_SNAPSHOT_SQL, period_type, trunc, metric_type, metric)
+    return changed
+
+
+async def _refresh_loop():
+    while True:
+        try:
+            changed = await refresh()
+            if changed and any(changed.values()):
+                response_cache.invalidate("leaderboard")
+                logger.debug(f"Rankings refreshed: {changed}")
+        except Exception as e:
+            logger.warning(f"Rankings refresh failed: {e}")
+        await asyncio.sleep(REFRESH_SECONDS)
+
+
+def start():
+    global _task
+    if _task is None:
+        _task = asyncio.create_task(_refresh_loop())
+
+
+async def stop():
+    global _task
+    if _task:
+        _task.cancel()
+        _task = None
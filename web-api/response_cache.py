@@ -0,0 +1,137 @@
+"""In-process cache of public JSON responses, with strong ETags.
+
+`@cached(ttl, tags)` goes under the route and limiter decorators. A hit is
+served from memory without touching the database; every response carries an
+ETag (hash of the body) and Cache-Control, and `If-None-Match` is answered
+with 304. Entries expire after `ttl` seconds or when one of their tags is
+invalidated (`response_cache.invalidate('tags')` after a write).
+"""
+import functools
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Set, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from single_flight import request_key
+
+MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_ENTRIES', '2000'))
+
+
+@dataclass
+class _Entry:
+    body:    bytes
+    etag:    str
+    expires: float
+    tags:    FrozenSet[str]
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires <= time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, body: bytes, ttl: float, tags: Iterable[str]) -> _Entry:
+        if key in self._entries:
+            self._drop(key)
+        entry = _Entry(body, _etag(body), time.monotonic() + ttl, frozenset(tags))
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, *tags: str) -> int:
+        keys = set().union(*(self._by_tag.get(t, set()) for t in tags))
+        for key in keys:
+            self._drop(key)
+        return len(keys)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries":  len(self._entries),
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    return header.strip() == '*' or etag in (t.strip() for t in header.split(','))
+
+
+def _response(request: Request, entry: _Entry, max_age: int) -> Response:
+    headers = {
+        'ETag': entry.etag,
+        'Cache-Control': f'public, max-age={max_age}, stale-while-revalidate={max_age}',
+    }
+    if _not_modified(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type='application/json', headers=headers)
+
+
+def cached(ttl: float, tags: Union[Iterable[str], Callable[..., Iterable[str]]], max_age: Optional[int] = None):
+    """Cache the route's JSON for `ttl` s. `tags`: names, or a function of the route kwargs.
+
+    The route must take `request: Request`. Only 200 responses are cached
+    (HTTPException passes through).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs['request']
+            key = request_key(request)
+            entry = response_cache.get(key)
+            if entry is None:
+                result = await func(*args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                body = json.dumps(jsonable_encoder(result), separators=(',', ':')).encode()
+                entry_tags = tags(**kwargs) if callable(tags) else tags
+                entry = response_cache.set(key, body, ttl, entry_tags)
+            return _response(request, entry, int(ttl if max_age is None else max_age))
+        return wrapper
+    return decorator
+
+
+# ── Singleton ─────────────────────────────────────────────────────────────────
+response_cache = ResponseCache(MAX_ENTRIES)
@@ -2,6 +2,7 @@
 import json
 import logging
 import os
+from datetime import datetime
 from typing import Optional
 
 import httpx
@@ -9,6 +10,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from middleware.auth_middleware import get_current_user, require_admin
 import database as db
+from pagination import decode_cursor, next_cursor
+from query_stats import query_stats
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 logger = logging.getLogger(__name__)
@@ -223,28 +226,33 @@ async def get_admin_logs(
     user: dict = Depends(get_current_user),
     action_type: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
 ):
     require_admin(user)
     limit  = 50
-    offset = (page - 1) * limit
 
+    conditions: list = []
+    params: list = []
     if action_type:
-        types = action_type.split(',')
-        rows = await db.fetch(
-            """SELECT * FROM admin_logs
-               WHERE action_type = ANY($1::varchar[])
-               ORDER BY created_at DESC LIMIT $2 OFFSET $3""",
-            types, limit, offset,
-        )
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM admin_logs WHERE action_type = ANY($1::varchar[])", types
-        )
+        params.append(action_type.split(','))
+        conditions.append(f"action_type = ANY(${len(params)}::varchar[])")
+    filtered = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    total = await db.fetchval(f"SELECT COUNT(*) FROM admin_logs {filtered}", *params)
+
+    # Cursor: seek past the last (created_at, id) instead of OFFSET
+    if cursor:
+        params.extend(decode_cursor(cursor, (datetime.fromisoformat, int)))
+        conditions.append(f"(created_at, id) < (${len(params) - 1}, ${len(params)})")
+        offset = 0
     else:
-        rows = await db.fetch(
-            "SELECT * FROM admin_logs ORDER BY created_at DESC LIMIT $1 OFFSET $2",
-            limit, offset,
-        )
-        total = await db.fetchval("SELECT COUNT(*) FROM admin_logs")
+        offset = (page - 1) * limit
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    rows = await db.fetch(
+        f"SELECT * FROM admin_logs {where} ORDER BY created_at DESC, id DESC "
+        f"LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}",
+        *params, limit + 1, offset,
+    )
 
     total = int(total or 0)
     return {
@@ -259,14 +267,31 @@ async def get_admin_logs(
                 "details":     r["details"] or {},
                 "created_at":  r["created_at"].isoformat(),
             }
-            for r in rows
+            for r in rows[:limit]
         ],
         "total": total,
         "page":  page,
         "pages": max(1, -(-total // limit)),
+        "next_cursor": next_cursor(rows, limit, lambda r: (r["created_at"], r["id"])),
     }
 
 
+# ── Query stats ───────────────────────────────────────────────────────────────
+
+@router.get("/db/queries")
+async def top_queries(
+    user: dict = Depends(get_current_user),
+    source: str = Query('api', pattern='^(api|bot)$'),
+    order: str = Query('total', pattern='^(total|mean|max|calls)$'),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """Most expensive queries since startup, for this API or for the bot."""
+    require_admin(user)
+    if source == 'bot':
+        return await _bot('get', '/db/queries', params={"order": order, "limit": limit})
+    return query_stats.report(limit=limit, order=order)
+
+
 # ── User search ───────────────────────────────────────────────────────────────
 
 @router.get("/users/search")
@@ -274,12 +299,15 @@ async def search_users(q: str, user: dict = Depends(get_current_user)):
     require_admin(user)
     if len(q) < 2:
         return {"users": []}
+    # Substring or close match (pg_trgm `%`), best similarity first; all served by the trigram indexes
     rows = await db.fetch(
         """SELECT user_id, username, discord_avatar
            FROM user_voice_data
-           WHERE username ILIKE $1
-           ORDER BY username LIMIT 10""",
-        f"%{q}%",
+           WHERE username ILIKE $1 OR nickname ILIKE $1 OR username % $2 OR nickname % $2
+           ORDER BY GREATEST(similarity(username, $2), similarity(COALESCE(nickname, ''), $2)) DESC,
+                    username
+           LIMIT 10""",
+        f"%{db.like_escape(q)}%", q,
     )
     return {"users": [
         {"user_id": str(r["user_id"]), "username": r["username"], "discord_avatar": r["discord_avatar"]}
@@ -292,10 +320,10 @@ async def search_users(q: str, user: dict = Depends(get_current_user)):
 @router.get("/stats")
 async def server_stats(user: dict = Depends(get_current_user)):
     require_admin(user)
-    members        = await db.fetchval("SELECT COUNT(*) FROM user_voice_data WHERE is_member = TRUE")
-    total_msgs     = await db.fetchval("SELECT COALESCE(SUM(message_count), 0) FROM user_message_stats")
-    total_warns    = await db.fetchval("SELECT COUNT(*) FROM warn")
-    total_articles = await db.fetchval("SELECT COUNT(*) FROM articles WHERE published = TRUE")
+    members        = await db.read_fetchval("SELECT COUNT(*) FROM user_voice_data WHERE is_member = TRUE")
+    total_msgs     = await db.read_fetchval("SELECT COALESCE(SUM(messages), 0) FROM user_totals")
+    total_warns    = await db.read_fetchval("SELECT COUNT(*) FROM warn")
+    total_articles = await db.read_fetchval("SELECT COUNT(*) FROM articles WHERE published = TRUE")
     return {
         "members":        int(members or 0),
         "total_messages": int(total_msgs or 0),
@@ -435,7 +463,7 @@ async def get_analytics(user: dict = Depends(get_current_user)):
     from collections import defaultdict
 
     # Admin actions last 14 days, grouped by day + action type
-    action_rows = await db.fetch("""
+    action_rows = await db.read_fetch("""
         SELECT
             DATE(created_at AT TIME ZONE 'UTC') AS day,
             action_type,
@@ -456,7 +484,7 @@ async def get_analytics(user: dict = Depends(get_current_user)):
     actions_14d = [{"date": d, "label": d[5:], **by_day[d]} for d in days]
 
     # Level distribution
-    level_dist = await db.fetch("""
+    level_dist = await db.read_fetch("""
         SELECT
             CASE
                 WHEN current_level BETWEEN 1 AND 5   THEN '1-5'
@@ -473,7 +501,7 @@ async def get_analytics(user: dict = Depends(get_current_user)):
     """)
 
     # Quest completion for current active week
-    quest_rows = await db.fetch("""
+    quest_rows = await db.read_fetch("""
         SELECT
             q.title, q.icon,
             COUNT(uqp.user_id)                                 AS participants,
@@ -486,7 +514,7 @@ async def get_analytics(user: dict = Depends(get_current_user)):
     """)
 
     # Top 5 by XP this week
-    top_xp = await db.fetch("""
+    top_xp = await db.read_fetch("""
         SELECT COALESCE(u.nickname, u.username) AS username, x.weekly_xp
         FROM user_xp x
         JOIN user_voice_data u ON x.user_id = u.user_id
@@ -496,13 +524,13 @@ async def get_analytics(user: dict = Depends(get_current_user)):
     """)
 
     # Summary KPIs
-    active_members    = await db.fetchval("SELECT COUNT(*) FROM user_voice_data WHERE is_member = TRUE")
-    total_messages    = await db.fetchval("SELECT COALESCE(SUM(message_count), 0) FROM user_message_stats")
-    warns_30d         = await db.fetchval(
+    active_members    = await db.read_fetchval("SELECT COUNT(*) FROM user_voice_data WHERE is_member = TRUE")
+    total_messages    = await db.read_fetchval("SELECT COALESCE(SUM(messages), 0) FROM user_totals")
+    warns_30d         = await db.read_fetchval(
         "SELECT COUNT(*) FROM warn WHERE create_time >= $1",
         int((datetime.now(timezone.utc) - timedelta(days=30)).timestamp())
     )
-    quests_done_7d    = await db.fetchval(
+    quests_done_7d    = await db.read_fetchval(
         """SELECT COUNT(*) FROM user_quest_progress uqp
            JOIN weekly_quests q ON q.id = uqp.quest_id
            WHERE uqp.completed = TRUE
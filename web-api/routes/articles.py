@@ -1,9 +1,12 @@
+from datetime import datetime
 from typing import Optional
 import database as db
-from fastapi import APIRouter, Cookie, Depends, HTTPException
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Request
 from pydantic import BaseModel
 from slugify import slugify
 from middleware.auth_middleware import get_current_user, get_optional_user, require_admin, require_redacteur
+from pagination import decode_cursor, next_cursor
+from single_flight import coalesce
 
 router = APIRouter(prefix="/articles", tags=["articles"])
 
@@ -76,15 +79,17 @@ async def my_articles(user: dict = Depends(get_current_user)):
 
 
 @router.get("")
+@coalesce()
 async def list_articles(
+    request: Request,
     page: int = 1,
     limit: int = 12,
     tag: Optional[str] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
 ):
     page  = max(1, page)
     limit = max(1, min(limit, 100))
-    offset = (page - 1) * limit
 
     conditions = ["a.published = TRUE"]
     params: list = []
@@ -105,18 +110,34 @@ async def list_articles(
         params.append(f"%{search}%"); i += 1
 
     where = "WHERE " + " AND ".join(conditions)
-
-    rows = await db.fetch(
-        f"SELECT a.* FROM articles a {where} ORDER BY a.created_at DESC LIMIT ${i} OFFSET ${i+1}",
-        *params, limit, offset
-    )
     total = await db.fetchval(
         f"SELECT COUNT(*) FROM articles a {where}",
         *params
     )
 
-    articles = await _enrich_articles(rows)
-    return {"articles": articles, "total": int(total or 0), "page": page, "limit": limit}
+    # Cursor: seek past the last (created_at, id) instead of OFFSET
+    if cursor:
+        params.extend(decode_cursor(cursor, (datetime.fromisoformat, int)))
+        where += f" AND (a.created_at, a.id) < (${i}, ${i+1})"
+        i += 2
+        offset = 0
+    else:
+        offset = (page - 1) * limit
+
+    rows = await db.fetch(
+        f"SELECT a.* FROM articles a {where} ORDER BY a.created_at DESC, a.id DESC "
+        f"LIMIT ${i} OFFSET ${i+1}",
+        *params, limit + 1, offset
+    )
+
+    articles = await _enrich_articles(rows[:limit])
+    return {
+        "articles":    articles,
+        "total":       int(total or 0),
+        "page":        page,
+        "limit":       limit,
+        "next_cursor": next_cursor(rows, limit, lambda r: (r["created_at"], r["id"])),
+    }
 
 
 @router.get("/by-id/{article_id}")
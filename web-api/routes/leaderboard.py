@@ -3,45 +3,97 @@ from fastapi import APIRouter, Depends, Request
 import database as db
 from middleware.auth_middleware import get_current_user
 from limiter import limiter
+from pagination import decode_cursor, next_cursor
+from response_cache import cached
+from single_flight import coalesce
 
 router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
 
+# Ranks are precomputed in leaderboard_ranks (see rankings.py): a page is a
+# range read on (metric, position), or a seek on (score, score2, user_id) when
+# a cursor is given; the total comes from leaderboard_rank_state.
+
+
+async def _ranked_page(
+    metric: str,
+    page: int,
+    limit: int,
+    search: Optional[str] = None,
+    columns: str = "",
+    joins: str = "",
+    cursor: Optional[str] = None,
+):
+    """Rows of `metric` for the page: user_id, username, discord_avatar, score, score2, global_rank + `columns`.
+
+    Returns (rows, total, next_cursor). With `cursor`, seeks past (score, score2, user_id)
+    instead of using `page`: constant cost at any depth, stable when ranks move.
+    """
+    select = f"""
+        SELECT r.user_id, v.username, v.discord_avatar, r.score, r.score2, r.rank AS global_rank{columns}
+        FROM leaderboard_ranks r
+        JOIN user_voice_data v ON v.user_id = r.user_id
+        {joins}
+    """
+    conditions = ["r.metric = $1"]
+    params: list = [metric]
+    if search:
+        # Candidates from the trigram indexes first, then their precomputed ranks by key
+        params.append(f"%{db.like_escape(search)}%")
+        conditions.append(f"""r.user_id IN (
+            SELECT user_id FROM user_voice_data
+            WHERE username ILIKE ${len(params)} OR nickname ILIKE ${len(params)}
+        )""")
+        total = await db.read_fetchval(f"""
+            SELECT COUNT(*) FROM leaderboard_ranks r
+            WHERE {" AND ".join(conditions)}
+        """, *params)
+    else:
+        total = await db.read_fetchval("SELECT total FROM leaderboard_rank_state WHERE metric = $1", metric)
+
+    if cursor:
+        params.extend(decode_cursor(cursor, (int, int, int)))
+        n = len(params)
+        conditions.append(f"(r.score, r.score2, r.user_id) < (${n - 2}, ${n - 1}, ${n})")
+        order = "r.score DESC, r.score2 DESC, r.user_id DESC"
+        params.append(limit + 1)
+        bounds = f"LIMIT ${len(params)}"
+    elif search:
+        order = "r.position"
+        params.extend((limit + 1, (page - 1) * limit))
+        bounds = f"LIMIT ${len(params) - 1} OFFSET ${len(params)}"
+    else:
+        # Positions are contiguous: page N is a range on (metric, position)
+        params.extend(((page - 1) * limit, limit + 1))
+        n = len(params)
+        conditions.append(f"r.position > ${n - 1} AND r.position <= ${n - 1} + ${n}")
+        order, bounds = "r.position", ""
+
+    rows = await db.read_fetch(
+        select + f"WHERE {' AND '.join(conditions)} ORDER BY {order} {bounds}", *params
+    )
+    cursor_out = next_cursor(rows, limit, lambda r: (r["score"], r["score2"], r["user_id"]))
+    return rows[:limit], int(total or 0), cursor_out
+
 
 @router.get("/voice")
 @limiter.limit("60/minute")
-async def leaderboard_voice(request: Request, page: int = 1, limit: int = 10, search: Optional[str] = None):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_voice(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
 
-    if search:
-        pattern = f"%{search}%"
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM user_voice_data WHERE username ILIKE $1", pattern
-        )
-        rows = await db.fetch("""
-            SELECT * FROM (
-                SELECT user_id, username, discord_avatar, total_time,
-                       RANK() OVER (ORDER BY total_time DESC) AS global_rank
-                FROM user_voice_data
-            ) ranked
-            WHERE username ILIKE $1
-            ORDER BY global_rank
-            LIMIT $2 OFFSET $3
-        """, pattern, limit, offset)
-    else:
-        total = await db.fetchval("SELECT COUNT(*) FROM user_voice_data")
-        rows  = await db.fetch("""
-            SELECT user_id, username, discord_avatar, total_time,
-                   RANK() OVER (ORDER BY total_time DESC) AS global_rank
-            FROM user_voice_data
-            ORDER BY global_rank
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
+    rows, total, next_page = await _ranked_page("voice", page, limit, search, cursor=cursor)
 
     result = []
     for r in rows:
-        s = r['total_time'] or 0
+        s = r['score']
         h, rem = divmod(s, 3600)
         m, _   = divmod(rem, 60)
         result.append({
@@ -52,164 +104,124 @@ async def leaderboard_voice(request: Request, page: int = 1, limit: int = 10, se
             "formatted":      f"{h}h {m}m",
             "global_rank":    int(r['global_rank']),
         })
-    return {"leaderboard": result, "total": int(total or 0), "page": page, "limit": limit}
+    return {"leaderboard": result, "total": total, "page": page, "limit": limit,
+            "next_cursor": next_page}
+
+
+def _count_entries(rows, field: str):
+    return [
+        {
+            "user_id":        str(r["user_id"]),
+            "username":       r["username"],
+            "discord_avatar": r["discord_avatar"],
+            field:            int(r["score"]),
+            "global_rank":    int(r["global_rank"]),
+        }
+        for r in rows
+    ]
 
 
 @router.get("/messages")
 @limiter.limit("60/minute")
-async def leaderboard_messages(request: Request, page: int = 1, limit: int = 10, search: Optional[str] = None):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_messages(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
 
-    if search:
-        pattern = f"%{search}%"
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM user_voice_data WHERE username ILIKE $1", pattern
-        )
-        rows = await db.fetch("""
-            SELECT * FROM (
-                SELECT u.user_id, u.username, u.discord_avatar,
-                       COALESCE(SUM(s.message_count), 0) AS total_messages,
-                       RANK() OVER (ORDER BY COALESCE(SUM(s.message_count), 0) DESC) AS global_rank
-                FROM user_voice_data u
-                LEFT JOIN user_message_stats s ON u.user_id = s.user_id
-                GROUP BY u.user_id, u.username, u.discord_avatar
-            ) ranked
-            WHERE username ILIKE $1
-            ORDER BY global_rank
-            LIMIT $2 OFFSET $3
-        """, pattern, limit, offset)
-    else:
-        total = await db.fetchval("SELECT COUNT(*) FROM user_voice_data")
-        rows  = await db.fetch("""
-            SELECT u.user_id, u.username, u.discord_avatar,
-                   COALESCE(SUM(s.message_count), 0) AS total_messages,
-                   RANK() OVER (ORDER BY COALESCE(SUM(s.message_count), 0) DESC) AS global_rank
-            FROM user_voice_data u
-            LEFT JOIN user_message_stats s ON u.user_id = s.user_id
-            GROUP BY u.user_id, u.username, u.discord_avatar
-            ORDER BY global_rank
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
-
-    return {
-        "leaderboard": [
-            {**dict(r), "user_id": str(r["user_id"]),
-             "total_messages": int(r["total_messages"]), "global_rank": int(r["global_rank"])}
-            for r in rows
-        ],
-        "total": int(total or 0),
-        "page": page,
-        "limit": limit,
-    }
+    rows, total, next_page = await _ranked_page("messages", page, limit, search, cursor=cursor)
+    return {"leaderboard": _count_entries(rows, "total_messages"), "total": total, "page": page, "limit": limit,
+            "next_cursor": next_page}
 
 
 @router.get("/achievements")
 @limiter.limit("60/minute")
-async def leaderboard_achievements(request: Request, page: int = 1, limit: int = 10, search: Optional[str] = None):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_achievements(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
 
-    if search:
-        pattern = f"%{search}%"
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM user_voice_data WHERE username ILIKE $1", pattern
-        )
-        rows = await db.fetch("""
-            SELECT * FROM (
-                SELECT v.user_id, v.username, v.discord_avatar,
-                       COUNT(ua.achievement_id) AS achievement_count,
-                       RANK() OVER (ORDER BY COUNT(ua.achievement_id) DESC) AS global_rank
-                FROM user_voice_data v
-                LEFT JOIN user_achievements ua ON v.user_id = ua.user_id
-                GROUP BY v.user_id, v.username, v.discord_avatar
-            ) ranked
-            WHERE username ILIKE $1
-            ORDER BY global_rank
-            LIMIT $2 OFFSET $3
-        """, pattern, limit, offset)
-    else:
-        total = await db.fetchval("SELECT COUNT(*) FROM user_voice_data")
-        rows  = await db.fetch("""
-            SELECT v.user_id, v.username, v.discord_avatar,
-                   COUNT(ua.achievement_id) AS achievement_count,
-                   RANK() OVER (ORDER BY COUNT(ua.achievement_id) DESC) AS global_rank
-            FROM user_voice_data v
-            LEFT JOIN user_achievements ua ON v.user_id = ua.user_id
-            GROUP BY v.user_id, v.username, v.discord_avatar
-            ORDER BY global_rank
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
+    rows, total, next_page = await _ranked_page("achievements", page, limit, search, cursor=cursor)
+    return {"leaderboard": _count_entries(rows, "achievement_count"), "total": total, "page": page, "limit": limit,
+            "next_cursor": next_page}
+
 
+@router.get("/xp")
+@limiter.limit("60/minute")
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_xp(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    period: str = "all",
+    cursor: Optional[str] = None,
+):
+    limit  = max(1, min(limit, 100))
+    page   = max(1, page)
+
+    rows, total, next_page = await _ranked_page(
+        "xp_weekly" if period == "weekly" else "xp", page, limit,
+        columns=", x.total_xp, x.weekly_xp, x.current_level",
+        joins="JOIN user_xp x ON x.user_id = r.user_id",
+        cursor=cursor,
+    )
     return {
         "leaderboard": [
-            {**dict(r), "user_id": str(r["user_id"]),
-             "achievement_count": int(r["achievement_count"]), "global_rank": int(r["global_rank"])}
+            {
+                "user_id":        r["user_id"],
+                "total_xp":       r["total_xp"],
+                "weekly_xp":      r["weekly_xp"],
+                "current_level":  r["current_level"],
+                "username":       r["username"],
+                "discord_avatar": r["discord_avatar"],
+                "global_rank":    int(r["global_rank"]),
+            }
             for r in rows
         ],
-        "total": int(total or 0),
-        "page": page,
+        "total": total,
+        "page":  page,
         "limit": limit,
+        "next_cursor": next_page,
     }
 
 
-@router.get("/xp")
-@limiter.limit("60/minute")
-async def leaderboard_xp(request: Request, page: int = 1, limit: int = 10, period: str = "all"):
-    limit  = max(1, min(limit, 100))
-    page   = max(1, page)
-    offset = (page - 1) * limit
-
-    total = await db.fetchval("SELECT COUNT(*) FROM user_xp")
-    if period == "weekly":
-        rows = await db.fetch(
-            "SELECT x.user_id, x.total_xp, x.weekly_xp, x.current_level, v.username, v.discord_avatar "
-            "FROM user_xp x JOIN user_voice_data v ON x.user_id = v.user_id "
-            "ORDER BY x.weekly_xp DESC LIMIT $1 OFFSET $2",
-            limit, offset,
-        )
-    else:
-        rows = await db.fetch(
-            "SELECT x.user_id, x.total_xp, x.weekly_xp, x.current_level, v.username, v.discord_avatar "
-            "FROM user_xp x JOIN user_voice_data v ON x.user_id = v.user_id "
-            "ORDER BY x.total_xp DESC LIMIT $1 OFFSET $2",
-            limit, offset,
-        )
-    return {"leaderboard": [dict(r) for r in rows], "total": int(total or 0), "page": page, "limit": limit}
-
-
 @router.get("/global")
 @limiter.limit("60/minute")
-async def leaderboard_global(request: Request, page: int = 1, limit: int = 10):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_global(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+):
     """Combined score: 1pt/min voice + 1pt/message + 200pt/achievement."""
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
-
-    total = await db.fetchval("SELECT COUNT(*) FROM user_voice_data")
-    rows  = await db.fetch("""
-        SELECT
-            v.user_id, v.username, v.discord_avatar,
-            COALESCE(v.total_time / 60, 0)          AS voice_minutes,
-            COALESCE(msg.total_messages, 0)          AS total_messages,
-            COALESCE(ach.achievement_count, 0)       AS achievement_count,
-            COALESCE(v.total_time / 60, 0)
-              + COALESCE(msg.total_messages, 0)
-              + COALESCE(ach.achievement_count * 200, 0) AS global_score
-        FROM user_voice_data v
-        LEFT JOIN (
-            SELECT user_id, SUM(message_count) AS total_messages
-            FROM user_message_stats GROUP BY user_id
-        ) msg ON v.user_id = msg.user_id
-        LEFT JOIN (
-            SELECT user_id, COUNT(*) AS achievement_count
-            FROM user_achievements GROUP BY user_id
-        ) ach ON v.user_id = ach.user_id
-        ORDER BY global_score DESC
-        LIMIT $1 OFFSET $2
-    """, limit, offset)
+
+    rows, total, next_page = await _ranked_page(
+        "global", page, limit,
+        columns=""",
+            COALESCE(v.total_time / 60, 0)   AS voice_minutes,
+            COALESCE(t.messages, 0)          AS total_messages,
+            COALESCE(t.achievement_count, 0) AS achievement_count""",
+        joins="LEFT JOIN user_totals t ON t.user_id = r.user_id",
+        cursor=cursor,
+    )
 
     result = []
     for r in rows:
@@ -221,273 +233,151 @@ async def leaderboard_global(request: Request, page: int = 1, limit: int = 10):
             "voice_formatted":   f"{vm // 60}h {vm % 60}m",
             "total_messages":    int(r['total_messages']),
             "achievement_count": int(r['achievement_count']),
-            "global_score":      int(r['global_score']),
+            "global_score":      int(r['score']),
+            "global_rank":       int(r['global_rank']),
         })
-    return {"leaderboard": result, "total": int(total or 0), "page": page, "limit": limit}
+    return {"leaderboard": result, "total": total, "page": page, "limit": limit,
+            "next_cursor": next_page}
 
 
 @router.get("/bumps")
 @limiter.limit("60/minute")
-async def leaderboard_bumps(request: Request, page: int = 1, limit: int = 10, search: Optional[str] = None):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_bumps(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
 
-    if search:
-        pattern = f"%{search}%"
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM user_voice_data WHERE username ILIKE $1", pattern
-        )
-        rows = await db.fetch("""
-            SELECT * FROM (
-                SELECT u.user_id, u.username, u.discord_avatar,
-                       COALESCE(b.bump_count, 0) AS bump_count,
-                       RANK() OVER (ORDER BY COALESCE(b.bump_count, 0) DESC) AS global_rank
-                FROM user_voice_data u
-                LEFT JOIN user_bump_stats b ON u.user_id = b.user_id
-            ) ranked
-            WHERE username ILIKE $1
-            ORDER BY global_rank
-            LIMIT $2 OFFSET $3
-        """, pattern, limit, offset)
-    else:
-        total = await db.fetchval("SELECT COUNT(*) FROM user_voice_data")
-        rows  = await db.fetch("""
-            SELECT u.user_id, u.username, u.discord_avatar,
-                   COALESCE(b.bump_count, 0) AS bump_count,
-                   RANK() OVER (ORDER BY COALESCE(b.bump_count, 0) DESC) AS global_rank
-            FROM user_voice_data u
-            LEFT JOIN user_bump_stats b ON u.user_id = b.user_id
-            ORDER BY global_rank
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
-
-    return {
-        "leaderboard": [
-            {**dict(r), "user_id": str(r["user_id"]),
-             "bump_count": int(r["bump_count"]), "global_rank": int(r["global_rank"])}
-            for r in rows
-        ],
-        "total": int(total or 0),
-        "page": page,
-        "limit": limit,
-    }
+    rows, total, next_page = await _ranked_page("bumps", page, limit, search, cursor=cursor)
+    return {"leaderboard": _count_entries(rows, "bump_count"), "total": total, "page": page, "limit": limit,
+            "next_cursor": next_page}
 
 
 @router.get("/invites")
 @limiter.limit("60/minute")
-async def leaderboard_invites(request: Request, page: int = 1, limit: int = 10, search: Optional[str] = None):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_invites(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
-
-    if search:
-        pattern = f"%{search}%"
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM user_voice_data WHERE username ILIKE $1", pattern
-        )
-        rows = await db.fetch("""
-            SELECT * FROM (
-                SELECT u.user_id, u.username, u.discord_avatar,
-                       COALESCE(i.invite_count, 0) AS invite_count,
-                       RANK() OVER (ORDER BY COALESCE(i.invite_count, 0) DESC) AS global_rank
-                FROM user_voice_data u
-                LEFT JOIN user_invite_stats i ON u.user_id = i.user_id
-            ) ranked
-            WHERE username ILIKE $1
-            ORDER BY global_rank
-            LIMIT $2 OFFSET $3
-        """, pattern, limit, offset)
-    else:
-        total = await db.fetchval("SELECT COUNT(*) FROM user_voice_data")
-        rows  = await db.fetch("""
-            SELECT u.user_id, u.username, u.discord_avatar,
-                   COALESCE(i.invite_count, 0) AS invite_count,
-                   RANK() OVER (ORDER BY COALESCE(i.invite_count, 0) DESC) AS global_rank
-            FROM user_voice_data u
-            LEFT JOIN user_invite_stats i ON u.user_id = i.user_id
-            ORDER BY global_rank
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
 
-    return {
-        "leaderboard": [
-            {**dict(r), "user_id": str(r["user_id"]),
-             "invite_count": int(r["invite_count"]), "global_rank": int(r["global_rank"])}
-            for r in rows
-        ],
-        "total": int(total or 0),
-        "page": page,
-        "limit": limit,
-    }
+    rows, total, next_page = await _ranked_page("invites", page, limit, search, cursor=cursor)
+    return {"leaderboard": _count_entries(rows, "invite_count"), "total": total, "page": page, "limit": limit,
+            "next_cursor": next_page}
 
 
 @router.get("/levels")
 @limiter.limit("60/minute")
-async def leaderboard_levels(request: Request, page: int = 1, limit: int = 10, search: Optional[str] = None):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_levels(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
-
-    if search:
-        pattern = f"%{search}%"
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM user_xp x JOIN user_voice_data v ON x.user_id = v.user_id WHERE v.username ILIKE $1",
-            pattern,
-        )
-        rows = await db.fetch("""
-            SELECT * FROM (
-                SELECT v.user_id, v.username, v.discord_avatar,
-                       x.current_level, x.total_xp,
-                       RANK() OVER (ORDER BY x.current_level DESC, x.total_xp DESC) AS global_rank
-                FROM user_xp x JOIN user_voice_data v ON x.user_id = v.user_id
-            ) ranked
-            WHERE username ILIKE $1
-            ORDER BY global_rank
-            LIMIT $2 OFFSET $3
-        """, pattern, limit, offset)
-    else:
-        total = await db.fetchval("SELECT COUNT(*) FROM user_xp")
-        rows  = await db.fetch("""
-            SELECT v.user_id, v.username, v.discord_avatar,
-                   x.current_level, x.total_xp,
-                   RANK() OVER (ORDER BY x.current_level DESC, x.total_xp DESC) AS global_rank
-            FROM user_xp x JOIN user_voice_data v ON x.user_id = v.user_id
-            ORDER BY global_rank
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
 
+    rows, total, next_page = await _ranked_page("levels", page, limit, search, cursor=cursor)
     return {
         "leaderboard": [
             {
                 "user_id":        str(r["user_id"]),
                 "username":       r["username"],
                 "discord_avatar": r["discord_avatar"],
-                "current_level":  int(r["current_level"]),
-                "total_xp":       int(r["total_xp"]),
+                "current_level":  int(r["score"]),
+                "total_xp":       int(r["score2"]),
                 "global_rank":    int(r["global_rank"]),
             }
             for r in rows
         ],
-        "total": int(total or 0),
+        "total": total,
         "page":  page,
         "limit": limit,
+        "next_cursor": next_page,
     }
 
 
 @router.get("/streaks")
 @limiter.limit("60/minute")
-async def leaderboard_streaks(request: Request, page: int = 1, limit: int = 10, search: Optional[str] = None):
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
+async def leaderboard_streaks(
+    request: Request,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
     limit  = max(1, min(limit, 100))
     page   = max(1, page)
-    offset = (page - 1) * limit
-
-    if search:
-        pattern = f"%{search}%"
-        total = await db.fetchval(
-            "SELECT COUNT(*) FROM user_voice_data WHERE username ILIKE $1", pattern
-        )
-        rows = await db.fetch("""
-            SELECT * FROM (
-                SELECT v.user_id, v.username, v.discord_avatar,
-                       COALESCE(s.current_streak, 0) AS current_streak,
-                       COALESCE(s.max_streak, 0)     AS max_streak,
-                       COALESCE(s.xp_multiplier, 1)  AS xp_multiplier,
-                       RANK() OVER (ORDER BY COALESCE(s.current_streak, 0) DESC) AS global_rank
-                FROM user_voice_data v
-                LEFT JOIN user_streaks s ON v.user_id = s.user_id
-            ) ranked
-            WHERE username ILIKE $1
-            ORDER BY global_rank
-            LIMIT $2 OFFSET $3
-        """, pattern, limit, offset)
-    else:
-        total = await db.fetchval("SELECT COUNT(*) FROM user_voice_data")
-        rows  = await db.fetch("""
-            SELECT v.user_id, v.username, v.discord_avatar,
-                   COALESCE(s.current_streak, 0) AS current_streak,
-                   COALESCE(s.max_streak, 0)     AS max_streak,
-                   COALESCE(s.xp_multiplier, 1)  AS xp_multiplier,
-                   RANK() OVER (ORDER BY COALESCE(s.current_streak, 0) DESC) AS global_rank
-            FROM user_voice_data v
-            LEFT JOIN user_streaks s ON v.user_id = s.user_id
-            ORDER BY global_rank
-            LIMIT $1 OFFSET $2
-        """, limit, offset)
 
+    rows, total, next_page = await _ranked_page(
+        "streaks", page, limit, search,
+        columns=""",
+            COALESCE(s.max_streak, 0)    AS max_streak,
+            COALESCE(s.xp_multiplier, 1) AS xp_multiplier""",
+        joins="LEFT JOIN user_streaks s ON s.user_id = r.user_id",
+        cursor=cursor,
+    )
     return {
         "leaderboard": [
             {
                 "user_id":        str(r["user_id"]),
                 "username":       r["username"],
                 "discord_avatar": r["discord_avatar"],
-                "current_streak": int(r["current_streak"]),
+                "current_streak": int(r["score"]),
                 "max_streak":     int(r["max_streak"]),
                 "xp_multiplier":  float(r["xp_multiplier"]),
                 "global_rank":    int(r["global_rank"]),
             }
             for r in rows
         ],
-        "total": int(total or 0),
+        "total": total,
         "page":  page,
         "limit": limit,
+        "next_cursor": next_page,
     }
 
 
+# /me response key -> ranking
+_MY_RANKS = {
+    "voice_rank":        "voice",
+    "messages_rank":     "messages",
+    "achievements_rank": "achievements",
+    "bumps_rank":        "bumps",
+    "invites_rank":      "invites",
+    "level_rank":        "levels",
+    "streak_rank":       "streaks",
+}
+
+
 @router.get("/me")
 @limiter.limit("30/minute")
 async def my_ranks(request: Request, user: dict = Depends(get_current_user)):
     uid = int(user['sub'])
 
-    voice_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM user_voice_data
-        WHERE total_time > COALESCE((SELECT total_time FROM user_voice_data WHERE user_id = $1), 0)
-    """, uid)
-
-    msg_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM (
-            SELECT user_id, SUM(message_count) AS total FROM user_message_stats GROUP BY user_id
-        ) t WHERE total > COALESCE(
-            (SELECT SUM(message_count) FROM user_message_stats WHERE user_id = $1), 0
-        )
-    """, uid)
-
-    ach_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM (
-            SELECT user_id, COUNT(*) AS cnt FROM user_achievements GROUP BY user_id
-        ) t WHERE cnt > COALESCE(
-            (SELECT COUNT(*) FROM user_achievements WHERE user_id = $1), 0
-        )
-    """, uid)
-
-    bump_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM user_bump_stats
-        WHERE bump_count > COALESCE((SELECT bump_count FROM user_bump_stats WHERE user_id = $1), 0)
-    """, uid)
-
-    invite_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM user_invite_stats
-        WHERE invite_count > COALESCE((SELECT invite_count FROM user_invite_stats WHERE user_id = $1), 0)
-    """, uid)
-
-    level_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM user_xp
-        WHERE current_level > COALESCE((SELECT current_level FROM user_xp WHERE user_id = $1), 0)
-           OR (current_level = COALESCE((SELECT current_level FROM user_xp WHERE user_id = $1), 0)
-               AND total_xp > COALESCE((SELECT total_xp FROM user_xp WHERE user_id = $1), 0))
-    """, uid)
-
-    streak_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM user_streaks
-        WHERE current_streak > COALESCE((SELECT current_streak FROM user_streaks WHERE user_id = $1), 0)
-    """, uid)
-
-    return {
-        "voice_rank":        int(voice_rank or 1),
-        "messages_rank":     int(msg_rank or 1),
-        "achievements_rank": int(ach_rank or 1),
-        "bumps_rank":        int(bump_rank or 1),
-        "invites_rank":      int(invite_rank or 1),
-        "level_rank":        int(level_rank or 1),
-        "streak_rank":       int(streak_rank or 1),
-    }
+    # Not ranked yet (joined since the last refresh, no XP row): after everyone else
+    rows = await db.read_fetch("""
+        SELECT s.metric, COALESCE(r.rank, s.total + 1) AS rank
+        FROM leaderboard_rank_state s
+        LEFT JOIN leaderboard_ranks r ON r.metric = s.metric AND r.user_id = $1
+        WHERE s.metric = ANY($2::text[])
+    """, uid, list(_MY_RANKS.values()))
+    ranks = {r['metric']: int(r['rank']) for r in rows}
+    # No state row yet (before the first refresh): unknown rather than a false 1st place
+    return {key: ranks.get(metric) for key, metric in _MY_RANKS.items()}
@@ -1,9 +1,10 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from slugify import slugify
 from middleware.auth_middleware import get_current_user, require_admin, require_redacteur
 import database as db
+from response_cache import cached, response_cache
 
 router = APIRouter(prefix="/tags", tags=["tags"])
 
@@ -19,7 +20,8 @@ class TagUpdate(BaseModel):
 
 
 @router.get("")
-async def list_tags():
+@cached(ttl=300, tags=("tags",))
+async def list_tags(request: Request):
     rows = await db.fetch("SELECT * FROM tags ORDER BY name")
     return {"tags": rows}
 
@@ -32,6 +34,7 @@ async def create_tag(body: TagCreate, user: dict = Depends(get_current_user)):
         "INSERT INTO tags (name, slug, color) VALUES ($1, $2, $3) RETURNING id",
         body.name, slug, body.color
     )
+    response_cache.invalidate("tags")
     return await db.fetchrow("SELECT * FROM tags WHERE id = $1", tag_id)
 
 
@@ -50,6 +53,7 @@ async def update_tag(tag_id: int, body: TagUpdate, user: dict = Depends(get_curr
     if fields:
         values.append(tag_id)
         await db.execute(f"UPDATE tags SET {', '.join(fields)} WHERE id = ${i}", *values)
+        response_cache.invalidate("tags")
     return await db.fetchrow("SELECT * FROM tags WHERE id = $1", tag_id)
 
 
@@ -57,3 +61,4 @@ async def update_tag(tag_id: int, body: TagUpdate, user: dict = Depends(get_curr
 async def delete_tag(tag_id: int, user: dict = Depends(get_current_user)):
     require_redacteur(user)
     await db.execute("DELETE FROM tags WHERE id = $1", tag_id)
+    response_cache.invalidate("tags")
@@ -1,8 +1,13 @@
 """Ticket history — admin only."""
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import HTMLResponse
+import zlib
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from middleware.auth_middleware import get_current_user, require_admin
 import database as db
+from pagination import decode_cursor, next_cursor
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
 
@@ -12,12 +17,26 @@ async def list_tickets(
     status: str = Query("all", pattern="^(all|open|closed)$"),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     user: dict = Depends(get_current_user),
 ):
     require_admin(user)
 
-    offset = (page - 1) * limit
     where = "" if status == "all" else f"WHERE t.status = '{status}'"
+    total = await db.fetchval(
+        f"SELECT COUNT(*) FROM tickets t {where}"
+    ) or 0
+
+    # Cursor: seek past the last (created_at, id) instead of OFFSET
+    params: list = []
+    if cursor:
+        params = list(decode_cursor(cursor, (datetime.fromisoformat, int)))
+        seek = "(t.created_at, t.id) < ($1, $2)"
+        keyset = f"{where} AND {seek}" if where else f"WHERE {seek}"
+        offset = 0
+    else:
+        keyset = where
+        offset = (page - 1) * limit
 
     rows = await db.fetch(f"""
         SELECT
@@ -29,17 +48,14 @@ async def list_tickets(
             t.status,
             t.created_at,
             t.closed_at,
-            (t.transcript_html IS NOT NULL) AS has_transcript
+            (t.transcript_html IS NOT NULL
+             OR EXISTS (SELECT 1 FROM ticket_transcripts tt WHERE tt.ticket_id = t.id)) AS has_transcript
         FROM tickets t
         LEFT JOIN user_voice_data v ON v.user_id = t.user_id
-        {where}
-        ORDER BY t.created_at DESC
-        LIMIT $1 OFFSET $2
-    """, limit, offset)
-
-    total = await db.fetchval(
-        f"SELECT COUNT(*) FROM tickets t {where}"
-    ) or 0
+        {keyset}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}
+    """, *params, limit + 1, offset)
 
     return {
         "tickets": [
@@ -54,21 +70,67 @@ async def list_tickets(
                 "closed_at":     r["closed_at"].isoformat() if r["closed_at"] else None,
                 "has_transcript": r["has_transcript"],
             }
-            for r in rows
+            for r in rows[:limit]
         ],
         "total": int(total),
         "page":  page,
         "limit": limit,
+        "next_cursor": next_cursor(rows, limit, lambda r: (r["created_at"], r["id"])),
     }
 
 
+# Lecture du bytea par morceaux : le transcript n'est jamais chargé en entier
+_CHUNK = 256 * 1024
+
+
+async def _transcript_chunks(ticket_id: int, size: int):
+    for offset in range(0, size, _CHUNK):
+        chunk = await db.fetchval(
+            "SELECT substring(data FROM $2 FOR $3) FROM ticket_transcripts WHERE ticket_id = $1",
+            ticket_id, offset + 1, _CHUNK,
+        )
+        if not chunk:
+            return
+        yield bytes(chunk)
+
+
+async def _gunzip(chunks):
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        out = d.decompress(chunk)
+        if out:
+            yield out
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
 @router.get("/{ticket_id}/transcript", response_class=HTMLResponse)
 async def get_transcript(
     ticket_id: int,
+    request: Request,
     user: dict = Depends(get_current_user),
 ):
     require_admin(user)
 
+    meta = await db.fetchrow(
+        "SELECT encoding, octet_length(data) AS size FROM ticket_transcripts WHERE ticket_id = $1",
+        ticket_id,
+    )
+    if meta:
+        chunks = _transcript_chunks(ticket_id, meta["size"])
+        headers = {"Vary": "Accept-Encoding"}
+        if meta["encoding"] == "gzip":
+            if "gzip" in request.headers.get("accept-encoding", "").lower():
+                headers["Content-Encoding"] = "gzip"
+                headers["Content-Length"] = str(meta["size"])
+            else:
+                chunks = _gunzip(chunks)
+        else:
+            headers["Content-Length"] = str(meta["size"])
+        return StreamingResponse(chunks, media_type="text/html; charset=utf-8", headers=headers)
+
+    # Tickets fermés avant la migration 015 et non migrés
     row = await db.fetchrow(
         "SELECT transcript_html FROM tickets WHERE id = $1", ticket_id
     )
@@ -2,6 +2,8 @@ import asyncio
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from limiter import limiter
+from response_cache import cached, response_cache
+from single_flight import coalesce
 from middleware.auth_middleware import get_current_user
 import database as db
 
@@ -28,9 +30,10 @@ async def _check_achievements(user_id: int, total_messages: int, voice_hours: fl
     votes_cast = await db.fetchval(
         "SELECT COUNT(*) FROM article_votes WHERE user_id = $1", user_id
     ) or 0
-    commands_used = await db.fetchval(
-        "SELECT COALESCE(SUM(usage_count), 0) FROM user_command_stats WHERE user_id = $1", user_id
-    ) or 0
+    totals = await db.fetchrow(
+        "SELECT commands_used, distinct_channels FROM user_totals WHERE user_id = $1", user_id
+    )
+    commands_used = int(totals['commands_used']) if totals else 0
     blague_count = await db.fetchval(
         "SELECT COALESCE(usage_count, 0) FROM user_command_stats WHERE user_id = $1 AND command_name = 'blague'", user_id
     ) or 0
@@ -43,9 +46,7 @@ async def _check_achievements(user_id: int, total_messages: int, voice_hours: fl
     invite_count = await db.fetchval(
         "SELECT COALESCE(invite_count, 0) FROM user_invite_stats WHERE user_id = $1", user_id
     ) or 0
-    distinct_channels = await db.fetchval(
-        "SELECT COUNT(DISTINCT channel_id) FROM user_message_stats WHERE user_id = $1", user_id
-    ) or 0
+    distinct_channels = int(totals['distinct_channels']) if totals else 0
     days_on_server = await db.fetchval(
         "SELECT EXTRACT(DAY FROM NOW() - created_at)::int FROM user_voice_data WHERE user_id = $1", user_id
     ) or 0
@@ -65,6 +66,7 @@ async def _check_achievements(user_id: int, total_messages: int, voice_hours: fl
 
     vd = voice_data or {}
 
+    earned_ids = []
     for a in achievements:
         if a['id'] in unlocked_ids:
             continue
@@ -134,10 +136,25 @@ async def _check_achievements(user_id: int, total_messages: int, voice_hours: fl
             earned = False
 
         if earned:
-            await db.execute(
-                "INSERT INTO user_achievements (user_id, achievement_id) VALUES ($1, $2) ON CONFLICT DO NOTHING",
-                user_id, a['id']
+            earned_ids.append(a['id'])
+
+    if earned_ids:
+        # Même chemin d'écriture que le bot : user_totals suit les déblocages
+        await db.execute("""
+            WITH ins AS (
+                INSERT INTO user_achievements (user_id, achievement_id)
+                SELECT $1, unnest($2::int[])
+                ON CONFLICT DO NOTHING
+                RETURNING achievement_id
             )
+            INSERT INTO user_totals (user_id, achievement_count)
+            SELECT $1, COUNT(*) FROM ins HAVING COUNT(*) > 0
+            ON CONFLICT (user_id) DO UPDATE
+              SET achievement_count = user_totals.achievement_count + EXCLUDED.achievement_count,
+                  updated_at        = NOW()
+        """, user_id, earned_ids)
+        db.mark_written(user_id)
+        response_cache.invalidate(f"user:{user_id}")
 
 
 @router.get("/{user_id}/stats")
@@ -148,7 +165,7 @@ async def get_user_stats(user_id: int, _user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
 
     total_messages = await db.fetchval(
-        "SELECT COALESCE(SUM(message_count), 0) FROM user_message_stats WHERE user_id = $1", user_id
+        "SELECT messages FROM user_totals WHERE user_id = $1", user_id
     ) or 0
 
     voice_hours = round((user['total_time'] or 0) / 3600, 2)
@@ -165,12 +182,9 @@ async def get_user_stats(user_id: int, _user: dict = Depends(get_current_user)):
     msg_current  = int(msg_streak_data['current_streak']) if msg_streak_data and msg_streak_data.get('current_streak') else 0
     msg_max      = int(msg_streak_data['max_streak'])     if msg_streak_data and msg_streak_data.get('max_streak')     else 0
 
-    msg_rank = await db.fetchval("""
-        SELECT COUNT(*) + 1 FROM (
-            SELECT user_id, SUM(message_count) AS total
-            FROM user_message_stats GROUP BY user_id
-        ) t WHERE t.total > $1
-    """, total_messages)
+    msg_rank = await db.fetchval(
+        "SELECT COUNT(*) + 1 FROM user_totals WHERE messages > $1", total_messages
+    )
 
     voice_rank = await db.fetchval(
         "SELECT COUNT(*) + 1 FROM user_voice_data WHERE total_time > $1", user['total_time'] or 0
@@ -235,38 +249,42 @@ async def get_user_stats(user_id: int, _user: dict = Depends(get_current_user)):
 
 @router.get("/{user_id}/public")
 @limiter.limit("60/minute")
+@cached(ttl=60, tags=lambda user_id, **_: (f"user:{user_id}",))
+@coalesce()
 async def get_user_public_stats(request: Request, user_id: int):
     """Public stats — no auth required. Returns community-visible data only."""
-    user = await db.fetchrow(
+    user = await db.read_fetchrow(
         "SELECT user_id, username, nickname, discord_avatar FROM user_voice_data WHERE user_id = $1",
         user_id,
     )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    total_messages, voice_row, xp_row, ach_count, streak_row, bump_count, achievements = await asyncio.gather(
-        db.fetchval(
-            "SELECT COALESCE(SUM(message_count), 0) FROM user_message_stats WHERE user_id = $1",
-            user_id,
+    totals, voice_row, xp_row, streak_row, bump_count, achievements = await asyncio.gather(
+        db.read_fetchrow(
+            "SELECT messages, achievement_count FROM user_totals WHERE user_id = $1", user_id,
+            fresh_for=user_id,
         ),
-        db.fetchrow("SELECT total_time FROM user_voice_data WHERE user_id = $1", user_id),
-        db.fetchrow("SELECT total_xp, current_level FROM user_xp WHERE user_id = $1", user_id),
-        db.fetchval("SELECT COUNT(*) FROM user_achievements WHERE user_id = $1", user_id),
-        db.fetchrow(
+        db.read_fetchrow("SELECT total_time FROM user_voice_data WHERE user_id = $1", user_id),
+        db.read_fetchrow("SELECT total_xp, current_level FROM user_xp WHERE user_id = $1", user_id),
+        db.read_fetchrow(
             "SELECT current_streak, max_streak FROM user_streaks WHERE user_id = $1", user_id
         ),
-        db.fetchval(
+        db.read_fetchval(
             "SELECT COALESCE(bump_count, 0) FROM user_bump_stats WHERE user_id = $1", user_id
         ),
-        db.fetch("""
+        db.read_fetch("""
             SELECT a.id, a.name, a.description, a.icon, a.points, ua.unlocked_at
             FROM achievements a
             JOIN user_achievements ua ON a.id = ua.achievement_id
             WHERE ua.user_id = $1
             ORDER BY a.points DESC, ua.unlocked_at DESC
-        """, user_id),
+        """, user_id, fresh_for=user_id),
     )
 
+    total_messages = totals["messages"] if totals else 0
+    ach_count      = totals["achievement_count"] if totals else 0
+
     s = voice_row["total_time"] if voice_row else 0
     h, rem = divmod(s, 3600)
     m, _ = divmod(rem, 60)
@@ -304,7 +322,7 @@ async def get_user_public_stats(request: Request, user_id: int):
 @limiter.limit("60/minute")
 async def get_user_achievements_all(request: Request, user_id: int):
     """All achievements with unlock status — unauthenticated."""
-    rows = await db.fetch("""
+    rows = await db.read_fetch("""
         SELECT
             a.id, a.name, a.description, a.icon, a.points, a.condition_type,
             CASE WHEN ua.user_id IS NOT NULL THEN true ELSE false END AS unlocked,
@@ -313,7 +331,7 @@ async def get_user_achievements_all(request: Request, user_id: int):
         LEFT JOIN user_achievements ua
                ON a.id = ua.achievement_id AND ua.user_id = $1
         ORDER BY a.points DESC, a.id
-    """, user_id)
+    """, user_id, fresh_for=user_id)
     return {
         "achievements": [
             {
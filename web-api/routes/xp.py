@@ -1,28 +1,27 @@
 from fastapi import APIRouter, Request
 import database as db
 from limiter import limiter
+from response_cache import cached
+from single_flight import coalesce
 
 router = APIRouter(prefix="/xp", tags=["xp"])
 
 
 @router.get("/leaderboard")
 @limiter.limit("60/minute")
+@cached(ttl=60, tags=("leaderboard",))
+@coalesce()
 async def xp_leaderboard(request: Request, limit: int = 10, period: str = "all"):
     limit = max(1, min(limit, 100))
-    if period == "weekly":
-        rows = await db.fetch(
-            "SELECT x.user_id, x.total_xp, x.weekly_xp, x.current_level, v.username, v.discord_avatar "
-            "FROM user_xp x JOIN user_voice_data v ON x.user_id = v.user_id "
-            "ORDER BY x.weekly_xp DESC LIMIT $1",
-            limit,
-        )
-    else:
-        rows = await db.fetch(
-            "SELECT x.user_id, x.total_xp, x.weekly_xp, x.current_level, v.username, v.discord_avatar "
-            "FROM user_xp x JOIN user_voice_data v ON x.user_id = v.user_id "
-            "ORDER BY x.total_xp DESC LIMIT $1",
-            limit,
-        )
+    # Same precomputed ranking as /leaderboard/xp: a range read, no sort of user_xp
+    rows = await db.read_fetch(
+        "SELECT r.user_id, x.total_xp, x.weekly_xp, x.current_level, v.username, v.discord_avatar "
+        "FROM leaderboard_ranks r "
+        "JOIN user_xp x ON x.user_id = r.user_id "
+        "JOIN user_voice_data v ON v.user_id = r.user_id "
+        "WHERE r.metric = $1 AND r.position <= $2 ORDER BY r.position",
+        "xp_weekly" if period == "weekly" else "xp", limit,
+    )
     return {"leaderboard": [dict(r) for r in rows]}
 
 
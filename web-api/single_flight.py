@@ -0,0 +1,54 @@
+"""Single-flight coalescing of identical concurrent requests.
+
+`@coalesce()` goes under the route, limiter and cache decorators: while a
+request is being computed, identical requests (same path, same query
+parameters in any order) await the same result instead of running the
+handler again. The computation runs in its own task, so a client that
+disconnects does not cancel it for the others. Only for routes whose
+response does not depend on who asks (public endpoints).
+"""
+import asyncio
+import functools
+from typing import Dict
+
+from fastapi import Request
+
+_inflight: Dict[str, asyncio.Future] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def request_key(request: Request) -> str:
+    """Path + query parameters sorted, so ?a=1&b=2 and ?b=2&a=1 are the same request."""
+    return request.url.path + '?' + '&'.join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+
+
+def coalesce():
+    """Share one in-flight computation between identical concurrent requests. The route must take `request`."""
+    def decorator(func):
+        route = func.__qualname__
+        counters = _stats.setdefault(route, {"calls": 0, "computed": 0, "coalesced": 0})
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = request_key(kwargs['request'])
+            counters["calls"] += 1
+            task = _inflight.get(key)
+            if task is not None:
+                counters["coalesced"] += 1
+                return await asyncio.shield(task)
+
+            counters["computed"] += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            _inflight[key] = task
+            task.add_done_callback(lambda t: _inflight.pop(key) if _inflight.get(key) is t else None)
+            return await asyncio.shield(task)
+        return wrapper
+    return decorator
+
+
+def stats() -> dict:
+    """Per route: calls, computed (handler actually ran), coalesced (served from another call)."""
+    return {
+        "in_flight": len(_inflight),
+        "routes": {route: dict(c) for route, c in _stats.items() if c["calls"]},
+    }
@@ -124,8 +124,11 @@ export default async function LeaderboardPage({
       : tab === 'streaks'
       ? myRanks.streak_rank
       : myRanks.achievements_rank
-    const myPage = Math.ceil(myRank / LIMIT)
-    jumpUrl = `/${locale}/leaderboard?tab=${tab}&page=${myPage}&hl=${myDiscordId}`
+    // null: ranking not computed yet
+    if (myRank != null) {
+      const myPage = Math.ceil(myRank / LIMIT)
+      jumpUrl = `/${locale}/leaderboard?tab=${tab}&page=${myPage}&hl=${myDiscordId}`
+    }
   }
 
   function href(overrides: { tab?: Tab; page?: number }) {
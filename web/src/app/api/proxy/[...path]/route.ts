@@ -12,8 +12,10 @@ async function proxy(
   const fwdHeaders: Record<string, string> = {}
   const cookie      = req.headers.get('cookie')
   const contentType = req.headers.get('content-type')
-  if (cookie)      fwdHeaders['cookie']       = cookie
-  if (contentType) fwdHeaders['content-type'] = contentType
+  const ifNoneMatch = req.headers.get('if-none-match')
+  if (cookie)      fwdHeaders['cookie']        = cookie
+  if (contentType) fwdHeaders['content-type']  = contentType
+  if (ifNoneMatch) fwdHeaders['if-none-match'] = ifNoneMatch
 
   const init: RequestInit & { duplex?: string } = {
     method:  req.method,
@@ -24,15 +26,21 @@ async function proxy(
     init.duplex = 'half'
   }
 
-  const upstream = await fetch(url, init)
+  const upstream = await fetch(url, { ...init, cache: 'no-store' })
 
+  // ETag / Cache-Control de l'API : le navigateur revalide avec If-None-Match
   const resHeaders = new Headers()
-  const resContentType = upstream.headers.get('content-type')
-  if (resContentType) resHeaders.set('content-type', resContentType)
+  for (const name of ['content-type', 'etag', 'cache-control']) {
+    const value = upstream.headers.get(name)
+    if (value) resHeaders.set(name, value)
+  }
   upstream.headers.forEach((val, key) => {
     if (key.toLowerCase() === 'set-cookie') resHeaders.append('set-cookie', val)
   })
 
+  if (upstream.status === 304) {
+    return new NextResponse(null, { status: 304, headers: resHeaders })
+  }
   return new NextResponse(upstream.body, {
     status:  upstream.status,
     headers: resHeaders,
@@ -6,7 +6,10 @@ const WEB_API = process.env.WEB_API_INTERNAL_URL ?? 'http://web-api:8000'
 async function get<T>(path: string, token?: string): Promise<T> {
   const headers: Record<string, string> = {}
   if (token) headers['Cookie'] = `better-auth.session_token=${token}`
-  const r = await fetch(`${WEB_API}${path}`, { headers, cache: 'no-store' })
+  // Lectures anonymes : publiques et déjà cachées par l'API (≤ 60 s), réutilisées 30 s
+  const r = await fetch(`${WEB_API}${path}`, token
+    ? { headers, cache: 'no-store' }
+    : { headers, next: { revalidate: 30 } })
   if (!r.ok) throw new Error(`${r.status} ${path}`)
   return r.json()
 }
@@ -52,7 +55,7 @@ export interface BumpEntry       { user_id: string; username: string; discord_av
 export interface InviteEntry     { user_id: string; username: string; discord_avatar: string | null; invite_count: number; global_rank: number }
 export interface LevelEntry  { user_id: string; username: string; discord_avatar: string | null; current_level: number; total_xp: number; global_rank: number }
 export interface StreakEntry { user_id: string; username: string; discord_avatar: string | null; current_streak: number; max_streak: number; xp_multiplier: number; global_rank: number }
-export interface MyRanks { voice_rank: number; messages_rank: number; achievements_rank: number; bumps_rank: number; invites_rank: number; level_rank: number; streak_rank: number }
+export interface MyRanks { voice_rank: number | null; messages_rank: number | null; achievements_rank: number | null; bumps_rank: number | null; invites_rank: number | null; level_rank: number | null; streak_rank: number | null }
 
 export async function serverLeaderboardVoice(page = 1, limit = 5, search?: string): Promise<LbPage<VoiceEntry>> {
   const qs = new URLSearchParams({ page: String(page), limit: String(limit) })